@@ -0,0 +1,28 @@
+-- Indexed case-insensitive login lookup (SupabaseUserManager.find_by_identity in
+-- authentication/models.py). Login resolves "username / email / phone" with one indexed
+-- RPC call instead of scanning or downloading seva_auth_user.
+-- Run this in Supabase SQL editor (or psql). Safe to run multiple times.
+
+CREATE INDEX IF NOT EXISTS idx_seva_auth_user_username_lower ON seva_auth_user (lower(username));
+CREATE INDEX IF NOT EXISTS idx_seva_auth_user_email_lower ON seva_auth_user (lower(email));
+CREATE INDEX IF NOT EXISTS idx_seva_auth_user_phone ON seva_auth_user (phone);
+
+-- p_kind is 'username', 'email' or 'phone'. Returns at most one row (lowest id on ties,
+-- matching the user directory). One branch per kind so each query can use its index.
+CREATE OR REPLACE FUNCTION seva_find_auth_user(p_kind TEXT, p_value TEXT)
+RETURNS SETOF seva_auth_user
+LANGUAGE plpgsql STABLE AS $$
+DECLARE
+    v TEXT := btrim(COALESCE(p_value, ''));
+BEGIN
+    IF v = '' THEN
+        RETURN;
+    ELSIF p_kind = 'username' THEN
+        RETURN QUERY SELECT * FROM seva_auth_user WHERE lower(username) = lower(v) ORDER BY id LIMIT 1;
+    ELSIF p_kind = 'email' THEN
+        RETURN QUERY SELECT * FROM seva_auth_user WHERE lower(email) = lower(v) ORDER BY id LIMIT 1;
+    ELSIF p_kind = 'phone' THEN
+        RETURN QUERY SELECT * FROM seva_auth_user WHERE phone = v ORDER BY id LIMIT 1;
+    END IF;
+END;
+$$;
@@ -0,0 +1,22 @@
+-- Keep seva_auth_user.updated_at current on every write so readers can refresh
+-- incrementally (authentication/user_directory.py polls rows with updated_at > watermark).
+-- Run this in Supabase SQL editor (or psql) after backup.
+
+ALTER TABLE seva_auth_user
+  ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW();
+
+CREATE OR REPLACE FUNCTION set_seva_auth_user_updated_at()
+RETURNS TRIGGER AS $$
+BEGIN
+  NEW.updated_at = NOW();
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_seva_auth_user_updated_at ON seva_auth_user;
+CREATE TRIGGER trg_seva_auth_user_updated_at
+BEFORE INSERT OR UPDATE ON seva_auth_user
+FOR EACH ROW
+EXECUTE FUNCTION set_seva_auth_user_updated_at();
+
+CREATE INDEX IF NOT EXISTS idx_seva_auth_user_updated_at ON seva_auth_user(updated_at);
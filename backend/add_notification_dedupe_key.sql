@@ -0,0 +1,9 @@
+-- Idempotent delivery for the notification outbox (services/notification_outbox.py).
+-- The dispatcher upserts batches on dedupe_key with ignore-duplicates, so a batch retried
+-- after a lost response does not create the same notification twice.
+-- Run this in Supabase SQL editor (or psql). Safe to run multiple times.
+
+ALTER TABLE seva_notification ADD COLUMN IF NOT EXISTS dedupe_key VARCHAR(120);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_seva_notification_dedupe_key
+    ON seva_notification (dedupe_key);
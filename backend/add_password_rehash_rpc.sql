@@ -0,0 +1,20 @@
+-- Batched password hash upgrades (authentication/password_hashing.py RehashWriter).
+-- Successful logins against an outdated hasher queue a new hash; the writer applies up to
+-- 100 of them per call. A row is only changed while it still holds the verified hash, so a
+-- password change that happened in between is never overwritten.
+-- Run this in Supabase SQL editor (or psql). Safe to run multiple times.
+
+CREATE OR REPLACE FUNCTION seva_apply_password_rehashes(p_rows JSONB)
+RETURNS INTEGER
+LANGUAGE plpgsql AS $$
+DECLARE
+    n INTEGER;
+BEGIN
+    UPDATE seva_auth_user AS u
+    SET password = r.password
+    FROM jsonb_to_recordset(p_rows) AS r(id BIGINT, password TEXT, old_password TEXT)
+    WHERE u.id = r.id AND u.password = r.old_password;
+    GET DIAGNOSTICS n = ROW_COUNT;
+    RETURN n;
+END;
+$$;
@@ -0,0 +1,39 @@
+-- Keep updated_at current on the tables mirrored by `manage.py sync_supabase_all` /
+-- `sync_supabase_users`, so incremental runs can fetch only rows with updated_at >= the
+-- stored high-water mark (services/sync_state.py). Users are covered by
+-- add_auth_user_updated_at_trigger.sql.
+-- Run this in Supabase SQL editor (or psql) after backup.
+
+CREATE OR REPLACE FUNCTION set_seva_row_updated_at()
+RETURNS TRIGGER AS $$
+BEGIN
+  NEW.updated_at = NOW();
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+DECLARE
+  t TEXT;
+BEGIN
+  FOREACH t IN ARRAY ARRAY[
+    'seva_service',
+    'seva_booking',
+    'seva_review',
+    'seva_referral',
+    'seva_payment',
+    'seva_provider_verification'
+  ]
+  LOOP
+    IF to_regclass(t) IS NULL THEN
+      CONTINUE;
+    END IF;
+    EXECUTE format('ALTER TABLE %I ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()', t);
+    EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', 'trg_' || t || '_updated_at', t);
+    EXECUTE format(
+      'CREATE TRIGGER %I BEFORE INSERT OR UPDATE ON %I FOR EACH ROW EXECUTE FUNCTION set_seva_row_updated_at()',
+      'trg_' || t || '_updated_at', t
+    );
+    EXECUTE format('CREATE INDEX IF NOT EXISTS %I ON %I(updated_at)', 'idx_' || t || '_updated_at', t);
+  END LOOP;
+END $$;
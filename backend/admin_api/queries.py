@@ -1,172 +1,115 @@
 """
 Aggregates for admin dashboard and reports (local SQLite, synced from Supabase).
+Numbers come from the pre-aggregated dashboard snapshot (see snapshot.py), not live COUNTs.
 """
-from datetime import datetime, time, timedelta
+from datetime import timedelta
 from decimal import Decimal
 
-from django.db.models import Count, Q, Sum
-from django.db.models.functions import TruncMonth
 from django.utils import timezone
 
-from authentication.models import User
-from services.models import Booking, Payment, Review, Service, ServiceCategory
+from .snapshot import REVENUE_STATUSES, daily_counts, monthly_sums, snapshot_totals
 
 
-def _provider_q():
-    return Q(role='provider') | Q(role='prov')
+PENDING_BOOKING_STATUSES = ('pending', 'quoted', 'awaiting_payment')
+CONFIRMED_BOOKING_STATUSES = ('confirmed', 'paid', 'accepted')
+CANCELLED_BOOKING_STATUSES = ('cancelled', 'rejected', 'cancel_req')
 
 
-def dashboard_stats():
-    users_total = User.objects.count()
-    customers = User.objects.filter(role='customer').count()
-    providers = User.objects.filter(_provider_q()).count()
-    admins = User.objects.filter(role='admin').count()
+def _count(bucket_map, keys=None):
+    return sum(count for key, (count, _amount) in (bucket_map or {}).items() if keys is None or key in keys)
 
-    bookings_total = Booking.objects.count()
-    bookings_pending = Booking.objects.filter(
-        status__in=['pending', 'quoted', 'awaiting_payment']
-    ).count()
-    bookings_confirmed = Booking.objects.filter(
-        Q(status='confirmed') | Q(status='paid') | Q(status='accepted')
-    ).count()
-    bookings_completed = Booking.objects.filter(status='completed').count()
-    bookings_cancelled = Booking.objects.filter(
-        Q(status='cancelled') | Q(status='rejected') | Q(status='cancel_req')
-    ).count()
-
-    pending_verification_requests = User.objects.filter(
-        _provider_q(), verification_status='pending'
-    ).count()
-
-    total_services = Service.objects.count()
-    total_categories = ServiceCategory.objects.count()
-    total_reviews = Review.objects.count()
-
-    revenue = Payment.objects.filter(
-        status__in=['completed', 'paid', 'success']
-    ).aggregate(s=Sum('amount'))['s'] or Decimal('0')
-    payments_count = Payment.objects.count()
 
+def dashboard_stats(totals=None):
+    """Headline counts; pass totals (snapshot_totals()) to reuse one snapshot read."""
+    totals = totals if totals is not None else snapshot_totals()
+    roles = totals.get('user_role', {})
+    bookings = totals.get('booking_status', {})
+    payments = totals.get('payment_status', {})
+    catalog = totals.get('catalog', {})
+    revenue = sum(
+        (amount or Decimal('0') for status, (_n, amount) in payments.items() if status in REVENUE_STATUSES),
+        Decimal('0'),
+    )
     return {
-        'total_users': users_total,
-        'total_customers': customers,
-        'total_providers': providers,
-        'total_admins': admins,
-        'total_bookings': bookings_total,
-        'pending_bookings': bookings_pending,
-        'confirmed_bookings': bookings_confirmed,
-        'completed_bookings': bookings_completed,
-        'cancelled_bookings': bookings_cancelled,
-        'pending_verification_requests': pending_verification_requests,
-        'total_services': total_services,
-        'total_categories': total_categories,
-        'total_reviews': total_reviews,
-        'total_payments': payments_count,
+        'total_users': _count(roles),
+        'total_customers': _count(roles, ('customer',)),
+        'total_providers': _count(roles, ('provider', 'prov')),
+        'total_admins': _count(roles, ('admin',)),
+        'total_bookings': _count(bookings),
+        'pending_bookings': _count(bookings, PENDING_BOOKING_STATUSES),
+        'confirmed_bookings': _count(bookings, CONFIRMED_BOOKING_STATUSES),
+        'completed_bookings': _count(bookings, ('completed',)),
+        'cancelled_bookings': _count(bookings, CANCELLED_BOOKING_STATUSES),
+        'pending_verification_requests': _count(totals.get('provider_verification', {}), ('pending',)),
+        'total_services': _count(catalog, ('services',)),
+        'total_categories': _count(catalog, ('categories',)),
+        'total_reviews': _count(catalog, ('reviews',)),
+        'total_payments': _count(payments),
         'total_revenue': str(revenue),
     }
 
 
-def booking_status_distribution():
-    rows = (
-        Booking.objects.values('status')
-        .annotate(c=Count('id'))
-        .order_by('-c')
+def booking_status_distribution(totals=None):
+    totals = totals if totals is not None else snapshot_totals()
+    rows = sorted(
+        ((status, count) for status, (count, _amount) in totals.get('booking_status', {}).items()),
+        key=lambda item: -item[1],
     )
-    return [{'status': r['status'] or 'unknown', 'count': r['c']} for r in rows]
+    return [{'status': status or 'unknown', 'count': count} for status, count in rows]
 
 
-def bookings_by_month(months_back=12):
-    start = timezone.now() - timedelta(days=30 * months_back)
-    qs = (
-        Booking.objects.filter(created_at__gte=start)
-        .annotate(m=TruncMonth('created_at'))
-        .values('m')
-        .annotate(count=Count('id'))
-        .order_by('m')
-    )
-    out = []
-    for row in qs:
-        m = row['m']
-        label = m.strftime('%Y-%m') if m else ''
-        out.append({'month': label, 'bookings': row['count']})
-    return out
+def _months_back_start(months_back):
+    return (timezone.now() - timedelta(days=30 * months_back)).date()
 
 
-def revenue_by_month(months_back=12):
-    start = timezone.now() - timedelta(days=30 * months_back)
-    qs = (
-        Payment.objects.filter(
-            created_at__gte=start,
-            status__in=['completed', 'paid', 'success'],
-        )
-        .annotate(m=TruncMonth('created_at'))
-        .values('m')
-        .annotate(total=Sum('amount'))
-        .order_by('m')
-    )
-    out = []
-    for row in qs:
-        m = row['m']
-        label = m.strftime('%Y-%m') if m else ''
-        total = row['total'] or Decimal('0')
-        out.append({'month': label, 'revenue': str(total)})
-    return out
+def bookings_by_month(months_back=12):
+    return [
+        {'month': month, 'bookings': count}
+        for month, count, _amount in monthly_sums('booking_day', 'created', _months_back_start(months_back))
+    ]
 
 
-def provider_verification_by_status():
-    rows = (
-        User.objects.filter(_provider_q())
-        .values('verification_status')
-        .annotate(c=Count('id'))
-        .order_by('-c')
-    )
+def revenue_by_month(months_back=12):
+    # payment_day amounts only include REVENUE_STATUSES payments.
     return [
-        {'status': r['verification_status'] or 'unknown', 'count': r['c']} for r in rows
+        {'month': month, 'revenue': str(amount)}
+        for month, count, amount in monthly_sums('payment_day', 'created', _months_back_start(months_back))
+        if amount
     ]
 
 
-def _local_day_bounds(d):
-    """Start [d 00:00) and end (exclusive) for ORM range filters (SQLite-safe vs __date)."""
-    start = timezone.make_aware(datetime.combine(d, time.min))
-    end = start + timedelta(days=1)
-    return start, end
+def provider_verification_by_status(totals=None):
+    totals = totals if totals is not None else snapshot_totals()
+    rows = sorted(
+        ((status, count) for status, (count, _amount) in totals.get('provider_verification', {}).items()),
+        key=lambda item: -item[1],
+    )
+    return [{'status': status or 'unknown', 'count': count} for status, count in rows]
 
 
 def trend_last_n_days(days: int = 90):
     """
     Daily booking/payment counts for the trend chart.
 
-    Bookings: `created_at` in each local calendar day; if `created_at` is null,
+    Bookings: `created_at` in each UTC calendar day; if `created_at` is null,
     use `booking_date`. Payments: `created_at` in that day, else `updated_at`.
-
-    Uses `[start, end)` range queries instead of `__date` — `created_at__date` can
-    match zero rows on SQLite with timezone-aware datetimes.
+    Read from the per-day rows of the dashboard snapshot (two queries for any range).
 
     Default **90 days** so older synced activity still appears on the chart.
     """
     days = max(7, min(int(days), 366))
     today = timezone.now().date()
+    start = today - timedelta(days=days - 1)
+    bookings = daily_counts('booking_day', start, today)
+    payments = daily_counts('payment_day', start, today)
     out = []
-    for i in range(days - 1, -1, -1):
-        d = today - timedelta(days=i)
-        day_start, day_end = _local_day_bounds(d)
-        bc = Booking.objects.filter(
-            Q(created_at__gte=day_start, created_at__lt=day_end)
-            | Q(created_at__isnull=True, booking_date=d)
-        ).count()
-        pc = Payment.objects.filter(
-            Q(created_at__gte=day_start, created_at__lt=day_end)
-            | Q(
-                created_at__isnull=True,
-                updated_at__gte=day_start,
-                updated_at__lt=day_end,
-            )
-        ).count()
+    for i in range(days):
+        d = (start + timedelta(days=i)).isoformat()
         out.append(
             {
-                'date': d.isoformat(),
-                'bookings': bc,
-                'payments': pc,
+                'date': d,
+                'bookings': bookings.get(d, 0),
+                'payments': payments.get(d, 0),
             }
         )
     return out
@@ -177,8 +120,8 @@ def trend_last_7_days():
     return trend_last_n_days(7)
 
 
-def market_pulse_score():
-    stats = dashboard_stats()
+def market_pulse_score(stats=None):
+    stats = stats if stats is not None else dashboard_stats()
     total = stats['total_bookings'] or 1
     completed = stats['completed_bookings']
     pending = stats['pending_bookings']
@@ -0,0 +1,317 @@
+"""
+Pre-aggregated dashboard numbers (SQLite table seva_dashboard_snapshot).
+
+The dashboard and reports used to run one COUNT/SUM per card and two COUNTs per chart day.
+Each source table is now scanned once with a grouped, conditional aggregation. The result
+is stored as a few rows of (metric, bucket, day, row_count, amount):
+
+  user_role              bucket=role                        total users per role
+  provider_verification  bucket=verification_status         providers only
+  booking_status         bucket=status                      total bookings per status
+  booking_day            bucket=created|booking_date, day   bookings per UTC day (created_at,
+                                                            else booking_date)
+  payment_status         bucket=status                      count + summed amount per status
+  payment_day            bucket=created|updated, day        payments per day (created_at, else
+                                                            updated_at) + revenue amount
+  catalog                bucket=services|categories|reviews
+  _refreshed             bucket=section                     amount = ISO time of the rebuild
+
+Refreshes are per section (users, bookings, payments, catalog). run_sync_once() calls
+refresh_snapshot() after each sync, and only sections whose mirrored tables received rows
+since their last rebuild are recomputed. SNAPSHOT_MAX_AGE_SECONDS is a safety net for
+direct edits to the mirror. Readers (snapshot_totals, daily_counts, monthly_sums) build
+the snapshot on first use.
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal, InvalidOperation
+
+from django.db import connection
+from django.utils import timezone
+
+from authentication.models import User
+from services.models import Booking, Payment, Review, Service, ServiceCategory
+from services.sync_state import all_sync_states, ensure_sync_state_table
+
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_TABLE = 'seva_dashboard_snapshot'
+SNAPSHOT_MAX_AGE_SECONDS = 15 * 60
+REFRESHED_METRIC = '_refreshed'
+REVENUE_STATUSES = ('completed', 'paid', 'success')
+TWO_PLACES = Decimal('0.01')
+
+# section -> Supabase tables whose sync makes it stale (names as in seva_sync_state)
+SECTION_SOURCES = {
+    'users': ('seva_auth_user',),
+    'bookings': (Booking._meta.db_table,),
+    'payments': (Payment._meta.db_table,),
+    'catalog': (Service._meta.db_table, ServiceCategory._meta.db_table, Review._meta.db_table),
+}
+
+_refresh_lock = threading.Lock()
+
+
+def _raw():
+    connection.ensure_connection()
+    return connection.connection
+
+
+def ensure_snapshot_table(raw):
+    raw.execute(f"""
+        CREATE TABLE IF NOT EXISTS {SNAPSHOT_TABLE} (
+            metric VARCHAR(40) NOT NULL,
+            bucket VARCHAR(80) NOT NULL DEFAULT '',
+            day VARCHAR(10) NOT NULL DEFAULT '',
+            row_count INTEGER NOT NULL DEFAULT 0,
+            amount TEXT,
+            PRIMARY KEY (metric, bucket, day)
+        )
+    """)
+
+
+def _day_sql(column):
+    # date() normalizes ISO strings with offsets to UTC; substr() covers anything it rejects.
+    return f"COALESCE(date({column}), substr({column}, 1, 10))"
+
+
+def _amount(value):
+    try:
+        return Decimal(str(value or 0)).quantize(TWO_PLACES)
+    except (InvalidOperation, ValueError):
+        return Decimal('0.00')
+
+
+# --- one grouped pass per section ------------------------------------------
+
+
+def _users_rows(raw):
+    rows = []
+    by_role = {}
+    provider_status = {}
+    cur = raw.execute(
+        f"SELECT role, verification_status, COUNT(*) FROM {User._meta.db_table} GROUP BY role, verification_status"
+    )
+    for role, verification_status, count in cur.fetchall():
+        by_role[role or ''] = by_role.get(role or '', 0) + count
+        if role in ('provider', 'prov'):
+            key = verification_status or 'unknown'
+            provider_status[key] = provider_status.get(key, 0) + count
+    rows.extend(('user_role', role, '', count, None) for role, count in by_role.items())
+    rows.extend(('provider_verification', s, '', count, None) for s, count in provider_status.items())
+    return rows
+
+
+def _bookings_rows(raw):
+    table = Booking._meta.db_table
+    status_totals = {}
+    days = {}
+    cur = raw.execute(f"""
+        SELECT status,
+               created_at IS NULL AS no_created,
+               CASE WHEN created_at IS NULL THEN {_day_sql('booking_date')} ELSE {_day_sql('created_at')} END AS d,
+               COUNT(*)
+        FROM {table}
+        GROUP BY status, no_created, d
+    """)
+    for status, no_created, day, count in cur.fetchall():
+        status_totals[status or ''] = status_totals.get(status or '', 0) + count
+        if day:
+            key = ('booking_date' if no_created else 'created', day)
+            days[key] = days.get(key, 0) + count
+    rows = [('booking_status', status, '', count, None) for status, count in status_totals.items()]
+    rows.extend(('booking_day', bucket, day, count, None) for (bucket, day), count in days.items())
+    return rows
+
+
+def _payments_rows(raw):
+    table = Payment._meta.db_table
+    placeholders = ', '.join('?' * len(REVENUE_STATUSES))
+    status_totals = {}
+    days = {}
+    cur = raw.execute(f"""
+        SELECT status,
+               created_at IS NULL AS no_created,
+               CASE WHEN created_at IS NULL THEN {_day_sql('updated_at')} ELSE {_day_sql('created_at')} END AS d,
+               COUNT(*),
+               SUM(amount),
+               SUM(CASE WHEN status IN ({placeholders}) THEN amount ELSE 0 END)
+        FROM {table}
+        GROUP BY status, no_created, d
+    """, REVENUE_STATUSES)
+    for status, no_created, day, count, amount, revenue in cur.fetchall():
+        count_before, amount_before = status_totals.get(status or '', (0, Decimal('0')))
+        status_totals[status or ''] = (count_before + count, amount_before + _amount(amount))
+        if day:
+            key = ('updated' if no_created else 'created', day)
+            count_before, revenue_before = days.get(key, (0, Decimal('0')))
+            days[key] = (count_before + count, revenue_before + _amount(revenue))
+    rows = [('payment_status', status, '', c, str(a)) for status, (c, a) in status_totals.items()]
+    rows.extend(('payment_day', bucket, day, c, str(r)) for (bucket, day), (c, r) in days.items())
+    return rows
+
+
+def _catalog_rows(raw):
+    cur = raw.execute(f"""
+        SELECT (SELECT COUNT(*) FROM {Service._meta.db_table}),
+               (SELECT COUNT(*) FROM {ServiceCategory._meta.db_table}),
+               (SELECT COUNT(*) FROM {Review._meta.db_table})
+    """)
+    services, categories, reviews = cur.fetchone()
+    return [
+        ('catalog', 'services', '', services, None),
+        ('catalog', 'categories', '', categories, None),
+        ('catalog', 'reviews', '', reviews, None),
+    ]
+
+
+SECTIONS = {
+    'users': (('user_role', 'provider_verification'), _users_rows),
+    'bookings': (('booking_status', 'booking_day'), _bookings_rows),
+    'payments': (('payment_status', 'payment_day'), _payments_rows),
+    'catalog': (('catalog',), _catalog_rows),
+}
+
+
+def _rebuild_section(raw, section):
+    metrics, build = SECTIONS[section]
+    rows = build(raw)
+    now_iso = timezone.now().isoformat()
+    owns_transaction = not raw.in_transaction
+    if owns_transaction:
+        raw.execute('BEGIN')
+    try:
+        raw.execute(
+            f"DELETE FROM {SNAPSHOT_TABLE} WHERE metric IN ({', '.join('?' * len(metrics))})", metrics
+        )
+        raw.executemany(
+            f"INSERT OR REPLACE INTO {SNAPSHOT_TABLE} (metric, bucket, day, row_count, amount) VALUES (?, ?, ?, ?, ?)",
+            rows,
+        )
+        raw.execute(
+            f"INSERT OR REPLACE INTO {SNAPSHOT_TABLE} (metric, bucket, day, row_count, amount) VALUES (?, ?, '', ?, ?)",
+            (REFRESHED_METRIC, section, len(rows), now_iso),
+        )
+    except Exception:
+        if owns_transaction:
+            raw.execute('ROLLBACK')
+        raise
+    if owns_transaction:
+        raw.execute('COMMIT')
+    return len(rows)
+
+
+def _parse_ts(value):
+    if not value:
+        return None
+    try:
+        ts = datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=dt_timezone.utc)
+    return ts
+
+
+def _refreshed_at(raw):
+    cur = raw.execute(f"SELECT bucket, amount FROM {SNAPSHOT_TABLE} WHERE metric = ?", (REFRESHED_METRIC,))
+    return {bucket: _parse_ts(amount) for bucket, amount in cur.fetchall()}
+
+
+def _stale_sections(raw, force=False):
+    refreshed = _refreshed_at(raw)
+    if force:
+        return list(SECTIONS)
+    ensure_sync_state_table(raw)
+    synced = {s.get('table_name'): s for s in all_sync_states(raw)}
+    now = timezone.now()
+    stale = []
+    for section, sources in SECTION_SOURCES.items():
+        at = refreshed.get(section)
+        if at is None or (now - at).total_seconds() >= SNAPSHOT_MAX_AGE_SECONDS:
+            stale.append(section)
+            continue
+        for table in sources:
+            state = synced.get(table) or {}
+            finished = _parse_ts(state.get('last_finished_at'))
+            if finished is not None and finished > at and int(state.get('last_row_count') or 0) > 0:
+                stale.append(section)
+                break
+    return stale
+
+
+def refresh_snapshot(force=False):
+    """Rebuild the sections whose source tables changed since their last rebuild. Returns them."""
+    with _refresh_lock:
+        raw = _raw()
+        ensure_snapshot_table(raw)
+        sections = _stale_sections(raw, force=force)
+        for section in sections:
+            started = time.time()
+            count = _rebuild_section(raw, section)
+            logger.debug('dashboard snapshot %s: %s rows in %.3fs', section, count, time.time() - started)
+        return sections
+
+
+def _ensure_built(raw):
+    ensure_snapshot_table(raw)
+    if len(_refreshed_at(raw)) < len(SECTIONS):
+        refresh_snapshot()
+
+
+# --- reads -----------------------------------------------------------------
+
+
+def snapshot_totals():
+    """{metric: {bucket: (row_count, amount)}} for every day-less metric (a few dozen rows)."""
+    raw = _raw()
+    _ensure_built(raw)
+    out = {}
+    cur = raw.execute(
+        f"SELECT metric, bucket, row_count, amount FROM {SNAPSHOT_TABLE} WHERE day = '' AND metric != ?",
+        (REFRESHED_METRIC,),
+    )
+    for metric, bucket, count, amount in cur.fetchall():
+        out.setdefault(metric, {})[bucket] = (count or 0, _amount(amount) if amount is not None else None)
+    return out
+
+
+def daily_counts(metric, start_day, end_day):
+    """{day iso: row_count} summed over buckets for start_day <= day <= end_day."""
+    raw = _raw()
+    _ensure_built(raw)
+    cur = raw.execute(
+        f"""SELECT day, SUM(row_count) FROM {SNAPSHOT_TABLE}
+            WHERE metric = ? AND day >= ? AND day <= ? GROUP BY day""",
+        (metric, start_day.isoformat(), end_day.isoformat()),
+    )
+    return {day: count or 0 for day, count in cur.fetchall()}
+
+
+def monthly_sums(metric, bucket, start_day):
+    """[(YYYY-MM, row_count, amount)] for one bucket of a daily metric from start_day on."""
+    raw = _raw()
+    _ensure_built(raw)
+    cur = raw.execute(
+        f"""SELECT substr(day, 1, 7) AS m, SUM(row_count), GROUP_CONCAT(amount, '|')
+            FROM {SNAPSHOT_TABLE}
+            WHERE metric = ? AND bucket = ? AND day >= ?
+            GROUP BY m ORDER BY m""",
+        (metric, bucket, start_day.isoformat()),
+    )
+    out = []
+    for month, count, amounts in cur.fetchall():
+        total = sum((_amount(a) for a in (amounts or '').split('|') if a), Decimal('0.00'))
+        out.append((month, count or 0, total))
+    return out
+
+
+def snapshot_status():
+    """{section: ISO time of its last rebuild or None}."""
+    raw = _raw()
+    ensure_snapshot_table(raw)
+    refreshed = _refreshed_at(raw)
+    return {section: refreshed[section].isoformat() if refreshed.get(section) else None for section in SECTIONS}
@@ -1,9 +1,19 @@
 """
-Supabase writes for admin actions. SQLite is refreshed via throttled sync.
+Supabase writes for admin actions. SQLite is refreshed via throttled sync; the shared
+services cache is invalidated through services.cache_events. Notifications go through the
+outbox (services.notification_outbox).
 """
 import re
 from datetime import datetime, timezone
 
+from services.cache_events import (
+    publish_catalog_changed,
+    publish_provider_changed,
+    publish_review_changed,
+    publish_service_changed,
+)
+from services.notification_outbox import enqueue_notifications, notification_row
+from services.rating_summary import apply_review_change
 from supabase_config import get_supabase_client
 
 
@@ -65,6 +75,7 @@ def update_provider_verification_rows(
         payload['status'] = candidate
         try:
             _safe_update(payload)
+            publish_provider_changed(provider_id)
             return
         except Exception as e:
             last_error = e
@@ -74,15 +85,16 @@ def update_provider_verification_rows(
 
 
 def supabase_insert_notification(user_id, title, body, booking_id=None):
-    supabase = get_supabase_client()
-    row = {
-        'user_id': int(user_id),
-        'title': (title or '')[:200],
-        'body': body or '',
-    }
-    if booking_id is not None:
-        row['booking_id'] = int(booking_id)
-    return supabase.table('seva_notification').insert(row).execute()
+    """Queue one notification through the outbox; returns the number of rows queued."""
+    return enqueue_notifications([notification_row(user_id, title, body, booking_id=booking_id)])
+
+
+def supabase_insert_notifications(user_ids, title, body, booking_id=None):
+    """Queue the same notification for many users as one batch; returns rows queued."""
+    return enqueue_notifications([
+        notification_row(uid, title, body, booking_id=booking_id)
+        for uid in dict.fromkeys(user_ids or ())
+    ])
 
 
 def supabase_list_notifications(limit=200, offset=0):
@@ -107,9 +119,18 @@ def supabase_update_booking_status(booking_id, status):
     )
 
 
+def _publish_service_rows_changed(rows):
+    for row in rows or []:
+        publish_service_changed(row.get('category_id'), row.get('provider_id'))
+
+
 def supabase_delete_review(review_id):
     supabase = get_supabase_client()
-    return supabase.table('seva_review').delete().eq('id', int(review_id)).execute()
+    r = supabase.table('seva_review').delete().eq('id', int(review_id)).execute()
+    for row in (r.data or []):
+        apply_review_change(supabase, row.get('provider_id'), old_rating=row.get('rating'))
+        publish_review_changed(row.get('provider_id'))
+    return r
 
 
 def supabase_upsert_service(payload, service_id=None):
@@ -119,14 +140,28 @@ def supabase_upsert_service(payload, service_id=None):
     data = {k: v for k, v in payload.items() if v is not None}
     data.setdefault('updated_at', now_iso)
     if service_id:
-        return supabase.table('seva_service').update(data).eq('id', int(service_id)).execute()
+        # Old (category, provider) keys go stale too when a service is moved.
+        before = (
+            supabase.table('seva_service')
+            .select('category_id,provider_id')
+            .eq('id', int(service_id))
+            .execute()
+        )
+        r = supabase.table('seva_service').update(data).eq('id', int(service_id)).execute()
+        _publish_service_rows_changed(before.data)
+        _publish_service_rows_changed(r.data)
+        return r
     data.setdefault('created_at', now_iso)
-    return supabase.table('seva_service').insert(data).execute()
+    r = supabase.table('seva_service').insert(data).execute()
+    _publish_service_rows_changed(r.data)
+    return r
 
 
 def supabase_delete_service(service_id):
     supabase = get_supabase_client()
-    return supabase.table('seva_service').delete().eq('id', int(service_id)).execute()
+    r = supabase.table('seva_service').delete().eq('id', int(service_id)).execute()
+    _publish_service_rows_changed(r.data)
+    return r
 
 
 def supabase_upsert_category(payload, category_id=None):
@@ -134,14 +169,18 @@ def supabase_upsert_category(payload, category_id=None):
     now_iso = datetime.now(timezone.utc).isoformat()
     data = {k: v for k, v in payload.items() if v is not None}
     if category_id:
-        return supabase.table('seva_servicecategory').update(data).eq('id', int(category_id)).execute()
+        r = supabase.table('seva_servicecategory').update(data).eq('id', int(category_id)).execute()
+        publish_catalog_changed()
+        return r
     data.setdefault('created_at', now_iso)
     return supabase.table('seva_servicecategory').insert(data).execute()
 
 
 def supabase_delete_category(category_id):
     supabase = get_supabase_client()
-    return supabase.table('seva_servicecategory').delete().eq('id', int(category_id)).execute()
+    r = supabase.table('seva_servicecategory').delete().eq('id', int(category_id)).execute()
+    publish_catalog_changed()
+    return r
 
 
 def fetch_provider_verification_docs(provider_id):
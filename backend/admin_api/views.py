@@ -1,6 +1,6 @@
 """
 Admin REST API views — JWT + IsHamroAdmin.
-Reads: Django ORM (synced SQLite). Writes: Supabase helpers + throttled sync.
+Reads: Django ORM (synced SQLite). Writes: Supabase helpers + background mirror sync (services/sync_worker.py).
 """
 from datetime import datetime, timezone
 from decimal import Decimal
@@ -12,18 +12,24 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
 from authentication.models import User
+from authentication.password_hashing import hashing_stats
 from services.admin_sync import ensure_admin_data_synced
 from services.models import Booking, Payment, Review, Service, ServiceCategory
+from services.notification_outbox import outbox_status
+from services.shared_cache import cache_stats
+from services.sync_worker import sync_status
 
 from .pagination import AdminPageNumberPagination
 from .permissions import IsHamroAdmin
 from . import queries
+from .snapshot import snapshot_totals
 from .supabase_admin import (
     fetch_provider_verification_docs,
     supabase_delete_category,
     supabase_delete_review,
     supabase_delete_service,
     supabase_insert_notification,
+    supabase_insert_notifications,
     supabase_list_notifications,
     supabase_update_booking_status,
     supabase_upsert_category,
@@ -58,10 +64,11 @@ def _decimal_str(d):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated, IsHamroAdmin])
 def dashboard_overview(request):
-    stats = queries.dashboard_stats()
-    pulse = queries.market_pulse_score()
+    totals = snapshot_totals()
+    stats = queries.dashboard_stats(totals)
+    pulse = queries.market_pulse_score(stats)
     trend = queries.trend_last_n_days(90)
-    dist = queries.booking_status_distribution()
+    dist = queries.booking_status_distribution(totals)
     total_b = stats['total_bookings'] or 1
     pipeline = []
     for row in dist:
@@ -108,6 +115,7 @@ def dashboard_overview(request):
             'pipeline': pipeline,
             'mix': mix,
             'recent_actions': recent_actions,
+            'sync': sync_status(),
         }
     )
 
@@ -117,12 +125,13 @@ def dashboard_overview(request):
 def reports_charts(request):
     months = int(request.query_params.get('months', '12'))
     months = max(1, min(months, 36))
+    totals = snapshot_totals()
     return Response(
         {
             'bookings_by_month': queries.bookings_by_month(months),
             'revenue_by_month': queries.revenue_by_month(months),
-            'provider_verification': queries.provider_verification_by_status(),
-            'booking_status_distribution': queries.booking_status_distribution(),
+            'provider_verification': queries.provider_verification_by_status(totals),
+            'booking_status_distribution': queries.booking_status_distribution(totals),
         }
     )
 
@@ -978,23 +987,37 @@ def admin_notifications(request):
         return Response({'count': len(rows), 'results': rows})
 
     uid = request.data.get('user_id')
+    user_ids = request.data.get('user_ids')
     title = (request.data.get('title') or '').strip()
     body = (request.data.get('body') or '').strip()
-    if uid is None or not title:
+    if (uid is None and not user_ids) or not title:
         return Response(
-            {'detail': 'user_id and title required'},
+            {'detail': 'user_id (or user_ids) and title required'},
             status=status.HTTP_400_BAD_REQUEST,
         )
+    if user_ids and not isinstance(user_ids, (list, tuple)):
+        return Response({'detail': 'user_ids must be a list'}, status=status.HTTP_400_BAD_REQUEST)
     try:
-        supabase_insert_notification(
-            int(uid),
-            title,
-            body,
-            booking_id=request.data.get('booking_id'),
-        )
+        if user_ids:
+            # Fan-out to many users: one outbox batch, delivered as a bulk insert.
+            queued = supabase_insert_notifications(
+                [int(u) for u in user_ids],
+                title,
+                body,
+                booking_id=request.data.get('booking_id'),
+            )
+        else:
+            queued = supabase_insert_notification(
+                int(uid),
+                title,
+                body,
+                booking_id=request.data.get('booking_id'),
+            )
+    except (TypeError, ValueError):
+        return Response({'detail': 'user ids must be integers'}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as exc:
         return Response({'detail': str(exc)}, status=status.HTTP_502_BAD_GATEWAY)
-    return Response({'detail': 'sent'}, status=status.HTTP_201_CREATED)
+    return Response({'detail': 'sent', 'queued': queued}, status=status.HTTP_201_CREATED)
 
 
 @api_view(['GET'])
@@ -1005,5 +1028,8 @@ def admin_settings(request):
             'project': 'Hamro Sewa',
             'admin_panel': 'Use JWT from /api/auth/login/ with an admin account.',
             'sync': 'Data lists use SQLite synced from Supabase; mutations refresh via sync.',
+            'cache': cache_stats(),
+            'password_hashing': hashing_stats(),
+            'notifications': outbox_status(),
         }
     )
@@ -6,35 +6,22 @@ from __future__ import annotations
 
 import logging
 import re
-from collections import defaultdict
 from typing import Any, Dict, List, Optional, Tuple
 
 from supabase_config import get_supabase_client
 
 # Reuse the same enrichment + verification logic as the public services API
+from services.gazetteer import gazetteer
+from services.rating_summary import rating_average, rating_summaries
+from services.search_index import service_search_index
 from services.views import (
     _filter_services_by_provider_location,
     _get_services_raw_from_supabase,
+    _searchable_services,
 )
 
 logger = logging.getLogger(__name__)
 
-# Common Nepal place tokens (lowercase) → filter hint for provider_district / provider_city
-PLACE_ALIASES = (
-    'kathmandu',
-    'lalitpur',
-    'bhaktapur',
-    'pokhara',
-    'biratnagar',
-    'birgunj',
-    'dharan',
-    'hetauda',
-    'butwal',
-    'nepalgunj',
-    'chitwan',
-    'janakpur',
-)
-
 # Words that suggest sorting / filters
 VERIFIED_WORDS = ('verified', 'verification', 'trust', 'approved')
 CHEAP_WORDS = ('cheap', 'affordable', 'lowest', 'budget', 'economical', 'less expensive')
@@ -89,37 +76,18 @@ GENERIC_QUERY_STOPWORDS = {
 }
 
 
-def _fetch_review_stats_by_provider() -> Dict[int, Dict[str, float]]:
-    """Average rating and count per provider from seva_review."""
-    supabase = get_supabase_client()
-    out: Dict[int, Dict[str, float]] = defaultdict(lambda: {'sum': 0.0, 'count': 0.0})
+def _fetch_review_stats_by_provider(provider_ids) -> Dict[int, Dict[str, float]]:
+    """Average rating and count for the given providers (materialized rating summaries)."""
     try:
-        r = supabase.table('seva_review').select('provider_id,rating').execute()
+        summaries = rating_summaries(get_supabase_client(), provider_ids)
     except Exception as e:
-        logger.warning('Could not load reviews for AI retrieval: %s', e)
+        logger.warning('Could not load rating summaries for AI retrieval: %s', e)
         return {}
-    for row in r.data or []:
-        pid = row.get('provider_id')
-        rating = row.get('rating')
-        if pid is None or rating is None:
-            continue
-        try:
-            rv = float(rating)
-        except (TypeError, ValueError):
-            continue
-        pid = int(pid)
-        out[pid]['sum'] += rv
-        out[pid]['count'] += 1.0
-    stats = {}
-    for pid, agg in out.items():
-        c = int(agg['count'])
-        if c == 0:
-            continue
-        stats[pid] = {
-            'review_count': c,
-            'avg_rating': round(agg['sum'] / c, 2),
-        }
-    return stats
+    return {
+        pid: {'review_count': summary['rating_count'], 'avg_rating': rating_average(summary)}
+        for pid, summary in summaries.items()
+        if summary.get('rating_count')
+    }
 
 
 def _load_category_names() -> List[Tuple[int, str]]:
@@ -145,7 +113,8 @@ def _parse_intent(query: str) -> Dict[str, Any]:
         'verified_only': any(w in q for w in VERIFIED_WORDS),
         'sort_cheap': any(w in q for w in CHEAP_WORDS),
         'sort_best': any(w in q for w in BEST_WORDS),
-        'location_terms': [p for p in PLACE_ALIASES if p in q],
+        # Canonicalized by the bundled gazetteer (aliases and misspellings included).
+        'locations': [place._asdict() for place in gazetteer.find_in_text(q)],
         'category_ids': [],
         'request_all_services': any(w in q for w in ALL_SERVICES_WORDS),
         'request_all_providers': any(w in q for w in ALL_PROVIDERS_WORDS),
@@ -167,6 +136,7 @@ def _parse_intent(query: str) -> Dict[str, Any]:
 
     # De-dupe category ids
     intent['category_ids'] = list(dict.fromkeys(intent['category_ids']))
+    intent['location_terms'] = [place['name'] for place in intent['locations']]
     return intent
 
 
@@ -187,20 +157,21 @@ def _keyword_narrow(services: List[Dict[str, Any]], query: str) -> List[Dict[str
         t
         for t in re.split(r'[\s,./+&\-]+', q)
         if len(t) >= 4 and t not in GENERIC_QUERY_STOPWORDS
+        # Place names are handled by the location filter; the index also holds location text.
+        and gazetteer.lookup(t) is None
     ]
     if not tokens:
         return services
-    out = []
-    for s in services:
-        blob = ' '.join(
-            [
-                str(s.get('category_name') or ''),
-                str(s.get('provider_profession') or ''),
-                str(s.get('title') or ''),
-            ]
-        ).lower()
-        if any(t in blob for t in tokens):
-            out.append(s)
+    # Postings lookup (exact + prefix) instead of scanning a text blob per service.
+    try:
+        service_search_index.ensure_fresh(
+            lambda: _searchable_services(_get_services_raw_from_supabase())
+        )
+        ids = service_search_index.matching_ids(' '.join(tokens))
+    except Exception as e:
+        logger.warning('Search index unavailable for AI keyword narrowing: %s', e)
+        return services
+    out = [s for s in services if s.get('id') in ids]
     return out if out else services
 
 
@@ -230,11 +201,10 @@ def retrieve_for_query(query: str, *, limit: int = 12) -> Tuple[List[Dict[str, A
 
     # Location: use existing filter helper (district/city exact match)
     # Map first matched place token to a city filter (common pattern in your DB)
-    if intent['location_terms']:
+    if intent['locations']:
         # Prefer city match; many rows store city name under provider_city
-        term = intent['location_terms'][0]
-        title = term.title()  # e.g. Kathmandu
-        services = _filter_services_by_provider_location(services, '', title)
+        place = intent['locations'][0]
+        services = _filter_services_by_provider_location(services, '', place['name'])
         if not services:
             services = _get_services_raw_from_supabase()
             if intent['category_ids']:
@@ -242,13 +212,14 @@ def retrieve_for_query(query: str, *, limit: int = 12) -> Tuple[List[Dict[str, A
                 services = [s for s in services if s.get('category_id') in cids]
             else:
                 services = _keyword_narrow(services, query)
-            services = _filter_services_by_provider_location(services, title, '')
+            # A town falls back to its whole district ("Pokhara" -> Kaski).
+            services = _filter_services_by_provider_location(services, place['district'], '')
 
     # Verified-only: use flags from enrichment
     if intent['verified_only']:
         services = [s for s in services if s.get('provider_is_verified') is True]
 
-    review_stats = _fetch_review_stats_by_provider()
+    review_stats = _fetch_review_stats_by_provider({s.get('provider_id') for s in services})
 
     enriched: List[Dict[str, Any]] = []
     for s in services:
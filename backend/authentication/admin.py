@@ -19,7 +19,9 @@ def _normalize_verification_status(value):
     return aliases.get(raw, raw if raw in {'unverified', 'pending', 'approved', 'rejected'} else 'unverified')
 
 from .forms import UserAdminChangeForm
+from .user_cache import forget_user
 from services.admin_sync import ensure_admin_data_synced
+from services.cache_events import publish_provider_changed
 
 ID_DOCUMENT_TYPES = {'national_id', 'citizenship_card', 'passport'}
 QUALIFICATION_DOCUMENT_TYPES = {'service_certificate', 'work_licence', 'qualification_certificate', 'training_certificate'}
@@ -66,6 +68,7 @@ def _update_provider_verification_status(supabase, provider_id, status_value, re
         payload['status'] = candidate
         try:
             _safe_update(payload)
+            publish_provider_changed(provider_id)
             return
         except Exception as e:
             last_error = e
@@ -231,6 +234,7 @@ class UserAdmin(BaseUserAdmin):
             'reviewed_by': request.user.id,
             'reviewed_at': now_iso,
         }).eq('id', user_id).execute()
+        forget_user(user_id)
         _update_provider_verification_status(
             supabase=supabase,
             provider_id=user_id,
@@ -375,6 +379,7 @@ class UserAdmin(BaseUserAdmin):
                     payload['is_verified'] = False
                     payload['rejection_reason'] = None
                 supabase.table('seva_auth_user').update(payload).eq('id', pid).execute()
+                forget_user(pid)
                 _update_provider_verification_status(
                     supabase=supabase,
                     provider_id=pid,
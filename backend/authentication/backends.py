@@ -1,7 +1,7 @@
 from django.contrib.auth.backends import BaseBackend
 from django.contrib.auth import get_user_model
-from django.contrib.auth.hashers import check_password
 from .models import User
+from .password_hashing import check_and_upgrade
 
 class SupabaseAuthBackend(BaseBackend):
     """
@@ -27,22 +27,17 @@ class SupabaseAuthBackend(BaseBackend):
         try:
             # Find user: same logic as LoginSerializer (email, phone, or username case-insensitive)
             if '@' in username:
-                user = UserModel.objects.get(email=username)
+                user = UserModel.objects.get_by_email_ignore_case(username)
             elif username.isdigit():
-                user = UserModel.objects.get(phone=username)
+                user = UserModel.objects.find_by_identity('phone', username)
             else:
-                try:
-                    user = UserModel.objects.get(username=username)
-                except UserModel.DoesNotExist:
-                    user = UserModel.objects.get_by_username_ignore_case(username)
+                user = UserModel.objects.get_by_username_ignore_case(username)
             
             stored = getattr(user, 'password', None) or ''
-            # Prefer Django hash check (pbkdf2_sha256$...); supports existing hashed rows.
-            if check_password(password, stored):
-                return user
-            # Backward compatibility: if stored value does not look like a hash, allow plain comparison
-            # (so existing plain-text users can still log in until they change password or you migrate).
-            if '$' not in str(stored) and (str(stored).strip() == password or stored == password):
+            # Django hash check on the bounded hashing pool. Plain-text legacy rows still match
+            # and, like outdated hashes, are upgraded in the background. PasswordHashingBusy
+            # propagates so callers can answer "busy" instead of "invalid password".
+            if check_and_upgrade(user.id, password, stored):
                 return user
                     
         except UserModel.DoesNotExist:
@@ -1,11 +1,29 @@
 """
 Sync users from Supabase seva_auth_user into SQLite authentication_user
-so Django admin User list shows them. Run: python manage.py sync_supabase_users
+so Django admin User list shows them. Run: python manage.py sync_supabase_users [--full]
+Incremental by default (high-water mark in seva_sync_state, see services/sync_state.py).
+Users are streamed page by page; each page's verification documents are read for that page
+only and the rows go to SQLite in bounded batches, so memory does not grow with the table.
 """
+import time
+
 from django.core.management.base import BaseCommand
 from django.db import connection
 from django.utils import timezone
 
+from services.supabase_batch import select_in
+from services.sync_state import (
+    MODE_FULL,
+    PAGE_SIZE,
+    BatchWriter,
+    MarkTracker,
+    choose_mode,
+    ensure_sync_state_table,
+    iter_pages,
+    load_sync_state,
+    save_sync_state,
+)
+
 
 def _to_sqlite_scalar(val):
     """Ensure value is a scalar (int, str, float, bytes, None) for SQLite parameter binding.
@@ -24,9 +42,198 @@ def _to_sqlite_scalar(val):
     return str(val)
 
 
+USER_TABLE = 'seva_auth_user'
+VERIFICATION_TABLE = 'seva_provider_verification'
+
+
+_STATUS_ALIASES = {
+    'pending_verification': 'pending',
+    'under_review': 'pending',
+    'on_hold': 'pending',
+    'verified': 'approved',
+}
+_KNOWN_STATUSES = {'unverified', 'pending', 'approved', 'rejected'}
+
+
+def _normalize_status(status_raw):
+    status_raw = (status_raw or '').strip().lower()
+    return _STATUS_ALIASES.get(status_raw, status_raw if status_raw in _KNOWN_STATUSES else 'unverified')
+
+
+def _verification_statuses(supabase, provider_ids):
+    """(provider_id -> latest reviewed status, provider ids with any document) for one page of users."""
+    provider_status_map = {}
+    providers_with_docs = set()
+    if not provider_ids:
+        return provider_status_map, providers_with_docs
+    try:
+        try:
+            docs = select_in(
+                supabase, VERIFICATION_TABLE, 'provider_id', provider_ids,
+                columns='id,provider_id,status,created_at,updated_at,reviewed_at',
+            )
+        except Exception:
+            # Older schema may not have updated_at/reviewed_at.
+            docs = select_in(
+                supabase, VERIFICATION_TABLE, 'provider_id', provider_ids, columns='id,provider_id,status,created_at',
+            )
+    except Exception:
+        return {}, set()
+    for row in docs:
+        pid = row.get('provider_id')
+        if pid is None:
+            continue
+        providers_with_docs.add(pid)
+        status = _normalize_status(row.get('status'))
+        if status == 'unverified':
+            continue
+        ts = row.get('reviewed_at') or row.get('updated_at') or row.get('created_at') or ''
+        prev = provider_status_map.get(pid)
+        if prev is None or str(ts) >= str(prev[0]):
+            provider_status_map[pid] = (str(ts), status)
+    return provider_status_map, providers_with_docs
+
+
+def _user_values(row, provider_status_map, providers_with_docs, now):
+    """authentication_user column -> SQLite scalar for one seva_auth_user row."""
+    uid = row.get('id')
+    # Force every value to a scalar so sqlite3 never sees list/tuple/dict
+    username = _to_sqlite_scalar(row.get('username')) or ''
+    username = (username if isinstance(username, str) else str(username))[:150]
+    email = _to_sqlite_scalar(row.get('email')) or ''
+    email = (email if isinstance(email, str) else str(email))[:254]
+    password = _to_sqlite_scalar(row.get('password')) or ''
+    password = (password if isinstance(password, str) else str(password))[:128]
+    last_login = _to_sqlite_scalar(row.get('last_login'))
+    is_superuser = 1 if row.get('role') == 'admin' else 0
+    first_name = _to_sqlite_scalar(row.get('first_name')) or ''
+    first_name = (first_name if isinstance(first_name, str) else str(first_name))[:150]
+    last_name = _to_sqlite_scalar(row.get('last_name')) or ''
+    last_name = (last_name if isinstance(last_name, str) else str(last_name))[:150]
+    is_staff = 1 if row.get('role') == 'admin' else 0
+    is_active = 1 if row.get('is_active', True) else 0
+    date_joined = _to_sqlite_scalar(row.get('date_joined') or row.get('created_at') or now)
+    phone_raw = row.get('phone')
+    phone = (_to_sqlite_scalar(phone_raw) or '')[:20] if phone_raw is not None and phone_raw != '' else None
+    role = _to_sqlite_scalar(row.get('role')) or 'customer'
+    role = (role if isinstance(role, str) else str(role))[:20]
+    profession_raw = row.get('profession')
+    profession = (_to_sqlite_scalar(profession_raw) or '')[:100] if profession_raw else None
+    provider_row_status = provider_status_map.get(uid, ('', None))[1]
+    raw_user_status = row.get('verification_status')
+    if role == 'provider':
+        # Provider verification must be document-review driven.
+        # Do not trust old auto-filled user status values for providers.
+        if provider_row_status:
+            normalized_status = provider_row_status
+        elif uid in providers_with_docs:
+            normalized_status = 'pending'
+        else:
+            normalized_status = 'unverified'
+    else:
+        normalized_status = _normalize_status(
+            str(raw_user_status or ('approved' if row.get('is_verified') else 'unverified'))
+        )
+    if role == 'provider':
+        is_verified = 1 if normalized_status == 'approved' else 0
+    else:
+        is_verified = 1 if (row.get('is_verified') or normalized_status == 'approved') else 0
+    created_at = _to_sqlite_scalar(row.get('created_at') or now)
+    updated_at = _to_sqlite_scalar(row.get('updated_at') or now)
+    referral_code_raw = row.get('referral_code')
+    referral_code = (_to_sqlite_scalar(referral_code_raw) or '')[:50] if referral_code_raw else None
+    loyalty_points = int(row.get('loyalty_points') or 0)
+    referred_by_id = row.get('referred_by_id')
+    if referred_by_id is not None and not isinstance(referred_by_id, int):
+        try:
+            referred_by_id = int(referred_by_id)
+        except (TypeError, ValueError):
+            referred_by_id = None
+    referred_by_id = _to_sqlite_scalar(referred_by_id)
+    if referred_by_id is not None and referred_by_id != '':
+        try:
+            referred_by_id = int(referred_by_id)
+        except (TypeError, ValueError):
+            referred_by_id = None
+    return {
+        'id': int(uid),
+        'password': password,
+        'last_login': last_login,
+        'is_superuser': is_superuser,
+        'username': username,
+        'first_name': first_name,
+        'last_name': last_name,
+        'is_staff': is_staff,
+        'is_active': is_active,
+        'date_joined': date_joined,
+        'email': email,
+        'phone': phone,
+        'role': role,
+        'profession': profession,
+        'is_verified': is_verified,
+        'created_at': created_at,
+        'updated_at': updated_at,
+        'referral_code': referral_code,
+        'loyalty_points': loyalty_points,
+        'referred_by_id': referred_by_id,
+        'qualification': _to_sqlite_scalar(row.get('qualification')),
+        'profile_image_url': _to_sqlite_scalar(row.get('profile_image_url')),
+        'district': _to_sqlite_scalar(row.get('district')),
+        'city': _to_sqlite_scalar(row.get('city')),
+        'verification_status': _to_sqlite_scalar(normalized_status),
+        'rejection_reason': _to_sqlite_scalar(row.get('rejection_reason')),
+        'is_active_provider': 1 if normalized_status == 'approved' else 0,
+        'submitted_at': _to_sqlite_scalar(row.get('submitted_at')),
+        'reviewed_at': _to_sqlite_scalar(row.get('reviewed_at')),
+        'reviewed_by': _to_sqlite_scalar(row.get('reviewed_by')),
+    }
+
+
 class Command(BaseCommand):
     help = 'Sync users from Supabase to SQLite so admin user list is populated.'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Re-copy every user instead of only users changed since the last high-water mark.',
+        )
+
+    def _user_pages(self, supabase, mode, state):
+        """
+        Pages of users to upsert. Incremental runs also pick up providers whose verification
+        documents changed since the mark, because their effective status is derived from them.
+        """
+        if mode == MODE_FULL:
+            yield from iter_pages(lambda: supabase.table(USER_TABLE).select('*'))
+            return
+        since_id = int(state.get('high_water_id') or 0)
+        seen = set()
+        builders = [lambda: supabase.table(USER_TABLE).select('*').gt('id', since_id)]
+        mark = state.get('high_water_mark')
+        if mark:
+            builders.append(lambda: supabase.table(USER_TABLE).select('*').gte('updated_at', mark))
+        for build in builders:
+            for page in iter_pages(build):
+                page = [row for row in page if row.get('id') not in seen]
+                seen.update(row.get('id') for row in page)
+                if page:
+                    yield page
+        if not mark:
+            return
+        try:
+            docs = supabase.table(VERIFICATION_TABLE).select('provider_id').gte('updated_at', mark).execute()
+        except Exception:
+            return
+        extra = sorted({
+            d.get('provider_id') for d in (docs.data or [])
+            if d.get('provider_id') is not None and d.get('provider_id') not in seen
+        })
+        for start in range(0, len(extra), PAGE_SIZE):
+            rows = select_in(supabase, USER_TABLE, 'id', extra[start:start + PAGE_SIZE])
+            if rows:
+                yield rows
+
     def handle(self, *args, **options):
         try:
             from supabase_config import get_supabase_client
@@ -34,53 +241,16 @@ class Command(BaseCommand):
             self.stderr.write(self.style.ERROR('supabase_config not found.'))
             return
         supabase = get_supabase_client()
-        try:
-            r = supabase.table('seva_auth_user').select('*').execute()
-        except Exception as e:
-            self.stderr.write(self.style.ERROR(f'Supabase error: {e}'))
-            return
-        if not r.data:
-            self.stdout.write('No users in Supabase.')
-            return
-        provider_status_map = {}
-        providers_with_docs = set()
-        try:
-            try:
-                v = supabase.table('seva_provider_verification').select(
-                    'provider_id,status,created_at,updated_at,reviewed_at'
-                ).execute()
-            except Exception:
-                # Older schema may not have updated_at/reviewed_at.
-                v = supabase.table('seva_provider_verification').select(
-                    'provider_id,status,created_at'
-                ).execute()
-            for row in (v.data or []):
-                pid = row.get('provider_id')
-                if pid is None:
-                    continue
-                providers_with_docs.add(pid)
-                status_raw = (row.get('status') or '').strip().lower()
-                status_aliases = {
-                    'pending_verification': 'pending',
-                    'under_review': 'pending',
-                    'on_hold': 'pending',
-                    'verified': 'approved',
-                }
-                status = status_aliases.get(status_raw, status_raw if status_raw in {'unverified', 'pending', 'approved', 'rejected'} else 'unverified')
-                if status == 'unverified':
-                    continue
-                ts = row.get('reviewed_at') or row.get('updated_at') or row.get('created_at') or ''
-                prev = provider_status_map.get(pid)
-                if prev is None or str(ts) >= str(prev[0]):
-                    provider_status_map[pid] = (str(ts), status)
-        except Exception:
-            provider_status_map = {}
+        verbosity = int(options.get('verbosity', 1))
+        connection.ensure_connection()
+        raw_conn = connection.connection
+        ensure_sync_state_table(raw_conn)
+        started = time.time()
+        state = load_sync_state(raw_conn, USER_TABLE)
+        mode = choose_mode(state, bool(options.get('full')))
         now = timezone.now().isoformat()
-        synced = 0
         # Use raw sqlite3 connection to avoid Django cursor's %-formatting path that raises
         # "not all arguments converted during string formatting" when building last_executed_query
-        connection.ensure_connection()
-        raw_conn = connection.connection
         cur = raw_conn.cursor()
         cur.execute("PRAGMA table_info(authentication_user)")
         existing_cols = {row[1] for row in cur.fetchall()}
@@ -94,112 +264,42 @@ class Command(BaseCommand):
         cols = [c for c in all_cols if c in existing_cols]
         placeholders = ", ".join(["?"] * len(cols))
         sql = f"INSERT OR REPLACE INTO authentication_user ({', '.join(cols)}) VALUES ({placeholders})"
-        for row in r.data:
-            uid = row.get('id')
-            if uid is None:
-                continue
-            # Force every value to a scalar so sqlite3 never sees list/tuple/dict
-            username = _to_sqlite_scalar(row.get('username')) or ''
-            username = (username if isinstance(username, str) else str(username))[:150]
-            email = _to_sqlite_scalar(row.get('email')) or ''
-            email = (email if isinstance(email, str) else str(email))[:254]
-            password = _to_sqlite_scalar(row.get('password')) or ''
-            password = (password if isinstance(password, str) else str(password))[:128]
-            last_login = _to_sqlite_scalar(row.get('last_login'))
-            is_superuser = 1 if row.get('role') == 'admin' else 0
-            first_name = _to_sqlite_scalar(row.get('first_name')) or ''
-            first_name = (first_name if isinstance(first_name, str) else str(first_name))[:150]
-            last_name = _to_sqlite_scalar(row.get('last_name')) or ''
-            last_name = (last_name if isinstance(last_name, str) else str(last_name))[:150]
-            is_staff = 1 if row.get('role') == 'admin' else 0
-            is_active = 1 if row.get('is_active', True) else 0
-            date_joined = _to_sqlite_scalar(row.get('date_joined') or row.get('created_at') or now)
-            phone_raw = row.get('phone')
-            phone = (_to_sqlite_scalar(phone_raw) or '')[:20] if phone_raw is not None and phone_raw != '' else None
-            role = _to_sqlite_scalar(row.get('role')) or 'customer'
-            role = (role if isinstance(role, str) else str(role))[:20]
-            profession_raw = row.get('profession')
-            profession = (_to_sqlite_scalar(profession_raw) or '')[:100] if profession_raw else None
-            provider_row_status = provider_status_map.get(uid, ('', None))[1]
-            raw_user_status = row.get('verification_status')
-            if role == 'provider':
-                # Provider verification must be document-review driven.
-                # Do not trust old auto-filled user status values for providers.
-                if provider_row_status:
-                    normalized_status = provider_row_status
-                elif uid in providers_with_docs:
-                    normalized_status = 'pending'
-                else:
-                    normalized_status = 'unverified'
-            else:
-                status_raw = str(raw_user_status or ('approved' if row.get('is_verified') else 'unverified')).strip().lower()
-                status_aliases = {
-                    'pending_verification': 'pending',
-                    'under_review': 'pending',
-                    'on_hold': 'pending',
-                    'verified': 'approved',
-                }
-                normalized_status = status_aliases.get(
-                    status_raw,
-                    status_raw if status_raw in {'unverified', 'pending', 'approved', 'rejected'} else 'unverified'
-                )
-            if role == 'provider':
-                is_verified = 1 if normalized_status == 'approved' else 0
-            else:
-                is_verified = 1 if (row.get('is_verified') or normalized_status == 'approved') else 0
-            created_at = _to_sqlite_scalar(row.get('created_at') or now)
-            updated_at = _to_sqlite_scalar(row.get('updated_at') or now)
-            referral_code_raw = row.get('referral_code')
-            referral_code = (_to_sqlite_scalar(referral_code_raw) or '')[:50] if referral_code_raw else None
-            loyalty_points = int(row.get('loyalty_points') or 0)
-            referred_by_id = row.get('referred_by_id')
-            if referred_by_id is not None and not isinstance(referred_by_id, int):
-                try:
-                    referred_by_id = int(referred_by_id)
-                except (TypeError, ValueError):
-                    referred_by_id = None
-            referred_by_id = _to_sqlite_scalar(referred_by_id)
-            if referred_by_id is not None and referred_by_id != '':
-                try:
-                    referred_by_id = int(referred_by_id)
-                except (TypeError, ValueError):
-                    referred_by_id = None
-            values = {
-                'id': int(uid),
-                'password': password,
-                'last_login': last_login,
-                'is_superuser': is_superuser,
-                'username': username,
-                'first_name': first_name,
-                'last_name': last_name,
-                'is_staff': is_staff,
-                'is_active': is_active,
-                'date_joined': date_joined,
-                'email': email,
-                'phone': phone,
-                'role': role,
-                'profession': profession,
-                'is_verified': is_verified,
-                'created_at': created_at,
-                'updated_at': updated_at,
-                'referral_code': referral_code,
-                'loyalty_points': loyalty_points,
-                'referred_by_id': referred_by_id,
-                'qualification': _to_sqlite_scalar(row.get('qualification')),
-                'profile_image_url': _to_sqlite_scalar(row.get('profile_image_url')),
-                'district': _to_sqlite_scalar(row.get('district')),
-                'city': _to_sqlite_scalar(row.get('city')),
-                'verification_status': _to_sqlite_scalar(normalized_status),
-                'rejection_reason': _to_sqlite_scalar(row.get('rejection_reason')),
-                'is_active_provider': 1 if normalized_status == 'approved' else 0,
-                'submitted_at': _to_sqlite_scalar(row.get('submitted_at')),
-                'reviewed_at': _to_sqlite_scalar(row.get('reviewed_at')),
-                'reviewed_by': _to_sqlite_scalar(row.get('reviewed_by')),
-            }
-            params = tuple(_to_sqlite_scalar(values.get(c)) for c in cols)
-            try:
-                raw_conn.execute(sql, params)
-                synced += 1
-            except Exception as e:
-                self.stderr.write(self.style.WARNING(f'Skip user {uid}: {e}'))
-        self.stdout.write(self.style.SUCCESS(f'Synced {synced} users to SQLite.'))
+        id_pos = cols.index('id') if 'id' in cols else None
+
+        def _skip(params, exc):
+            uid = params[id_pos] if id_pos is not None else '?'
+            self.stderr.write(self.style.WARNING(f'Skip user {uid}: {exc}'))
+
+        writer = BatchWriter(raw_conn, sql, on_row_error=_skip)
+        tracker = MarkTracker({} if mode == MODE_FULL else state)
+        fetched = 0
+        try:
+            for page in self._user_pages(supabase, mode, state):
+                fetched += len(page)
+                page_ids = {row.get('id') for row in page if row.get('id') is not None}
+                provider_status_map, providers_with_docs = _verification_statuses(supabase, page_ids)
+                for row in page:
+                    tracker.add(row)
+                    if row.get('id') is None:
+                        continue
+                    values = _user_values(row, provider_status_map, providers_with_docs, now)
+                    writer.add(tuple(_to_sqlite_scalar(values.get(c)) for c in cols))
+            writer.close()
+        except Exception as e:
+            # Batches already committed are idempotent upserts; marks stay put so the next run redoes them.
+            self.stderr.write(self.style.ERROR(f'User sync error: {e}'))
+            save_sync_state(raw_conn, USER_TABLE, state, mode, started, writer.written, error=e)
+            return
+        if not fetched:
+            save_sync_state(raw_conn, USER_TABLE, state, mode, started, 0)
+            self.stdout.write('No users in Supabase.' if mode == MODE_FULL else 'No user changes in Supabase.')
+            return
+        synced = writer.written
+        save_sync_state(raw_conn, USER_TABLE, state, mode, started, synced, marks=tracker.marks)
+        elapsed = time.time() - started
+        rate = synced / elapsed if elapsed > 0 else 0.0
+        self.stdout.write(self.style.SUCCESS(
+            f'Synced {synced} users to SQLite ({mode}) in {elapsed:.2f}s, {rate:,.0f} rows/s.'
+        ))
+        if verbosity >= 2:
+            self.stdout.write(f'  {writer.batches} batch(es) of up to {writer.batch_size} rows.')
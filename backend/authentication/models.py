@@ -3,10 +3,13 @@ from django.contrib.auth.models import AbstractUser
 from django.contrib.auth.base_user import BaseUserManager
 from django.db import models
 from supabase_config import get_supabase_client
+from .user_cache import forget_user
+from .user_directory import user_directory
 import json
 import re
 import random
 import string
+import time
 from datetime import datetime
 
 
@@ -26,6 +29,14 @@ def _generate_referral_code(supabase, username, email):
     return candidate
 
 
+# Login identity lookup (add_auth_user_identity_lookup.sql). When the RPC is missing the
+# manager falls back to a filtered query and does not retry the RPC for a while.
+IDENTITY_RPC = 'seva_find_auth_user'
+IDENTITY_KINDS = ('username', 'email', 'phone')
+IDENTITY_RPC_RETRY_SECONDS = 300
+_identity_rpc_retry_at = 0.0
+
+
 class SupabaseUserManager(BaseUserManager):
     def create_user(self, username, email, password=None, **extra_fields):
         supabase = get_supabase_client()
@@ -106,6 +117,7 @@ class SupabaseUserManager(BaseUserManager):
             response = supabase.table('seva_auth_user').insert(user_data).execute()
             if response.data:
                 user_data['id'] = response.data[0]['id']
+                user_directory.apply_row(response.data[0])
                 return self.model(**user_data)
             raise ValueError("Supabase insert returned no data")
         except Exception as e:
@@ -188,21 +200,73 @@ class SupabaseUserManager(BaseUserManager):
         if row.get('role') == 'admin':
             kwargs['is_staff'] = True
             kwargs['is_superuser'] = True
-        return self.model(**kwargs)
+        user = self.model(**kwargs)
+        user.mark_persisted()
+        return user
 
-    def get_by_username_ignore_case(self, username):
-        """Find user by username (case-insensitive). Raises User.DoesNotExist if not found."""
+    def find_by_identity(self, kind, value):
+        """Find the user whose username/email (case-insensitive) or phone equals value.
+
+        One indexed lookup on the server (seva_find_auth_user RPC, else an escaped ilike/eq
+        filter); the user directory is only consulted if both fail and it is already loaded.
+        Raises User.DoesNotExist if not found.
+        """
+        want = (value or '').strip()
+        if not want or kind not in IDENTITY_KINDS:
+            raise self.model.DoesNotExist()
         supabase = get_supabase_client()
         try:
-            response = supabase.table('seva_auth_user').select('*').execute()
-            if response.data:
-                want = (username or '').strip().lower()
-                for row in response.data:
-                    if (row.get('username') or '').lower() == want:
-                        return self._user_from_row(row)
+            row = self._identity_row(supabase, kind, want)
+        except Exception as e:
+            print(f"Error in find_by_identity({kind}): {e}")
+            row = self._identity_row_from_directory(kind, want)
+        if row is None:
+            raise self.model.DoesNotExist()
+        return self._user_from_row(row)
+
+    def _identity_row(self, supabase, kind, want):
+        global _identity_rpc_retry_at
+        if time.time() >= _identity_rpc_retry_at:
+            try:
+                r = supabase.rpc(IDENTITY_RPC, {'p_kind': kind, 'p_value': want}).execute()
+                return (r.data or [None])[0]
+            except Exception as e:
+                _identity_rpc_retry_at = time.time() + IDENTITY_RPC_RETRY_SECONDS
+                print(f"{IDENTITY_RPC} unavailable, using filtered query: {e}")
+        query = supabase.table('seva_auth_user').select('*')
+        if kind == 'phone' or any(c in want for c in '%*'):
+            # Exact match only: PostgREST would treat these characters as wildcards.
+            query = query.eq(kind, want)
+        else:
+            query = query.ilike(kind, want.replace('\\', '\\\\').replace('_', '\\_'))
+        r = query.order('id').limit(1).execute()
+        return (r.data or [None])[0]
+
+    def _identity_row_from_directory(self, kind, want):
+        if not user_directory.is_loaded():
+            return None
+        finders = {
+            'username': user_directory.find_id_by_username,
+            'email': user_directory.find_id_by_email,
+            'phone': user_directory.find_id_by_phone,
+        }
+        try:
+            user_id = finders[kind](want)
+            if user_id is None:
+                return None
+            r = get_supabase_client().table('seva_auth_user').select('*').eq('id', user_id).limit(1).execute()
+            return (r.data or [None])[0]
         except Exception as e:
-            print(f"Error in get_by_username_ignore_case: {e}")
-        raise self.model.DoesNotExist()
+            print(f"Error in directory identity fallback: {e}")
+            return None
+
+    def get_by_username_ignore_case(self, username):
+        """Find user by username (case-insensitive). Raises User.DoesNotExist if not found."""
+        return self.find_by_identity('username', username)
+
+    def get_by_email_ignore_case(self, email):
+        """Find user by email (case-insensitive). Raises User.DoesNotExist if not found."""
+        return self.find_by_identity('email', email)
 
 class User(AbstractUser):
     VERIFICATION_STATUS_UNVERIFIED = 'unverified'
@@ -260,8 +324,11 @@ class User(AbstractUser):
     class Meta:
         managed = False  # Don't let Django manage this table
     
-    def save(self, *args, **kwargs):
-        supabase = get_supabase_client()
+    # Columns derived from role/verification_status by _normalized_verification().
+    VERIFICATION_DERIVED_FIELDS = ('verification_status', 'is_verified', 'is_active_provider', 'rejection_reason')
+
+    def _normalized_verification(self):
+        """(verification_status, is_verified, is_active_provider, rejection_reason) as save() stores them."""
         raw_status = (getattr(self, 'verification_status', None) or '').strip().lower()
         role = (getattr(self, 'role', None) or '').strip().lower()
         is_provider_role = role in ('provider', 'prov')
@@ -279,19 +346,23 @@ class User(AbstractUser):
         if not is_provider_role:
             # Verification status is provider-only.
             normalized_status = self.VERIFICATION_STATUS_UNVERIFIED
-        self.verification_status = normalized_status
-        self.is_verified = is_provider_role and normalized_status == self.VERIFICATION_STATUS_APPROVED
-        self.is_active_provider = is_provider_role and normalized_status == self.VERIFICATION_STATUS_APPROVED
+        approved = is_provider_role and normalized_status == self.VERIFICATION_STATUS_APPROVED
+        rejection_reason = getattr(self, 'rejection_reason', None)
         if normalized_status != self.VERIFICATION_STATUS_REJECTED:
-            self.rejection_reason = None
-        user_data = {
+            rejection_reason = None
+        return normalized_status, approved, approved, rejection_reason
+
+    def _supabase_payload(self):
+        """The seva_auth_user columns save() writes, with the values it would write."""
+        verification_status, is_verified, is_active_provider, rejection_reason = self._normalized_verification()
+        return {
             'username': self.username,
             'email': self.email,
             'phone': self.phone,
             'role': self.role,
             'profession': self.profession,
             'email_verified': bool(getattr(self, 'email_verified', False)),
-            'is_verified': self.is_verified,
+            'is_verified': is_verified,
             'password': self.password,
             'first_name': self.first_name,
             'last_name': self.last_name,
@@ -302,15 +373,54 @@ class User(AbstractUser):
             'city': getattr(self, 'city', None) or '',
             'qualification': getattr(self, 'qualification', None) or '',
             'profile_image_url': getattr(self, 'profile_image_url', None) or '',
-            'verification_status': self.verification_status,
-            'rejection_reason': getattr(self, 'rejection_reason', None) or '',
-            'is_active_provider': bool(getattr(self, 'is_active_provider', False)),
+            'verification_status': verification_status,
+            'rejection_reason': rejection_reason or '',
+            'is_active_provider': bool(is_active_provider),
             'submitted_at': getattr(self, 'submitted_at', None),
             'reviewed_at': getattr(self, 'reviewed_at', None),
             'reviewed_by': getattr(self, 'reviewed_by', None),
             'terms_accepted': bool(getattr(self, 'terms_accepted', False)),
             'terms_accepted_at': getattr(self, 'terms_accepted_at', None),
         }
+
+    def mark_persisted(self):
+        """Record the current values as what seva_auth_user holds (set when built from a row)."""
+        self._persisted_payload = self._supabase_payload()
+
+    def _changed_payload(self, user_data, update_fields=None):
+        """
+        Columns to send for an update: update_fields when given (plus the verification
+        columns derived from them), otherwise the columns that differ from the values
+        recorded by mark_persisted(). Instances without a record send everything.
+        """
+        if update_fields is not None:
+            names = set(update_fields)
+            if names & {'role', 'verification_status', 'rejection_reason'}:
+                names.update(self.VERIFICATION_DERIVED_FIELDS)
+            return {k: v for k, v in user_data.items() if k in names}
+        persisted = getattr(self, '_persisted_payload', None)
+        if persisted is None:
+            return dict(user_data)
+        return {k: v for k, v in user_data.items() if k not in persisted or persisted[k] != v}
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        (
+            self.verification_status,
+            self.is_verified,
+            self.is_active_provider,
+            self.rejection_reason,
+        ) = self._normalized_verification()
+        user_data = self._supabase_payload()
+        if getattr(self, 'password_deferred', False) and not self.password:
+            # Built from the auth cache, which never holds the hash: keep the stored one.
+            user_data.pop('password')
+        if self.id:
+            user_data = self._changed_payload(user_data, update_fields)
+            if not user_data:
+                # Nothing changed since the row was read: skip the round-trip.
+                return
+        supabase = get_supabase_client()
         def _upsert_with_missing_column_fallback(update_payload):
             """
             Supabase schema can lag local code (e.g., missing verification columns).
@@ -341,8 +451,13 @@ class User(AbstractUser):
                     payload.pop(missing_col, None)
         try:
             _upsert_with_missing_column_fallback(user_data)
+            user_directory.apply_row(dict(user_data, id=self.id))
+            persisted = getattr(self, '_persisted_payload', None)
+            if persisted is not None:
+                persisted.update(user_data)
         except Exception as e:
             print(f"Error saving user to Supabase: {e}")
+        forget_user(self.id)
     
     def __str__(self):
         return f"{self.email} ({self.role})"
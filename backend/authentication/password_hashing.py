@@ -0,0 +1,294 @@
+"""
+Bounded password hashing for request threads.
+
+PBKDF2 costs tens of milliseconds of CPU per check (hashlib releases the GIL while it runs).
+Login, SupabaseAuthBackend and change_password hash through one process-wide pool of
+PASSWORD_HASH_MAX_WORKERS threads, so a login burst uses at most that many cores and other
+endpoints in the worker keep running. At most PASSWORD_HASH_MAX_PENDING calls may wait for
+or hold a slot; beyond that, calls fail fast with PasswordHashingBusy (login answers 503).
+
+A successful check against an outdated hasher or iteration count, or against a legacy
+plain-text row, schedules an upgrade to the default hasher. The new hash is computed on the
+same pool without blocking the request. A writer thread then stores the upgrades in batches
+of REHASH_BATCH_SIZE through seva_apply_password_rehashes (add_password_rehash_rpc.sql).
+A row is only written while it still holds the hash that was verified, so a concurrent
+password change wins.
+
+hashing_stats() reports queue/hash times, rejections and writer counters (admin settings).
+"""
+import concurrent.futures
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import UNUSABLE_PASSWORD_PREFIX, check_password, make_password
+
+from supabase_config import get_supabase_client
+
+
+logger = logging.getLogger(__name__)
+
+USER_TABLE = 'seva_auth_user'
+REHASH_RPC = 'seva_apply_password_rehashes'
+REHASH_BATCH_SIZE = 100
+REHASH_FLUSH_SECONDS = 2.0
+REHASH_MAX_QUEUED = 5000
+
+
+class PasswordHashingBusy(Exception):
+    """Every hashing slot is taken and the wait queue is full (or the wait timed out)."""
+
+
+def _max_workers():
+    return max(1, int(getattr(settings, 'PASSWORD_HASH_MAX_WORKERS', 2) or 2))
+
+
+def _max_pending():
+    return max(_max_workers(), int(getattr(settings, 'PASSWORD_HASH_MAX_PENDING', 32) or 32))
+
+
+def _timeout_seconds():
+    return float(getattr(settings, 'PASSWORD_HASH_TIMEOUT_SECONDS', 10) or 10)
+
+
+class HashingExecutor:
+    """Thread pool with a hard cap on queued + running calls and queue-time metrics."""
+
+    def __init__(self, max_workers, max_pending):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix='password-hash'
+        )
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.queue_seconds_total = 0.0
+        self.queue_seconds_max = 0.0
+        self.hash_seconds_total = 0.0
+
+    def submit(self, fn, *args):
+        """Future for fn(*args); raises PasswordHashingBusy instead of queueing past the cap."""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise PasswordHashingBusy('password hashing queue is full')
+        try:
+            future = self._pool.submit(self._run, time.monotonic(), fn, args)
+        except Exception:
+            self._slots.release()
+            raise
+        # Released on completion and on cancellation of a still-queued call.
+        future.add_done_callback(lambda _f: self._slots.release())
+        with self._lock:
+            self.submitted += 1
+        return future
+
+    def _run(self, queued_at, fn, args):
+        started = time.monotonic()
+        try:
+            return fn(*args)
+        finally:
+            waited, took = started - queued_at, time.monotonic() - started
+            with self._lock:
+                self.completed += 1
+                self.queue_seconds_total += waited
+                self.queue_seconds_max = max(self.queue_seconds_max, waited)
+                self.hash_seconds_total += took
+
+    def run(self, fn, *args, timeout=None):
+        future = self.submit(fn, *args)
+        try:
+            return future.result(timeout=timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            with self._lock:
+                self.timeouts += 1
+            raise PasswordHashingBusy('password hashing timed out')
+
+    def stats(self):
+        with self._lock:
+            done = self.completed or 1
+            return {
+                'workers': self.max_workers,
+                'max_pending': self.max_pending,
+                'in_flight': self.submitted - self.completed,
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'timeouts': self.timeouts,
+                'avg_queue_ms': round(1000 * self.queue_seconds_total / done, 2),
+                'max_queue_ms': round(1000 * self.queue_seconds_max, 2),
+                'avg_hash_ms': round(1000 * self.hash_seconds_total / done, 2),
+            }
+
+
+class RehashWriter:
+    """Background thread storing upgraded hashes in batches (latest hash per user wins)."""
+
+    def __init__(self, batch_size=REHASH_BATCH_SIZE, flush_seconds=REHASH_FLUSH_SECONDS,
+                 max_queued=REHASH_MAX_QUEUED):
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.max_queued = max_queued
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self.queued = 0
+        self.written = 0
+        self.skipped = 0
+        self.failed = 0
+        self.dropped = 0
+        self.batches = 0
+
+    def enqueue(self, user_id, new_hash, old_hash):
+        with self._lock:
+            if user_id not in self._pending and len(self._pending) >= self.max_queued:
+                self.dropped += 1
+                return
+            self._pending[user_id] = (new_hash, old_hash)
+            self.queued += 1
+            full = len(self._pending) >= self.batch_size
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name='password-rehash-writer', daemon=True)
+                self._thread.start()
+        if full:
+            self._wake.set()
+
+    def _loop(self):
+        while True:
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.warning('password rehash flush failed: %s', e)
+
+    def _take_batch(self):
+        with self._lock:
+            ids = list(self._pending)[:self.batch_size]
+            return [
+                {'id': uid, 'password': new, 'old_password': old}
+                for uid, (new, old) in ((uid, self._pending.pop(uid)) for uid in ids)
+            ]
+
+    def flush(self):
+        """Write everything queued so far; returns the number of rows updated."""
+        updated = 0
+        while True:
+            rows = self._take_batch()
+            if not rows:
+                return updated
+            count = self._write(rows)
+            updated += count
+            with self._lock:
+                self.batches += 1
+                self.written += count
+                self.skipped += len(rows) - count
+
+    def _write(self, rows):
+        supabase = get_supabase_client()
+        try:
+            r = supabase.rpc(REHASH_RPC, {'p_rows': rows}).execute()
+            return int(r.data or 0)
+        except Exception as e:
+            logger.warning('%s failed, updating rows one by one: %s', REHASH_RPC, e)
+        count = 0
+        for row in rows:
+            try:
+                r = (
+                    supabase.table(USER_TABLE)
+                    .update({'password': row['password']})
+                    .eq('id', row['id'])
+                    .eq('password', row['old_password'])
+                    .execute()
+                )
+                count += 1 if r.data else 0
+            except Exception as e:
+                with self._lock:
+                    self.failed += 1
+                logger.warning('password rehash for user %s failed: %s', row['id'], e)
+        return count
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pending': len(self._pending),
+                'queued': self.queued,
+                'written': self.written,
+                'skipped': self.skipped,
+                'failed': self.failed,
+                'dropped': self.dropped,
+                'batches': self.batches,
+            }
+
+
+_executor = None
+_executor_lock = threading.Lock()
+rehash_writer = RehashWriter()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = HashingExecutor(_max_workers(), _max_pending())
+        return _executor
+
+
+def _verify(password, encoded):
+    """(ok, needs_rehash); runs on the pool."""
+    if not encoded or encoded.startswith(UNUSABLE_PASSWORD_PREFIX):
+        return False, False
+    if '$' not in encoded:
+        # Legacy rows that still store the plain password.
+        ok = encoded.strip() == password
+        return ok, ok
+    outdated = []
+    ok = check_password(password, encoded, setter=outdated.append)
+    return ok, bool(outdated)
+
+
+def verify_password(password, encoded):
+    """(ok, needs_rehash) computed on the bounded pool. Raises PasswordHashingBusy."""
+    return get_executor().run(_verify, password or '', str(encoded or ''), timeout=_timeout_seconds())
+
+
+def hash_password(raw_password):
+    """make_password(raw_password) on the bounded pool. Raises PasswordHashingBusy."""
+    return get_executor().run(make_password, raw_password, timeout=_timeout_seconds())
+
+
+def schedule_rehash(user_id, password, old_encoded):
+    """Upgrade the stored hash in the background; skipped silently when the pool is full."""
+    if user_id is None:
+        return
+    try:
+        future = get_executor().submit(make_password, password)
+    except PasswordHashingBusy:
+        return
+
+    def _queue(f):
+        if not f.cancelled() and f.exception() is None:
+            rehash_writer.enqueue(user_id, f.result(), old_encoded)
+
+    future.add_done_callback(_queue)
+
+
+def check_and_upgrade(user_id, password, encoded):
+    """Verify password against encoded and schedule a rehash if needed. Raises PasswordHashingBusy."""
+    ok, needs_rehash = verify_password(password, encoded)
+    if ok and needs_rehash:
+        schedule_rehash(user_id, password, str(encoded or ''))
+    return ok
+
+
+def hashing_stats():
+    stats = get_executor().stats()
+    stats['rehash'] = rehash_writer.stats()
+    return stats
@@ -3,6 +3,8 @@ from django.contrib.auth import authenticate
 from django.contrib.auth.password_validation import validate_password
 import logging
 from .models import User
+from .password_hashing import PasswordHashingBusy
+from .user_cache import forget_user
 
 
 logger = logging.getLogger(__name__)
@@ -20,23 +22,15 @@ def _normalize_verification_status(value):
 
 
 def _provider_effective_status(provider_id):
-    """Derive provider status from uploaded verification docs."""
+    """Derive provider status from uploaded verification docs (cached status index)."""
     if not provider_id:
         return 'unverified'
     try:
         from supabase_config import get_supabase_client
-        supabase = get_supabase_client()
-        r = supabase.table('seva_provider_verification').select('status').eq('provider_id', provider_id).execute()
+        from services.verification_index import provider_status
+        return provider_status(get_supabase_client(), provider_id)
     except Exception:
         return 'unverified'
-    statuses = {_normalize_verification_status((row.get('status') or 'unverified')) for row in (r.data or [])}
-    if 'approved' in statuses:
-        return 'approved'
-    if 'pending' in statuses:
-        return 'pending'
-    if 'rejected' in statuses:
-        return 'rejected'
-    return 'unverified'
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, validators=[validate_password])
@@ -296,6 +290,7 @@ class ProviderRegistrationSerializer(UserRegistrationSerializer):
                         sorted({(s.get('title') or '').strip() for s in services_offered if (s.get('title') or '').strip()})
                     )[:1000],
                 }).eq('id', user.id).execute()
+                forget_user(user.id)
             except Exception:
                 pass
         return user
@@ -318,21 +313,15 @@ class LoginSerializer(serializers.Serializer):
         # Try to find user by username (case-insensitive), email, or phone
         try:
             if '@' in username:
-                try:
-                    user_obj = User.objects.get(email__iexact=username)
-                except Exception:
-                    user_obj = User.objects.get(email=username)
+                user_obj = User.objects.get_by_email_ignore_case(username)
             elif username.isdigit():
-                user_obj = User.objects.get(phone=username)
+                user_obj = User.objects.find_by_identity('phone', username)
             else:
                 try:
                     user_obj = User.objects.get_by_username_ignore_case(username)
                 except User.DoesNotExist:
                     # Fallback: try as email (e.g. user types email in "username" field)
-                    try:
-                        user_obj = User.objects.get(email__iexact=username)
-                    except Exception:
-                        user_obj = User.objects.get(email=username)
+                    user_obj = User.objects.get_by_email_ignore_case(username)
         except User.DoesNotExist:
             # CRITICAL: User does not exist at all
             raise serializers.ValidationError("No user found with this username or email.")
@@ -343,7 +332,7 @@ class LoginSerializer(serializers.Serializer):
                 raise serializers.ValidationError("User account is disabled.")
             try:
                 user_obj.is_active = True
-                user_obj.save()
+                user_obj.save(update_fields=['is_active'])
             except Exception:
                 pass
 
@@ -352,7 +341,7 @@ class LoginSerializer(serializers.Serializer):
             # Do not block login for existing accounts; mark them verified on successful login.
             try:
                 user_obj.email_verified = True
-                user_obj.save()
+                user_obj.save(update_fields=['email_verified'])
             except Exception:
                 pass
 
@@ -361,7 +350,10 @@ class LoginSerializer(serializers.Serializer):
         
         # CRITICAL: User exists and is active, now verify password
         # Pass exact username from DB so backend can re-fetch and check password
-        user = authenticate(username=user_obj.username, password=password)
+        try:
+            user = authenticate(username=user_obj.username, password=password)
+        except PasswordHashingBusy:
+            raise serializers.ValidationError("Too many sign-in attempts right now. Please try again in a moment.")
         if not user:
             # Backward compatibility for older Supabase rows that still store a plain-text password.
             stored_password = getattr(user_obj, 'password', None) or ''
@@ -49,7 +49,7 @@ def hamro_admin_stats():
 
         s = queries.dashboard_stats()
         trend = queries.trend_last_n_days(90)
-        pulse = queries.market_pulse_score()
+        pulse = queries.market_pulse_score(s)
         refunds = Refund.objects.count()
 
         labels = []
@@ -0,0 +1,57 @@
+"""
+Short-lived cache of seva_auth_user rows for request authentication (auth:user namespace).
+
+CachedJWTAuthentication resolves the token's user id here instead of fetching the row from
+Supabase on every request. Entries are keyed by user id and dropped by forget_user(),
+which User.save() and every direct seva_auth_user update call; AUTH_USER_CACHE_TTL_SECONDS
+bounds how long a write that skips those paths (SQL editor, another service) stays unseen.
+
+Password hashes are never cached. Users built from a cached row carry password_deferred;
+User.save() leaves the stored hash alone for them unless set_password() was called, and views that verify a password fetch
+the user fresh (User.objects.get(id=...)).
+"""
+from services.shared_cache import get_namespace
+from supabase_config import get_supabase_client
+
+
+USER_TABLE = 'seva_auth_user'
+AUTH_USER_CACHE_TTL_SECONDS = 60
+AUTH_USER_CACHE = get_namespace('auth:user', AUTH_USER_CACHE_TTL_SECONDS)
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def load_user_row(user_id):
+    """The seva_auth_user row for user_id without its password hash, or None."""
+    r = get_supabase_client().table(USER_TABLE).select('*').eq('id', user_id).limit(1).execute()
+    if not r.data:
+        return None
+    row = dict(r.data[0])
+    row.pop('password', None)
+    return row
+
+
+def cached_user_row(user_id):
+    """Cached row for user_id (loaded on a miss), or None when the user does not exist."""
+    uid = _to_int(user_id)
+    if uid is None:
+        return None
+    row = AUTH_USER_CACHE.get(uid)
+    if isinstance(row, dict):
+        return row
+    row = load_user_row(uid)
+    if row is not None:
+        AUTH_USER_CACHE.set(uid, row)
+    return row
+
+
+def forget_user(user_id):
+    """Drop the cached row after any write to seva_auth_user."""
+    uid = _to_int(user_id)
+    if uid is not None:
+        AUTH_USER_CACHE.delete(uid)
@@ -0,0 +1,299 @@
+"""
+In-process snapshot of seva_auth_user for hot read paths (provider lists, location
+dropdowns, service enrichment, login lookup fallback).
+
+The first read loads the table in id-ordered pages; later reads refresh incrementally by
+fetching only rows with updated_at past the watermark or id past the highest known id
+(see add_auth_user_updated_at_trigger.sql). A full reload every FULL_REFRESH_SECONDS is the
+safety net for writes that bypass the trigger. Lookups are dict hits on:
+
+  id, lower-cased username, lower-cased email, phone
+  provider district / city buckets (normalized like services.views location filters)
+
+Password hashes are never kept here; callers fetch the full row by id when they need it.
+"""
+import logging
+import re
+import threading
+import time
+
+from supabase_config import get_supabase_client
+
+
+logger = logging.getLogger(__name__)
+
+USER_TABLE = 'seva_auth_user'
+DIRECTORY_COLUMNS = (
+    'id,username,email,phone,role,profession,district,city,first_name,last_name,'
+    'profile_image_url,verification_status,is_active_provider,is_active,updated_at'
+)
+PAGE_SIZE = 1000
+REFRESH_SECONDS = 15
+FULL_REFRESH_SECONDS = 600
+PROVIDER_ROLES = ('provider', 'prov')
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _lower(value):
+    return (value or '').strip().lower() if isinstance(value, str) else ''
+
+
+def _normalize_location(value):
+    return re.sub(r'\s+', ' ', _lower(value)).strip(' ,')
+
+
+def is_provider_row(row):
+    return _lower(row.get('role')) in PROVIDER_ROLES
+
+
+class UserDirectory:
+    """Indexed, incrementally refreshed copy of the public seva_auth_user columns."""
+
+    def __init__(self, refresh_seconds=REFRESH_SECONDS, full_refresh_seconds=FULL_REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self.full_refresh_seconds = full_refresh_seconds
+        self._lock = threading.RLock()
+        self._refresh_lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._by_id = {}
+        self._by_username = {}
+        self._by_email = {}
+        self._by_phone = {}
+        self._providers_by_district = {}
+        self._providers_by_city = {}
+        self._watermark = None
+        self._max_id = 0
+        self._loaded_at = 0.0
+        self._checked_at = 0.0
+
+    # --- index maintenance -------------------------------------------------
+
+    @staticmethod
+    def _bucket_add(index, key, uid):
+        if key:
+            index.setdefault(key, set()).add(uid)
+
+    @staticmethod
+    def _bucket_discard(index, key, uid):
+        ids = index.get(key)
+        if ids is None:
+            return
+        ids.discard(uid)
+        if not ids:
+            index.pop(key, None)
+
+    def _unindex(self, uid):
+        old = self._by_id.pop(uid, None)
+        if old is None:
+            return
+        self._bucket_discard(self._by_username, _lower(old.get('username')), uid)
+        self._bucket_discard(self._by_email, _lower(old.get('email')), uid)
+        self._bucket_discard(self._by_phone, (old.get('phone') or '').strip(), uid)
+        self._bucket_discard(self._providers_by_district, _normalize_location(old.get('district')), uid)
+        self._bucket_discard(self._providers_by_city, _normalize_location(old.get('city')), uid)
+
+    def _index(self, row):
+        uid = _to_int(row.get('id'))
+        if uid is None:
+            return
+        row = {k: v for k, v in row.items() if k != 'password'}
+        row['id'] = uid
+        self._unindex(uid)
+        self._by_id[uid] = row
+        self._bucket_add(self._by_username, _lower(row.get('username')), uid)
+        self._bucket_add(self._by_email, _lower(row.get('email')), uid)
+        self._bucket_add(self._by_phone, (row.get('phone') or '').strip(), uid)
+        if is_provider_row(row):
+            self._bucket_add(self._providers_by_district, _normalize_location(row.get('district')), uid)
+            self._bucket_add(self._providers_by_city, _normalize_location(row.get('city')), uid)
+        if uid > self._max_id:
+            self._max_id = uid
+        updated_at = row.get('updated_at')
+        if updated_at and (self._watermark is None or str(updated_at) > self._watermark):
+            self._watermark = str(updated_at)
+
+    # --- loading -------------------------------------------------------------
+
+    def _fetch_pages(self, build_query):
+        rows = []
+        start = 0
+        while True:
+            r = build_query().order('id').range(start, start + PAGE_SIZE - 1).execute()
+            page = r.data or []
+            rows.extend(page)
+            if len(page) < PAGE_SIZE:
+                return rows
+            start += PAGE_SIZE
+
+    def _full_load(self):
+        supabase = get_supabase_client()
+        rows = self._fetch_pages(lambda: supabase.table(USER_TABLE).select(DIRECTORY_COLUMNS))
+        with self._lock:
+            self._reset()
+            for row in rows:
+                self._index(row)
+            self._loaded_at = self._checked_at = time.time()
+
+    def _incremental_load(self):
+        supabase = get_supabase_client()
+        with self._lock:
+            watermark, max_id = self._watermark, self._max_id
+        changed = self._fetch_pages(
+            lambda: supabase.table(USER_TABLE).select(DIRECTORY_COLUMNS).gt('id', max_id)
+        )
+        if watermark:
+            changed.extend(self._fetch_pages(
+                lambda: supabase.table(USER_TABLE).select(DIRECTORY_COLUMNS).gt('updated_at', watermark)
+            ))
+        with self._lock:
+            for row in changed:
+                self._index(row)
+            self._checked_at = time.time()
+
+    def refresh(self, full=False):
+        """Bring the snapshot up to date; full=True forces a complete reload."""
+        with self._lock:
+            needs_full = full or not self._loaded_at or (
+                time.time() - self._loaded_at >= self.full_refresh_seconds
+            )
+        if needs_full:
+            self._full_load()
+        else:
+            self._incremental_load()
+
+    def ensure_fresh(self, max_age=None):
+        """Refresh when the last check is older than max_age (default refresh_seconds)."""
+        max_age = self.refresh_seconds if max_age is None else max_age
+        with self._lock:
+            stale = time.time() - self._checked_at >= max_age
+            loaded = bool(self._loaded_at)
+        if not stale:
+            return
+        # One refreshing thread per process; others keep reading the current snapshot.
+        if not self._refresh_lock.acquire(blocking=not loaded):
+            return
+        try:
+            with self._lock:
+                if time.time() - self._checked_at < max_age:
+                    return
+            self.refresh()
+        except Exception as e:
+            if not loaded:
+                raise
+            # Serve the previous snapshot; next call retries.
+            logger.warning('user directory refresh failed: %s', e)
+            with self._lock:
+                self._checked_at = time.time()
+        finally:
+            self._refresh_lock.release()
+
+    def reload_ids(self, user_ids):
+        """Re-read specific users right after a write (does not wait for the watermark)."""
+        ids = sorted({uid for uid in (_to_int(u) for u in user_ids) if uid is not None})
+        if not ids:
+            return
+        r = get_supabase_client().table(USER_TABLE).select(DIRECTORY_COLUMNS).in_('id', ids).execute()
+        found = set()
+        with self._lock:
+            for row in (r.data or []):
+                self._index(row)
+                found.add(_to_int(row.get('id')))
+            for uid in ids:
+                if uid not in found:
+                    self._unindex(uid)
+
+    def apply_row(self, row):
+        """Index a row this process just wrote (e.g. User.save) without a round-trip."""
+        if isinstance(row, dict) and _to_int(row.get('id')) is not None:
+            with self._lock:
+                merged = dict(self._by_id.get(_to_int(row.get('id'))) or {})
+                merged.update(row)
+                self._index(merged)
+
+    # --- reads -------------------------------------------------------------
+
+    def is_loaded(self):
+        """True once a snapshot exists; lets callers use it without triggering the first load."""
+        with self._lock:
+            return bool(self._loaded_at)
+
+    def get(self, user_id):
+        self.ensure_fresh()
+        uid = _to_int(user_id)
+        with self._lock:
+            row = self._by_id.get(uid)
+            return dict(row) if row else None
+
+    def rows_for_ids(self, user_ids):
+        """id -> row for the given ids; ids missing from the snapshot are fetched once."""
+        self.ensure_fresh()
+        ids = {uid for uid in (_to_int(u) for u in user_ids) if uid is not None}
+        with self._lock:
+            missing = [uid for uid in ids if uid not in self._by_id]
+        if missing:
+            self.reload_ids(missing)
+        with self._lock:
+            return {uid: dict(self._by_id[uid]) for uid in ids if uid in self._by_id}
+
+    def _first_id(self, index, key):
+        self.ensure_fresh()
+        with self._lock:
+            ids = index.get(key)
+            return min(ids) if ids else None
+
+    def find_id_by_username(self, username):
+        return self._first_id(self._by_username, _lower(username))
+
+    def find_id_by_email(self, email):
+        return self._first_id(self._by_email, _lower(email))
+
+    def find_id_by_phone(self, phone):
+        return self._first_id(self._by_phone, (phone or '').strip())
+
+    def providers(self):
+        """All rows with a provider role, ordered by id."""
+        self.ensure_fresh()
+        with self._lock:
+            return [dict(row) for uid, row in sorted(self._by_id.items()) if is_provider_row(row)]
+
+    def provider_districts(self):
+        """Distinct display districts of providers (first-seen spelling per normalized key)."""
+        self.ensure_fresh()
+        out = set()
+        with self._lock:
+            for ids in self._providers_by_district.values():
+                out.add((self._by_id[min(ids)].get('district') or '').strip())
+        out.discard('')
+        return out
+
+    def provider_ids_in_district(self, district):
+        self.ensure_fresh()
+        with self._lock:
+            return set(self._providers_by_district.get(_normalize_location(district), ()))
+
+    def provider_cities(self, district=None):
+        """Distinct provider city spellings, optionally only providers in district."""
+        self.ensure_fresh()
+        nd = _normalize_location(district) if district else ''
+        out = set()
+        with self._lock:
+            for ids in self._providers_by_city.values():
+                for uid in ids:
+                    row = self._by_id[uid]
+                    if nd and _normalize_location(row.get('district')) != nd:
+                        continue
+                    city = (row.get('city') or '').strip()
+                    if city:
+                        out.add(city)
+        return out
+
+
+user_directory = UserDirectory()
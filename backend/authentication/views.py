@@ -26,6 +26,8 @@ from .serializers import (
     UserProfileSerializer,
 )
 from .models import User
+from .password_hashing import PasswordHashingBusy, check_and_upgrade, hash_password, verify_password
+from .user_cache import forget_user
 from supabase_config import get_supabase_client
 
 logger = logging.getLogger(__name__)
@@ -58,7 +60,9 @@ def _safe_update_auth_user(supabase, user_id, payload):
     data = dict(payload or {})
     while data:
         try:
-            return supabase.table('seva_auth_user').update(data).eq('id', user_id).execute()
+            response = supabase.table('seva_auth_user').update(data).eq('id', user_id).execute()
+            forget_user(user_id)
+            return response
         except Exception as e:
             msg = str(e)
             if 'PGRST204' not in msg or "Could not find the '" not in msg:
@@ -312,6 +316,7 @@ def _create_provider_from_pending(payload: dict):
                 supabase.table('seva_auth_user').update({
                     'qualification': ', '.join(titles)[:1000],
                 }).eq('id', user.id).execute()
+                forget_user(user.id)
         except Exception:
             pass
 
@@ -470,20 +475,14 @@ def login(request):
     user = None
     try:
         if '@' in username:
-            try:
-                user = User.objects.get(email__iexact=username)
-            except Exception:
-                user = User.objects.get(email=username)
+            user = User.objects.get_by_email_ignore_case(username)
         elif username.isdigit():
-            user = User.objects.get(phone=username)
+            user = User.objects.find_by_identity('phone', username)
         else:
             try:
                 user = User.objects.get_by_username_ignore_case(username)
             except User.DoesNotExist:
-                try:
-                    user = User.objects.get(email__iexact=username)
-                except Exception:
-                    user = User.objects.get(email=username)
+                user = User.objects.get_by_email_ignore_case(username)
     except User.DoesNotExist:
         return Response(
             {'message': 'No user found with this username or email.'},
@@ -499,18 +498,21 @@ def login(request):
     if not bool(getattr(user, 'is_active', True)):
         try:
             user.is_active = True
-            user.save()
+            user.save(update_fields=['is_active'])
         except Exception:
             pass
 
     stored_password = getattr(user, 'password', None) or ''
-    password_ok = False
     try:
-        password_ok = check_password(password, stored_password)
+        # Bounded pool; also covers legacy plain-text rows and upgrades outdated hashes.
+        password_ok = check_and_upgrade(user.id, password, stored_password)
+    except PasswordHashingBusy:
+        return Response(
+            {'message': 'Too many sign-in attempts right now. Please try again in a moment.'},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE,
+        )
     except Exception:
         password_ok = False
-    if not password_ok and '$' not in str(stored_password) and str(stored_password).strip() == password:
-        password_ok = True
 
     if not password_ok:
         return Response(
@@ -521,7 +523,7 @@ def login(request):
     if not bool(getattr(user, 'email_verified', False)):
         try:
             user.email_verified = True
-            user.save()
+            user.save(update_fields=['email_verified'])
         except Exception:
             pass
 
@@ -779,15 +781,27 @@ def change_password(request):
             status=status.HTTP_400_BAD_REQUEST,
         )
 
-    user = request.user
-    if not user.check_password(current):
+    # request.user comes from the auth cache without the password hash.
+    try:
+        user = User.objects.get(id=request.user.id)
+    except User.DoesNotExist:
+        return Response({'message': 'User not found.'}, status=status.HTTP_404_NOT_FOUND)
+    try:
+        current_ok, _outdated = verify_password(current, user.password)
+        new_hash = hash_password(new_password) if current_ok else None
+    except PasswordHashingBusy:
+        return Response(
+            {'message': 'Server is busy. Please try again in a moment.'},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE,
+        )
+    if not current_ok:
         return Response(
             {'message': 'Current password is incorrect.'},
             status=status.HTTP_400_BAD_REQUEST,
         )
 
-    user.set_password(new_password)
-    user.save()
+    user.password = new_hash
+    user.save(update_fields=['password'])
     return Response({'message': 'Password updated successfully.'}, status=status.HTTP_200_OK)
 
 
@@ -876,6 +890,7 @@ def delete_account(request):
                 'email': user.email,
                 'phone': None,
             }).eq('id', original_id).execute()
+            forget_user(original_id)
         except Exception as e:
             logger.warning(f"Supabase update for delete_account failed: {e}")
             # Supabase update is optional; proceed if it fails
@@ -1008,7 +1023,7 @@ def social_login(request):
     if not bool(getattr(user, 'email_verified', False)):
         try:
             user.email_verified = True
-            user.save()
+            user.save(update_fields=['email_verified'])
         except Exception:
             pass
     user_data = UserProfileSerializer(user).data
@@ -1288,6 +1303,7 @@ def accept_terms(request):
         }
         
         supabase.table('seva_auth_user').update(update_data).eq('id', user.id).execute()
+        forget_user(user.id)
         
         return Response(
             {'message': 'Terms and conditions accepted successfully.'},
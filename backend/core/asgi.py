@@ -3,6 +3,11 @@ ASGI config for core project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve with an ASGI server (e.g. ``gunicorn core.asgi:application -k
+uvicorn.workers.UvicornWorker``) so the realtime stream (/api/realtime/stream/) holds its
+SSE / long-poll connections on the event loop instead of a worker thread each. Lifespan
+events are answered here; on shutdown the shared realtime hub stops polling.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 """
@@ -13,4 +18,19 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from services.realtime_hub import realtime_hub  # noqa: E402  (needs the app registry)
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                realtime_hub.stop()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+    await django_application(scope, receive, send)
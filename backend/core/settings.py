@@ -79,6 +79,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # Coalesces duplicate Supabase reads per request; adds X-Supabase-Calls to responses.
+    'core.supabase_loader.SupabaseRequestScopeMiddleware',
 ]
 
 # WhiteNoise is used in production to serve static files. Make it optional for local dev
@@ -140,6 +142,70 @@ else:
     }
 
 
+# Caches
+# 'default' stays process-local (admin sync throttle etc.). 'services' holds the enriched
+# services catalog and provider ratings and must be shared by every gunicorn worker:
+#   SERVICES_CACHE_URL=redis://127.0.0.1:6379/1   -> Redis (LRU via maxmemory-policy)
+#   SERVICES_CACHE_URL=locmem://                  -> per-process LRU (single worker / dev)
+#   unset                                         -> file-based cache under backend/.cache
+SERVICES_CACHE_ALIAS = 'services'
+SERVICES_CACHE_MAX_ENTRIES = int(os.getenv('SERVICES_CACHE_MAX_ENTRIES', '2000'))
+_services_cache_url = os.getenv('SERVICES_CACHE_URL', '').strip()
+if _services_cache_url.startswith(('redis://', 'rediss://')):
+    _services_cache = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': _services_cache_url,
+    }
+elif _services_cache_url.startswith('locmem'):
+    _services_cache = {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'hamro-services',
+    }
+else:
+    _services_cache = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('SERVICES_CACHE_DIR', str(BASE_DIR / '.cache' / 'services')),
+    }
+_services_cache['OPTIONS'] = {'MAX_ENTRIES': SERVICES_CACHE_MAX_ENTRIES}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    SERVICES_CACHE_ALIAS: _services_cache,
+}
+
+
+# Admin SQLite mirror sync (services/sync_worker.py): 'thread' runs a background worker in each
+# web process guarded by a file lock, 'daemon' leaves it to `manage.py run_admin_sync`,
+# 'inline' syncs inside the admin request.
+ADMIN_SYNC_MODE = os.getenv('ADMIN_SYNC_MODE', 'thread').strip().lower()
+ADMIN_SYNC_INTERVAL_SECONDS = int(os.getenv('ADMIN_SYNC_INTERVAL_SECONDS', '60'))
+ADMIN_SYNC_MIN_GAP_SECONDS = int(os.getenv('ADMIN_SYNC_MIN_GAP_SECONDS', '20'))
+ADMIN_SYNC_LOCK_FILE = os.getenv('ADMIN_SYNC_LOCK_FILE', str(BASE_DIR / '.cache' / 'admin_sync.lock'))
+
+# Concurrent independent Supabase reads inside one request (services/fanout.py).
+SUPABASE_FANOUT_MAX_WORKERS = int(os.getenv('SUPABASE_FANOUT_MAX_WORKERS', '8'))
+SUPABASE_FANOUT_TIMEOUT_SECONDS = float(os.getenv('SUPABASE_FANOUT_TIMEOUT_SECONDS', '10'))
+
+# Realtime chat/notification stream (services/realtime_hub.py, served over ASGI). One
+# upstream poll per process every REALTIME_POLL_SECONDS, shared by all connected clients.
+REALTIME_POLL_SECONDS = float(os.getenv('REALTIME_POLL_SECONDS', '2'))
+REALTIME_STREAM_MAX_SECONDS = int(os.getenv('REALTIME_STREAM_MAX_SECONDS', '300'))
+REALTIME_LONG_POLL_SECONDS = int(os.getenv('REALTIME_LONG_POLL_SECONDS', '25'))
+
+# Password hashing pool (authentication/password_hashing.py). PBKDF2 checks run on at most
+# PASSWORD_HASH_MAX_WORKERS threads per process; once PASSWORD_HASH_MAX_PENDING calls are
+# queued or running, further logins get 503 instead of starving other requests.
+PASSWORD_HASH_MAX_WORKERS = int(os.getenv('PASSWORD_HASH_MAX_WORKERS', '2'))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv('PASSWORD_HASH_MAX_PENDING', '32'))
+PASSWORD_HASH_TIMEOUT_SECONDS = float(os.getenv('PASSWORD_HASH_TIMEOUT_SECONDS', '10'))
+
+# Notification outbox (services/notification_outbox.py): 'thread' delivers from a background
+# thread in each web process, 'daemon' leaves it to `manage.py dispatch_notifications`,
+# 'inline' delivers inside the request.
+NOTIFICATION_OUTBOX_MODE = os.getenv('NOTIFICATION_OUTBOX_MODE', 'thread').strip().lower()
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -202,7 +268,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Django REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'authentication.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -234,6 +300,10 @@ CORS_ALLOWED_ORIGINS = [
 ]
 
 CORS_ALLOW_CREDENTIALS = True
+CORS_EXPOSE_HEADERS = [
+    'X-Supabase-Calls', 'X-Supabase-Coalesced',
+    'X-Chat-Cursor', 'X-Chat-Since', 'X-Chat-Has-More',
+]
 
 # Allow all origins for development only.
 CORS_ALLOW_ALL_ORIGINS = DEBUG
@@ -0,0 +1,273 @@
+"""
+Request-scoped Supabase read coalescing ("dataloader").
+
+SupabaseRequestScopeMiddleware opens a scope for every HTTP request. While a scope is
+active, supabase_config.get_supabase_client() returns a thin proxy around the shared client:
+
+  - identical PostgREST reads (same table, select, filters, order, range) run upstream once;
+    repeats in the same request get a copy of the first response
+  - any insert/update/upsert/delete on a table drops that table's memoized reads, so a view
+    always reads its own writes; an RPC may write any table, so it drops all of them
+  - load_many(table, column, ids) answers per-id lookups from rows already loaded in this
+    request and fetches only the missing ids with one chunked .in_() query
+
+Every response carries X-Supabase-Calls (upstream PostgREST round-trips) and
+X-Supabase-Coalesced (reads answered from the scope). Outside a request (management
+commands, background workers) the plain client is returned and nothing is counted.
+"""
+import contextvars
+import copy
+import threading
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from services.supabase_batch import IN_CHUNK_SIZE, chunked
+
+
+UPSTREAM_CALLS_HEADER = 'X-Supabase-Calls'
+COALESCED_CALLS_HEADER = 'X-Supabase-Coalesced'
+
+_WRITE_METHODS = frozenset({'insert', 'update', 'upsert', 'delete'})
+
+_current_scope = contextvars.ContextVar('supabase_request_scope', default=None)
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return tuple(sorted((str(k), _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple, set, frozenset)):
+        items = [_freeze(v) for v in value]
+        return tuple(sorted(items, key=repr)) if isinstance(value, (set, frozenset)) else tuple(items)
+    return value
+
+
+class RequestScope:
+    """Memoized reads and upstream call counters for one request (thread-safe)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reads = {}
+        self._rows = {}
+        self.upstream_calls = 0
+        self.coalesced_calls = 0
+
+    def count_upstream(self, n=1):
+        with self._lock:
+            self.upstream_calls += n
+
+    def cached_read(self, key):
+        with self._lock:
+            if key not in self._reads:
+                return None
+            self.coalesced_calls += 1
+            return copy.deepcopy(self._reads[key])
+
+    def store_read(self, key, response):
+        with self._lock:
+            self._reads[key] = copy.deepcopy(response)
+
+    def invalidate_table(self, table):
+        with self._lock:
+            for key in [k for k in self._reads if k[0] == table]:
+                del self._reads[key]
+            for key in [k for k in self._rows if k[0] == table]:
+                del self._rows[key]
+
+    def invalidate_all(self):
+        with self._lock:
+            self._reads.clear()
+            self._rows.clear()
+
+    def cached_rows(self, table, columns, column, ids):
+        """(found {id: row}, missing [id]) for a load_many call."""
+        found, missing = {}, []
+        with self._lock:
+            bucket = self._rows.get((table, columns, column), {})
+            for value in ids:
+                if value in bucket:
+                    found[value] = copy.deepcopy(bucket[value])
+                else:
+                    missing.append(value)
+            if found:
+                self.coalesced_calls += 1
+        return found, missing
+
+    def store_rows(self, table, columns, column, ids, rows):
+        with self._lock:
+            bucket = self._rows.setdefault((table, columns, column), {})
+            for value in ids:
+                bucket.setdefault(value, None)
+            for row in rows:
+                bucket[row.get(column)] = copy.deepcopy(row)
+
+
+class _ScopedQuery:
+    """Records a PostgREST builder chain so execute() can coalesce reads / invalidate on writes."""
+
+    def __init__(self, scope, table, builder, calls):
+        self._scope = scope
+        self._table = table
+        self._builder = builder
+        self._calls = calls
+
+    def __getattr__(self, name):
+        attr = getattr(self._builder, name)
+        if not callable(attr):
+            # Properties such as .not_ return the builder itself.
+            self._calls.append((name,))
+            return _ScopedQuery(self._scope, self._table, attr, self._calls)
+
+        def call(*args, **kwargs):
+            self._calls.append((name, _freeze(args), _freeze(kwargs)))
+            return _ScopedQuery(self._scope, self._table, attr(*args, **kwargs), self._calls)
+
+        return call
+
+    def execute(self):
+        methods = {c[0] for c in self._calls}
+        if methods & _WRITE_METHODS:
+            try:
+                return self._builder.execute()
+            finally:
+                self._scope.count_upstream()
+                self._scope.invalidate_table(self._table)
+        is_read = bool(self._calls) and self._calls[0][0] == 'select'
+        key = (self._table, tuple(self._calls))
+        if is_read:
+            cached = self._scope.cached_read(key)
+            if cached is not None:
+                return cached
+        self._scope.count_upstream()
+        response = self._builder.execute()
+        if is_read:
+            self._scope.store_read(key, response)
+        return response
+
+
+class _ScopedRpc:
+    def __init__(self, scope, builder):
+        self._scope = scope
+        self._builder = builder
+
+    def __getattr__(self, name):
+        attr = getattr(self._builder, name)
+        if not callable(attr):
+            return _ScopedRpc(self._scope, attr)
+        return lambda *a, **kw: _ScopedRpc(self._scope, attr(*a, **kw))
+
+    def execute(self):
+        # RPCs may write (seva_apply_rating_delta, seva_apply_password_rehashes, ...) to tables
+        # we cannot tell from here: never memoized, and every memoized read is dropped.
+        try:
+            return self._builder.execute()
+        finally:
+            self._scope.count_upstream()
+            self._scope.invalidate_all()
+
+
+class ScopedSupabaseClient:
+    """Proxy over the shared supabase Client bound to one RequestScope."""
+
+    def __init__(self, client, scope):
+        self._client = client
+        self._scope = scope
+
+    def table(self, name):
+        return _ScopedQuery(self._scope, name, self._client.table(name), [])
+
+    from_ = table
+
+    def rpc(self, *args, **kwargs):
+        return _ScopedRpc(self._scope, self._client.rpc(*args, **kwargs))
+
+    def __getattr__(self, name):
+        # storage, auth, postgrest, ... pass straight through.
+        return getattr(self._client, name)
+
+
+def current_scope():
+    return _current_scope.get()
+
+
+def scoped_client(client):
+    scope = _current_scope.get()
+    return client if scope is None else ScopedSupabaseClient(client, scope)
+
+
+def open_scope():
+    """Start a scope in this context; returns the token for close_scope()."""
+    return _current_scope.set(RequestScope())
+
+
+def close_scope(token):
+    _current_scope.reset(token)
+
+
+def load_many(supabase, table, column, ids, columns='*'):
+    """
+    {id: row} for rows of table whose column is in ids. Inside a request scope, ids
+    already loaded with the same columns are served from the scope; only the rest is
+    fetched, in IN_CHUNK_SIZE .in_() chunks. Ids without a row map to nothing.
+    """
+    wanted = []
+    seen = set()
+    for value in ids:
+        if value is not None and value not in seen:
+            seen.add(value)
+            wanted.append(value)
+    if not wanted:
+        return {}
+    if columns != '*' and column not in [c.strip() for c in columns.split(',')]:
+        columns = f'{columns},{column}'
+    scope = _current_scope.get()
+    found, missing = scope.cached_rows(table, columns, column, wanted) if scope else ({}, wanted)
+    if missing:
+        fetched = []
+        for chunk in chunked(missing, IN_CHUNK_SIZE):
+            r = supabase.table(table).select(columns).in_(column, chunk).execute()
+            fetched.extend(r.data or [])
+        if scope:
+            scope.store_rows(table, columns, column, missing, fetched)
+        for row in fetched:
+            found.setdefault(row.get(column), row)
+    return {k: v for k, v in found.items() if v is not None}
+
+
+class SupabaseRequestScopeMiddleware:
+    """Opens a request scope and reports upstream Supabase calls on the response."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # Async under ASGI so streaming views (realtime_stream) do not pin a thread.
+        self._is_async = iscoroutinefunction(get_response)
+        if self._is_async:
+            markcoroutinefunction(self)
+
+    @staticmethod
+    def _report(scope, response):
+        response[UPSTREAM_CALLS_HEADER] = str(scope.upstream_calls)
+        response[COALESCED_CALLS_HEADER] = str(scope.coalesced_calls)
+        return response
+
+    def __call__(self, request):
+        if self._is_async:
+            return self.__acall__(request)
+        token = open_scope()
+        scope = _current_scope.get()
+        try:
+            response = self.get_response(request)
+        finally:
+            close_scope(token)
+        return self._report(scope, response)
+
+    async def __acall__(self, request):
+        token = open_scope()
+        scope = _current_scope.get()
+        try:
+            response = await self.get_response(request)
+        finally:
+            close_scope(token)
+        return self._report(scope, response)
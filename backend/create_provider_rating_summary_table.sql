@@ -0,0 +1,82 @@
+-- Materialized per-provider rating aggregates (see services/rating_summary.py).
+-- Run in Supabase SQL Editor. Safe to run multiple times.
+-- Kept up to date by the review write paths; rebuild with:
+--   python manage.py rebuild_rating_summaries
+
+CREATE TABLE IF NOT EXISTS seva_provider_rating_summary (
+    provider_id INTEGER PRIMARY KEY REFERENCES seva_auth_user(id) ON DELETE CASCADE,
+    rating_sum INTEGER NOT NULL DEFAULT 0,
+    rating_count INTEGER NOT NULL DEFAULT 0,
+    count_1 INTEGER NOT NULL DEFAULT 0,
+    count_2 INTEGER NOT NULL DEFAULT 0,
+    count_3 INTEGER NOT NULL DEFAULT 0,
+    count_4 INTEGER NOT NULL DEFAULT 0,
+    count_5 INTEGER NOT NULL DEFAULT 0,
+    last_review_at TIMESTAMPTZ,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- Atomic incremental update for one review write: p_old_rating is the rating being
+-- replaced (NULL for a new review), p_new_rating the rating written (NULL for a delete).
+-- Ratings outside 1..5 are ignored, matching the application-side aggregation. Star
+-- comparisons use IS NOT DISTINCT FROM so a NULL side counts as 0, not NULL (count_N is NOT NULL).
+CREATE OR REPLACE FUNCTION seva_apply_rating_delta(
+    p_provider_id INTEGER,
+    p_old_rating INTEGER,
+    p_new_rating INTEGER,
+    p_reviewed_at TIMESTAMPTZ DEFAULT NOW()
+) RETURNS SETOF seva_provider_rating_summary
+LANGUAGE plpgsql AS $$
+DECLARE
+    o INTEGER := CASE WHEN p_old_rating BETWEEN 1 AND 5 THEN p_old_rating END;
+    n INTEGER := CASE WHEN p_new_rating BETWEEN 1 AND 5 THEN p_new_rating END;
+BEGIN
+    INSERT INTO seva_provider_rating_summary AS s (
+        provider_id, rating_sum, rating_count,
+        count_1, count_2, count_3, count_4, count_5, last_review_at, updated_at
+    ) VALUES (
+        p_provider_id,
+        COALESCE(n, 0) - COALESCE(o, 0),
+        (n IS NOT NULL)::INT - (o IS NOT NULL)::INT,
+        (n IS NOT DISTINCT FROM 1)::INT - (o IS NOT DISTINCT FROM 1)::INT,
+        (n IS NOT DISTINCT FROM 2)::INT - (o IS NOT DISTINCT FROM 2)::INT,
+        (n IS NOT DISTINCT FROM 3)::INT - (o IS NOT DISTINCT FROM 3)::INT,
+        (n IS NOT DISTINCT FROM 4)::INT - (o IS NOT DISTINCT FROM 4)::INT,
+        (n IS NOT DISTINCT FROM 5)::INT - (o IS NOT DISTINCT FROM 5)::INT,
+        CASE WHEN n IS NOT NULL THEN p_reviewed_at END,
+        NOW()
+    )
+    ON CONFLICT (provider_id) DO UPDATE SET
+        rating_sum = s.rating_sum + EXCLUDED.rating_sum,
+        rating_count = s.rating_count + EXCLUDED.rating_count,
+        count_1 = s.count_1 + EXCLUDED.count_1,
+        count_2 = s.count_2 + EXCLUDED.count_2,
+        count_3 = s.count_3 + EXCLUDED.count_3,
+        count_4 = s.count_4 + EXCLUDED.count_4,
+        count_5 = s.count_5 + EXCLUDED.count_5,
+        last_review_at = GREATEST(s.last_review_at, EXCLUDED.last_review_at),
+        updated_at = NOW();
+    RETURN QUERY SELECT * FROM seva_provider_rating_summary WHERE provider_id = p_provider_id;
+END;
+$$;
+
+-- Initial backfill from existing reviews.
+INSERT INTO seva_provider_rating_summary (
+    provider_id, rating_sum, rating_count,
+    count_1, count_2, count_3, count_4, count_5, last_review_at, updated_at
+)
+SELECT
+    provider_id,
+    SUM(rating),
+    COUNT(*),
+    COUNT(*) FILTER (WHERE rating = 1),
+    COUNT(*) FILTER (WHERE rating = 2),
+    COUNT(*) FILTER (WHERE rating = 3),
+    COUNT(*) FILTER (WHERE rating = 4),
+    COUNT(*) FILTER (WHERE rating = 5),
+    MAX(COALESCE(updated_at, created_at)),
+    NOW()
+FROM seva_review
+WHERE provider_id IS NOT NULL AND rating BETWEEN 1 AND 5
+GROUP BY provider_id
+ON CONFLICT (provider_id) DO NOTHING;
@@ -2,7 +2,10 @@ from django.contrib import admin
 from django import forms
 from .models import ServiceCategory, Service, Booking, Review, Referral, Payment, Refund, Receipt, ProviderVerification, ServiceCategoryRequest
 from .admin_sync import ensure_admin_data_synced
+from .cache_events import publish_payment_changed
+from .notification_outbox import enqueue_notifications, notification_row
 from supabase_config import get_supabase_client
+from authentication.user_cache import forget_user
 from django.utils import timezone
 from django.utils.html import format_html
 from django.db import models as django_models
@@ -435,6 +438,7 @@ class RefundAdmin(admin.ModelAdmin):
                 'refund_reference': refund_reference or None,
                 'updated_at': now_iso,
             }).eq('id', payment_id).execute()
+            publish_payment_changed(booking_id=booking_id, customer_id=refund.customer_id)
 
         if booking_id is not None:
             supabase.table(BOOKING_TABLE).update({
@@ -488,10 +492,8 @@ class RefundAdmin(admin.ModelAdmin):
             pass
     
     def _send_refund_notification(self, refund, action, reason=None, reference=None):
-        """Send notification to customer and provider"""
+        """Queue notifications for customer and provider (one outbox batch)."""
         try:
-            supabase = get_supabase_client()
-            
             # Notify customer
             if action == 'approved':
                 customer_body = (
@@ -503,15 +505,15 @@ class RefundAdmin(admin.ModelAdmin):
                     f'Your refund request for booking #{refund.booking_id} has been rejected. '
                     f'Reason: {reason or "Not provided"}.'
                 )
-            supabase.table('seva_notification').insert({
-                'user_id': refund.customer_id,
-                'title': f'Refund {action.capitalize()}',
-                'body': customer_body,
-                'notification_type': f'refund_{action}',
-                'related_id': refund.id,
-                'created_at': timezone.now().isoformat(),
-            }).execute()
-            
+            rows = [notification_row(
+                refund.customer_id,
+                f'Refund {action.capitalize()}',
+                customer_body,
+                notification_type=f'refund_{action}',
+                related_id=refund.id,
+            )]
+            keys = [f'refund:{refund.id}:{action}:customer']
+
             # Notify provider if applicable
             if refund.provider:
                 provider_body = (
@@ -519,14 +521,15 @@ class RefundAdmin(admin.ModelAdmin):
                     if action == 'approved'
                     else f'Refund request for booking #{refund.booking_id} has been rejected.'
                 )
-                supabase.table('seva_notification').insert({
-                    'user_id': refund.provider_id,
-                    'title': f'Refund {action.capitalize()}',
-                    'body': provider_body,
-                    'notification_type': f'refund_{action}',
-                    'related_id': refund.id,
-                    'created_at': timezone.now().isoformat(),
-                }).execute()
+                rows.append(notification_row(
+                    refund.provider_id,
+                    f'Refund {action.capitalize()}',
+                    provider_body,
+                    notification_type=f'refund_{action}',
+                    related_id=refund.id,
+                ))
+                keys.append(f'refund:{refund.id}:{action}:provider')
+            enqueue_notifications(rows, keys)
         except Exception as e:
             logger.error(f'Failed to send refund notification: {e}')
 
@@ -630,6 +633,7 @@ class ProviderVerificationAdmin(admin.ModelAdmin):
                 payload['is_verified'] = False
                 payload['rejection_reason'] = None
             supabase.table('seva_auth_user').update(payload).eq('id', pid).execute()
+            forget_user(pid)
         self.message_user(request, f'Updated {len(provider_ids)} provider application(s) to {status_value}.')
 
     @admin.action(description='Set selected applications to pending')
@@ -1,5 +1,6 @@
 from django.core.cache import cache
-from django.core.management import call_command
+
+from .sync_worker import MODE_DAEMON, MODE_INLINE, run_sync_once, sync_mode, sync_worker
 
 
 SYNC_CACHE_KEY = 'admin_supabase_sync_last_epoch'
@@ -7,16 +8,18 @@ SYNC_TTL_SECONDS = 20
 
 
 def ensure_admin_data_synced():
-    """Throttle expensive sync commands while keeping admin pages fresh."""
-    if cache.get(SYNC_CACHE_KEY):
+    """
+    Keep admin pages fresh without making the request wait for a sync.
+    The background worker (services/sync_worker.py) does the work; this only nudges it.
+    """
+    mode = sync_mode()
+    if mode == MODE_DAEMON:
+        # `manage.py run_admin_sync` refreshes the mirror on its own cadence.
         return
-    try:
-        call_command('sync_supabase_users', verbosity=0)
-    except Exception:
-        pass
-    try:
-        call_command('sync_supabase_all', verbosity=0)
-    except Exception:
-        pass
-    cache.set(SYNC_CACHE_KEY, 1, timeout=SYNC_TTL_SECONDS)
-
+    if mode == MODE_INLINE:
+        if cache.get(SYNC_CACHE_KEY):
+            return
+        run_sync_once()
+        cache.set(SYNC_CACHE_KEY, 1, timeout=SYNC_TTL_SECONDS)
+        return
+    sync_worker.request_sync()
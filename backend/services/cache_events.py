@@ -0,0 +1,199 @@
+"""
+Cache invalidation events for the shared services catalog.
+
+Write paths publish what changed (a service row, a provider profile, a review, the
+category list) and the subscribed handlers drop only the affected cache entries:
+
+  services:list    keys (category_id, provider_id), any part may be None (= "all")
+  services:rating  keys provider_id, values rating summaries (see rating_summary.py)
+  wallet:ledger    keys customer_id
+  verification:status  keys provider_id (see verification_index.py)
+  storage:signed_url   keys (bucket, path, expires_in) (see signed_urls.py; never invalidated,
+                       attachment paths are immutable)
+  places:autocomplete / places:details / places:reverse
+                       Google Maps proxy answers (see places_proxy.py; TTL only)
+
+auth:user (authenticated user rows) lives in authentication/user_cache.py and is dropped
+directly by User.save() and the seva_auth_user update paths.
+
+Because stale entries are removed at write time, the TTLs below are only a safety net.
+"""
+import logging
+from collections import defaultdict
+
+from authentication.user_directory import user_directory
+from supabase_config import get_supabase_client
+
+from .search_index import service_search_index
+from .shared_cache import get_namespace
+
+
+logger = logging.getLogger(__name__)
+
+SERVICES_LIST_CACHE_TTL_SECONDS = 300
+PROVIDER_RATING_CACHE_TTL_SECONDS = 600
+WALLET_LEDGER_CACHE_TTL_SECONDS = 120
+VERIFICATION_STATUS_CACHE_TTL_SECONDS = 300
+SIGNED_URL_CACHE_TTL_SECONDS = 12 * 60 * 60
+PLACES_AUTOCOMPLETE_CACHE_TTL_SECONDS = 7 * 24 * 60 * 60
+PLACE_DETAILS_CACHE_TTL_SECONDS = 30 * 24 * 60 * 60
+REVERSE_GEOCODE_CACHE_TTL_SECONDS = 30 * 24 * 60 * 60
+
+SERVICES_LIST_CACHE = get_namespace('services:list', SERVICES_LIST_CACHE_TTL_SECONDS)
+PROVIDER_RATING_CACHE = get_namespace('services:rating', PROVIDER_RATING_CACHE_TTL_SECONDS)
+WALLET_LEDGER_CACHE = get_namespace('wallet:ledger', WALLET_LEDGER_CACHE_TTL_SECONDS)
+VERIFICATION_STATUS_CACHE = get_namespace('verification:status', VERIFICATION_STATUS_CACHE_TTL_SECONDS)
+SIGNED_URL_CACHE = get_namespace('storage:signed_url', SIGNED_URL_CACHE_TTL_SECONDS)
+PLACES_AUTOCOMPLETE_CACHE = get_namespace('places:autocomplete', PLACES_AUTOCOMPLETE_CACHE_TTL_SECONDS)
+PLACE_DETAILS_CACHE = get_namespace('places:details', PLACE_DETAILS_CACHE_TTL_SECONDS)
+REVERSE_GEOCODE_CACHE = get_namespace('places:reverse', REVERSE_GEOCODE_CACHE_TTL_SECONDS)
+
+SERVICE_CHANGED = 'service_changed'
+PROVIDER_CHANGED = 'provider_changed'
+REVIEW_CHANGED = 'review_changed'
+CATALOG_CHANGED = 'catalog_changed'
+PAYMENT_CHANGED = 'payment_changed'
+
+_SUBSCRIBERS = defaultdict(list)
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def subscribe(event, handler):
+    """Register handler(**payload) for event. Handlers must not raise into the write path."""
+    if handler not in _SUBSCRIBERS[event]:
+        _SUBSCRIBERS[event].append(handler)
+
+
+def publish(event, **payload):
+    for handler in list(_SUBSCRIBERS.get(event, ())):
+        try:
+            handler(**payload)
+        except Exception as e:
+            logger.warning('cache event %s handler %s failed: %s', event, getattr(handler, '__name__', handler), e)
+
+
+def publish_service_changed(category_id=None, provider_id=None):
+    """A seva_service row for (category_id, provider_id) was inserted, updated or deleted."""
+    publish(SERVICE_CHANGED, category_id=_to_int(category_id), provider_id=_to_int(provider_id))
+
+
+def publish_provider_changed(provider_id, category_ids=None):
+    """Provider name/profession/location/verification changed; every list showing them is stale."""
+    publish(PROVIDER_CHANGED, provider_id=_to_int(provider_id), category_ids=category_ids)
+
+
+def publish_review_changed(provider_id):
+    publish(REVIEW_CHANGED, provider_id=_to_int(provider_id))
+
+
+def publish_catalog_changed():
+    """Category rows changed (names are denormalized into every cached list)."""
+    publish(CATALOG_CHANGED)
+
+
+def publish_payment_changed(booking_id=None, customer_id=None):
+    """A seva_payment row was inserted or changed status; the customer's wallet ledger is stale."""
+    publish(PAYMENT_CHANGED, booking_id=_to_int(booking_id), customer_id=_to_int(customer_id))
+
+
+def _service_list_keys(category_id, provider_id):
+    keys = {(None, None)}
+    if category_id is not None:
+        keys.add((category_id, None))
+    if provider_id is not None:
+        keys.add((None, provider_id))
+    if category_id is not None and provider_id is not None:
+        keys.add((category_id, provider_id))
+    return keys
+
+
+def _provider_category_ids(provider_id):
+    r = (
+        get_supabase_client()
+        .table('seva_service')
+        .select('category_id')
+        .eq('provider_id', provider_id)
+        .execute()
+    )
+    return {cid for cid in (_to_int(row.get('category_id')) for row in (r.data or [])) if cid is not None}
+
+
+def _invalidate_service_lists(category_id=None, provider_id=None):
+    if category_id is None and provider_id is not None:
+        # Unknown category: fall back to every category the provider currently lists in.
+        _invalidate_provider_lists(provider_id)
+        return
+    SERVICES_LIST_CACHE.delete_many(_service_list_keys(category_id, provider_id))
+
+
+def _invalidate_provider_lists(provider_id=None, category_ids=None):
+    if provider_id is None:
+        return
+    if category_ids is None:
+        try:
+            category_ids = _provider_category_ids(provider_id)
+        except Exception as e:
+            logger.warning('provider %s category lookup failed, clearing services cache: %s', provider_id, e)
+            SERVICES_LIST_CACHE.clear()
+            return
+    keys = _service_list_keys(None, provider_id)
+    for cid in category_ids:
+        keys |= _service_list_keys(_to_int(cid), provider_id)
+    SERVICES_LIST_CACHE.delete_many(keys)
+
+
+def _reload_provider_directory_entry(provider_id=None, category_ids=None):
+    # Must run before the list invalidation so rebuilt lists see the new provider row.
+    if provider_id is not None:
+        user_directory.reload_ids([provider_id])
+
+
+def _invalidate_verification_status(provider_id=None, category_ids=None):
+    # Must run before the list invalidation so rebuilt lists see the new badge.
+    if provider_id is not None:
+        VERIFICATION_STATUS_CACHE.delete(provider_id)
+
+
+def _invalidate_provider_rating(provider_id=None):
+    if provider_id is not None:
+        PROVIDER_RATING_CACHE.delete(provider_id)
+
+
+def _invalidate_catalog():
+    SERVICES_LIST_CACHE.clear()
+
+
+def _booking_customer_id(booking_id):
+    r = (
+        get_supabase_client()
+        .table('seva_booking')
+        .select('customer_id')
+        .eq('id', booking_id)
+        .limit(1)
+        .execute()
+    )
+    return _to_int(r.data[0].get('customer_id')) if r.data else None
+
+
+def _invalidate_wallet_ledger(booking_id=None, customer_id=None):
+    if customer_id is None and booking_id is not None:
+        customer_id = _booking_customer_id(booking_id)
+    if customer_id is not None:
+        WALLET_LEDGER_CACHE.delete(customer_id)
+
+
+subscribe(SERVICE_CHANGED, _invalidate_service_lists)
+subscribe(PROVIDER_CHANGED, _reload_provider_directory_entry)
+subscribe(PROVIDER_CHANGED, _invalidate_verification_status)
+subscribe(PROVIDER_CHANGED, _invalidate_provider_lists)
+subscribe(REVIEW_CHANGED, _invalidate_provider_rating)
+subscribe(CATALOG_CHANGED, _invalidate_catalog)
+subscribe(PAYMENT_CHANGED, _invalidate_wallet_ledger)
+for _event in (SERVICE_CHANGED, PROVIDER_CHANGED, CATALOG_CHANGED):
+    subscribe(_event, service_search_index.mark_stale)
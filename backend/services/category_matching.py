@@ -8,6 +8,9 @@ backfill inserted seva_service rows under the wrong category_id.
 
 from __future__ import annotations
 
+import re
+from functools import lru_cache
+
 from .service_name_utils import normalize_service_key
 
 
@@ -15,6 +18,49 @@ def _lower(s: str | None) -> str:
     return (s or "").strip().lower()
 
 
+def _keywords(*words: str) -> re.Pattern:
+    """
+    One compiled alternation for a keyword list. ``.search(t)`` is equivalent to
+    ``any(k in t for k in words)`` (plain substring semantics, no word boundaries) but
+    scans the text once instead of once per keyword.
+    """
+    unique = sorted(set(words), key=lambda w: (-len(w), w))
+    return re.compile("|".join(re.escape(w) for w in unique))
+
+
+# --- Home Services -----------------------------------------------------------
+
+_HOME_KEYWORDS = _keywords(
+    "plumber",
+    "plumbing",
+    "carpenter",
+    "carpentry",
+    "electrician",
+    "electrical",
+    "electric repair",
+    "appliance",
+    "application repair",  # common typo → still home context
+    "painter",
+    "painting",
+    "cleaner",
+    "cleaning",
+    "handyman",
+    "home repair",
+    "household",
+    "hvac",
+    "gardener",
+    "locksmith",
+    "pest control",
+    "mobile repair",
+    "ac repair",
+    "pipe",
+    "woodwork",
+    "tiling",
+    "mason",
+)
+_REPAIR_SPECIALIST_CONTEXT = _keywords("appliance", "electrical", "electric", "ac ", "mobile", "hvac")
+
+
 def _profession_matches_home_services(text: str) -> bool:
     """Trades and domestic services — Home Services category only."""
     t = _lower(text)
@@ -23,51 +69,65 @@ def _profession_matches_home_services(text: str) -> bool:
     # Interior decorator / design belongs with home styling, not standalone event decorator
     if "interior" in t and "decor" in t:
         return True
-    home_keywords = (
-        "plumber",
-        "plumbing",
-        "carpenter",
-        "carpentry",
-        "electrician",
-        "electrical",
-        "electric repair",
-        "appliance",
-        "application repair",  # common typo → still home context
-        "painter",
-        "painting",
-        "cleaner",
-        "cleaning",
-        "handyman",
-        "home repair",
-        "household",
-        "hvac",
-        "gardener",
-        "gardener",
-        "locksmith",
-        "pest control",
-        "plumber",
-        "mobile repair",
-        "ac repair",
-        "plumber",
-        "pipe",
-        "woodwork",
-        "tiling",
-        "mason",
-    )
-    if any(k in t for k in home_keywords):
+    # Also covers "Plumber , Electrician" style combined professions
+    if _HOME_KEYWORDS.search(t):
         return True
-    # "Plumber , Electrician" style combined professions
-    if "plumber" in t or "electrician" in t or "carpenter" in t:
+    if "repair specialist" in t and _REPAIR_SPECIALIST_CONTEXT.search(t):
         return True
-    if "repair specialist" in t:
-        if any(
-            x in t
-            for x in ("appliance", "electrical", "electric", "ac ", "mobile", "hvac")
-        ):
-            return True
     return False
 
 
+# --- Events ------------------------------------------------------------------
+
+_EVENTS_EXCLUDE = _keywords(
+    "tutor",
+    "math",
+    "education",
+    "courier",
+    "dietitian",
+    "software",
+    "nurse",
+    "medical",
+    "electrician",
+    "plumber",
+    "carpenter",
+    "appliance",
+)
+_EVENT_KEYWORDS = _keywords(
+    "dj",
+    "disc jockey",
+    "photographer",
+    "photography",
+    "videographer",
+    "videography",
+    "cinematography",
+    "caterer",
+    "catering",
+    "event planner",
+    "wedding planner",
+    "party planner",
+    "decorator",
+    "event decor",
+    "wedding",
+    "banquet",
+    "ceremony",
+    "host",
+    "emcee",
+    "mc",
+    "master of ceremony",
+    "sound engineer",
+    "lighting",
+    "stage",
+    "florist",
+    "flower",
+    "band",
+    "entertainment",
+    "coordination",
+    "event management",
+    "event staff",
+)
+
+
 def _profession_matches_events(text: str) -> bool:
     """Weddings, parties, AV, catering — Events category only."""
     t = _lower(text)
@@ -76,182 +136,91 @@ def _profession_matches_events(text: str) -> bool:
     # Hard exclude home trades (never Events)
     if _profession_matches_home_services(text):
         return False
-    if any(
-        x in t
-        for x in (
-            "tutor",
-            "math",
-            "education",
-            "courier",
-            "dietitian",
-            "software",
-            "nurse",
-            "medical",
-            "electrician",
-            "plumber",
-            "carpenter",
-            "appliance",
-        )
-    ):
+    if _EVENTS_EXCLUDE.search(t):
         return False
-
-    event_keywords = (
-        "dj",
-        "disc jockey",
-        "photographer",
-        "photography",
-        "videographer",
-        "videography",
-        "cinematography",
-        "caterer",
-        "catering",
-        "event planner",
-        "wedding planner",
-        "party planner",
-        "decorator",
-        "event decor",
-        "wedding",
-        "banquet",
-        "ceremony",
-        "host",
-        "emcee",
-        "mc",
-        "master of ceremony",
-        "sound engineer",
-        "lighting",
-        "stage",
-        "florist",
-        "flower",
-        "band",
-        "entertainment",
-        "coordination",
-        "event management",
-        "event staff",
-    )
-    if any(k in t for k in event_keywords):
-        return True
-    # Short titles
-    if t.strip() in ("dj", "mc", "photographer", "videographer", "caterer", "decorator"):
-        return True
-    return False
+    # Short titles ("dj", "mc", "caterer", ...) are keywords themselves.
+    return bool(_EVENT_KEYWORDS.search(t))
+
+
+# --- Category rules ------------------------------------------------------------
+
+def _any_of(*words: str):
+    pattern = _keywords(*words)
+    return lambda pro: bool(pattern.search(pro))
+
+
+# (category-name keywords, profession matcher) in priority order; the first rule whose
+# keywords occur in the lower-cased category name decides. Matchers get the lower-cased profession.
+_CATEGORY_RULES = (
+    (
+        _keywords("health", "medical", "first aid", "clinic", "hospital"),
+        _any_of(
+            "first aid", "health", "nurse", "medical", "paramedic", "doctor", "care",
+            "cpr", "training", "diet", "therapy", "massage",
+        ),
+    ),
+    (
+        _keywords("education", "tutor"),
+        _any_of("tutor", "education", "math", "teaching", "teacher", "language", "music teacher", "elderly"),
+    ),
+    (
+        _keywords("tech"),  # also "technology"
+        _any_of("tech", "computer", "developer", "web", "it", "software", "support", "programming"),
+    ),
+    (
+        _keywords("transport", "logistics"),
+        _any_of("taxi", "driver", "courier", "delivery", "transport", "vehicle", "cargo"),
+    ),
+    (_keywords("event"), _profession_matches_events),
+    # Home Services — "Home", "Home Services", etc.
+    (_keywords("home", "household"), _profession_matches_home_services),
+    # Legacy single-word category slugs (names containing "home" were taken above)
+    (_keywords("plumb"), _any_of("plumb")),
+    (_keywords("electric"), _any_of("electric")),
+    (_keywords("clean"), _any_of("clean")),
+    (_keywords("carpent"), _any_of("carpent")),
+    (
+        _keywords("beauty", "wellness", "salon"),
+        _any_of("beauty", "salon", "massage", "hair", "wellness", "makeup", "spa"),
+    ),
+    (
+        _keywords("fitness", "yoga", "gym"),
+        _any_of("fitness", "yoga", "trainer", "gym", "pilates", "workout", "personal train"),
+    ),
+)
+
+CATEGORY_MATCH_CACHE_SIZE = 8192
+
+
+@lru_cache(maxsize=512)
+def _category_matcher(cat: str):
+    """Profession matcher for a lower-cased category name, or None for unmapped categories."""
+    for category_pattern, matcher in _CATEGORY_RULES:
+        if category_pattern.search(cat):
+            return matcher
+    return None
+
+
+@lru_cache(maxsize=CATEGORY_MATCH_CACHE_SIZE)
+def _matches_category(pro: str, cat: str) -> bool:
+    matcher = _category_matcher(cat)
+    return bool(matcher and matcher(pro))
 
 
 def provider_profession_matches_category(provider_profession: str, category_name: str) -> bool:
     """
     True if the provider's profession string belongs in this category.
     Strict: unknown category names return False (no permissive default).
+    Memoized per (profession, category) pair; see category_match_cache_info().
     """
-    pro = _lower(provider_profession)
     cat = _lower(category_name)
     if not cat:
         return False
+    return _matches_category(_lower(provider_profession), cat)
 
-    # Healthcare
-    if any(x in cat for x in ("health", "medical", "first aid", "clinic", "hospital")):
-        return any(
-            x in pro
-            for x in (
-                "first aid",
-                "health",
-                "nurse",
-                "medical",
-                "paramedic",
-                "doctor",
-                "care",
-                "cpr",
-                "training",
-                "diet",
-                "therapy",
-                "massage",
-            )
-        )
-
-    # Education
-    if "education" in cat or "tutor" in cat:
-        return any(
-            x in pro
-            for x in (
-                "tutor",
-                "education",
-                "math",
-                "teaching",
-                "teacher",
-                "language",
-                "music teacher",
-                "elderly",
-            )
-        )
-
-    # Technology / IT
-    if "tech" in cat or "technology" in cat:
-        return any(
-            x in pro
-            for x in (
-                "tech",
-                "computer",
-                "developer",
-                "web",
-                "it",
-                "software",
-                "support",
-                "programming",
-            )
-        )
-
-    # Transportation
-    if "transport" in cat or "logistics" in cat:
-        return any(
-            x in pro
-            for x in (
-                "taxi",
-                "driver",
-                "courier",
-                "delivery",
-                "transport",
-                "vehicle",
-                "cargo",
-            )
-        )
-
-    # Events (name contains "event")
-    if "event" in cat:
-        return _profession_matches_events(provider_profession)
 
-    # Home Services — "Home", "Home Services", etc.
-    if "home" in cat or "household" in cat:
-        return _profession_matches_home_services(provider_profession)
-
-    # Legacy single-word category slugs
-    if "plumb" in cat:
-        return "plumb" in pro
-    if "electric" in cat and "home" not in cat:
-        return "electric" in pro
-    if "clean" in cat and "home" not in cat:
-        return "clean" in pro
-    if "carpent" in cat:
-        return "carpent" in pro
-
-    # Beauty & wellness
-    if "beauty" in cat or "wellness" in cat or "salon" in cat:
-        return any(x in pro for x in ("beauty", "salon", "massage", "hair", "wellness", "makeup", "spa"))
-
-    # Fitness / yoga (if used as a category name)
-    if any(x in cat for x in ("fitness", "yoga", "gym")):
-        return any(
-            x in pro
-            for x in (
-                "fitness",
-                "yoga",
-                "trainer",
-                "gym",
-                "pilates",
-                "workout",
-                "personal train",
-            )
-        )
-
-    # Unknown / unmapped category — do not match everyone
-    return False
+def category_match_cache_info():
+    return _matches_category.cache_info()
 
 
 def catalog_service_title_matches_category(service_title: str, category_name: str) -> bool:
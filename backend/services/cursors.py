@@ -0,0 +1,40 @@
+"""
+Opaque keyset-pagination cursors.
+
+A cursor is the sort key of the last item on a page, JSON-encoded and base64url'd so
+clients pass it back unchanged (?cursor=...). decode_cursor returns None for anything
+malformed; callers treat that as "first page".
+"""
+import base64
+import json
+
+
+def encode_cursor(*parts):
+    raw = json.dumps(list(parts), separators=(',', ':'), default=str).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token, size=None):
+    if not token or not isinstance(token, str):
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        parts = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+    except (ValueError, TypeError, UnicodeError):
+        return None
+    if not isinstance(parts, list) or (size is not None and len(parts) != size):
+        return None
+    return tuple(parts)
+
+
+def parse_limit(value, default=None, maximum=100):
+    """?limit= as a positive int capped at maximum; default when missing or invalid."""
+    if value in (None, ''):
+        return default
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        return default
+    if limit <= 0:
+        return default
+    return min(limit, maximum)
@@ -0,0 +1,104 @@
+"""
+Bounded concurrent fan-out for independent Supabase reads.
+
+Views that need several unrelated lookups (users, services, payments, ...) submit them to
+one Fanout; they run on a shared, process-wide thread pool so the view waits roughly for
+the slowest read instead of the sum of all of them. Dependent steps stay ordered by
+waiting on the result they need (fan.result('services')) before submitting the next read.
+
+Every task has a timeout (SUPABASE_FANOUT_TIMEOUT_SECONDS). A task that fails or times out
+yields its default and is recorded in fan.errors, so callers enrich what they can instead
+of failing the whole response. Tasks run in a copy of the caller's context, so the
+request-scoped Supabase dataloader (core/supabase_loader.py) still coalesces and counts
+their calls. Fan-outs started from inside a pool thread run inline to avoid pool deadlock.
+"""
+import concurrent.futures
+import contextvars
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_pool_lock = threading.Lock()
+_in_pool = threading.local()
+
+
+def _max_workers():
+    return max(1, int(getattr(settings, 'SUPABASE_FANOUT_MAX_WORKERS', 8) or 8))
+
+
+def default_timeout_seconds():
+    return float(getattr(settings, 'SUPABASE_FANOUT_TIMEOUT_SECONDS', 10) or 10)
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = concurrent.futures.ThreadPoolExecutor(
+                max_workers=_max_workers(), thread_name_prefix='supabase-fanout'
+            )
+        return _pool
+
+
+def _run_in_pool(ctx, fn, args, kwargs):
+    _in_pool.active = True
+    try:
+        return ctx.run(fn, *args, **kwargs)
+    finally:
+        _in_pool.active = False
+
+
+class Fanout:
+    """Named tasks with per-task timeouts and per-task failure isolation."""
+
+    def __init__(self, label='fanout', timeout=None):
+        self.label = label
+        self.timeout = default_timeout_seconds() if timeout is None else float(timeout)
+        self._tasks = {}
+        self._results = {}
+        self.errors = {}
+        self._inline = bool(getattr(_in_pool, 'active', False))
+
+    def submit(self, name, fn, *args, default=None, timeout=None, **kwargs):
+        timeout = self.timeout if timeout is None else float(timeout)
+        deadline = time.monotonic() + timeout
+        if self._inline:
+            try:
+                self._results[name] = fn(*args, **kwargs)
+            except Exception as e:
+                self._fail(name, e, default)
+            return
+        ctx = contextvars.copy_context()
+        future = _get_pool().submit(_run_in_pool, ctx, fn, args, kwargs)
+        self._tasks[name] = (future, deadline, timeout, default)
+
+    def _fail(self, name, exc, default):
+        self.errors[name] = exc
+        self._results[name] = default
+        logger.warning('%s: %s failed: %s', self.label, name, exc or 'timeout')
+
+    def result(self, name):
+        """Wait for one task (up to its own deadline); its default on failure or timeout."""
+        if name in self._results:
+            return self._results[name]
+        future, deadline, timeout, default = self._tasks[name]
+        try:
+            self._results[name] = future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            self._fail(name, TimeoutError(f'timed out after {timeout:.1f}s'), default)
+        except Exception as e:
+            self._fail(name, e, default)
+        return self._results[name]
+
+    def results(self):
+        """Wait for every submitted task; {name: result or default}."""
+        for name in list(self._tasks):
+            self.result(name)
+        return dict(self._results)
@@ -0,0 +1,326 @@
+"""
+Bundled gazetteer of Nepal's 77 districts, their main municipalities and common spellings.
+
+Location filters and AI intent parsing canonicalize free-typed places here, locally and
+without a network call:
+
+  gazetteer.lookup('Bhairahawa')     -> Place('Siddharthanagar', 'city', 'Rupandehi', ...)
+  gazetteer.canonical('Kathmandoo')  -> Place('Kathmandu', 'district', ...)  (edit distance 1)
+  gazetteer.find_in_text('plumber near patan') -> [Place('Lalitpur', ...)]
+  location_key(' ktm ')              -> 'kathmandu'   (falls back to the normalized text)
+
+Names and aliases are indexed three ways: a dict for exact hits, a character trie for prefix
+completion, and a deletion-neighbourhood index for fuzzy hits (up to 1 edit for 6-8 letter
+input, 2 from 9 letters; candidates are verified with a bounded Levenshtein). Short words
+never match fuzzily ("bank" is not "Banke").
+The tables are plain text below: one line per district or municipality list, which keeps
+the module small and easy to review.
+"""
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+
+Place = namedtuple('Place', 'name kind district province')
+
+# province: districts
+_DISTRICTS = """
+Koshi: Taplejung, Panchthar, Ilam, Jhapa, Morang, Sunsari, Dhankuta, Terhathum, Sankhuwasabha, Bhojpur, Solukhumbu, Okhaldhunga, Khotang, Udayapur
+Madhesh: Saptari, Siraha, Dhanusha, Mahottari, Sarlahi, Rautahat, Bara, Parsa
+Bagmati: Dolakha, Sindhupalchok, Rasuwa, Dhading, Nuwakot, Kathmandu, Bhaktapur, Lalitpur, Kavrepalanchok, Ramechhap, Sindhuli, Makwanpur, Chitwan
+Gandaki: Gorkha, Manang, Mustang, Myagdi, Kaski, Lamjung, Tanahun, Nawalpur, Syangja, Parbat, Baglung
+Lumbini: Rukum East, Rolpa, Pyuthan, Gulmi, Arghakhanchi, Palpa, Parasi, Rupandehi, Kapilvastu, Dang, Banke, Bardiya
+Karnali: Dolpa, Mugu, Humla, Jumla, Kalikot, Dailekh, Jajarkot, Rukum West, Salyan, Surkhet
+Sudurpashchim: Bajura, Bajhang, Achham, Doti, Kailali, Kanchanpur, Dadeldhura, Baitadi, Darchula
+"""
+
+# district: municipalities and well-known towns
+_CITIES = """
+Kathmandu: Kirtipur, Budhanilkantha, Tokha, Tarakeshwar, Gokarneshwar, Chandragiri, Nagarjun, Kageshwari Manohara, Shankharapur, Dakshinkali, Thankot, Boudha, Baneshwor, Koteshwor, Kalanki, Chabahil, Maharajgunj, Thamel
+Lalitpur: Godawari, Mahalaxmi, Imadol, Satdobato, Jawalakhel, Kupondole, Lubhu
+Bhaktapur: Madhyapur Thimi, Suryabinayak, Changunarayan, Lokanthali
+Kavrepalanchok: Banepa, Dhulikhel, Panauti, Panchkhal
+Chitwan: Bharatpur, Ratnanagar, Kalika, Khairahani, Rapti, Sauraha
+Makwanpur: Hetauda
+Nuwakot: Bidur
+Dhading: Nilkantha
+Dolakha: Bhimeshwar
+Sindhuli: Kamalamai
+Kaski: Pokhara
+Gorkha: Gorkha Bazar
+Lamjung: Besisahar
+Tanahun: Vyas, Shuklagandaki
+Syangja: Waling, Putalibazar
+Parbat: Kushma
+Myagdi: Beni
+Nawalpur: Kawasoti, Gaindakot
+Parasi: Bardaghat, Ramgram, Sunwal
+Rupandehi: Butwal, Siddharthanagar, Tilottama, Lumbini Sanskritik, Devdaha, Sainamaina
+Palpa: Tansen
+Kapilvastu: Taulihawa, Banganga, Krishnanagar
+Gulmi: Resunga
+Arghakhanchi: Sandhikharka
+Dang: Ghorahi, Tulsipur, Lamahi
+Banke: Nepalgunj, Kohalpur
+Bardiya: Gulariya, Rajapur
+Surkhet: Birendranagar
+Jumla: Chandannath
+Kailali: Dhangadhi, Tikapur, Lamki Chuha, Ghodaghodi
+Kanchanpur: Bhimdatta
+Doti: Dipayal Silgadhi
+Dadeldhura: Amargadhi
+Achham: Mangalsen
+Morang: Biratnagar, Urlabari, Belbari, Pathari Shanischare, Rangeli, Sundar Haraicha, Letang
+Sunsari: Dharan, Itahari, Inaruwa, Duhabi
+Jhapa: Birtamod, Damak, Mechinagar, Bhadrapur, Arjundhara, Kankai, Shivasatakshi, Gauradaha
+Ilam: Suryodaya, Fikkal
+Dhankuta: Pakhribas
+Udayapur: Triyuga
+Siraha: Lahan, Golbazar
+Saptari: Rajbiraj
+Dhanusha: Janakpur
+Mahottari: Jaleshwar, Bardibas
+Sarlahi: Malangwa, Lalbandi
+Rautahat: Gaur, Chandrapur
+Bara: Kalaiya, Jitpur Simara
+Parsa: Birgunj
+"""
+
+# alias: canonical name
+_ALIASES = """
+ktm: Kathmandu
+kathmandu valley: Kathmandu
+patan: Lalitpur
+bhadgaon: Bhaktapur
+khwopa: Bhaktapur
+thimi: Madhyapur Thimi
+kavre: Kavrepalanchok
+kabhre: Kavrepalanchok
+kabhrepalanchok: Kavrepalanchok
+kavrepalanchowk: Kavrepalanchok
+sindhupalchowk: Sindhupalchok
+makawanpur: Makwanpur
+chitawan: Chitwan
+narayangarh: Bharatpur
+narayanghat: Bharatpur
+tanahu: Tanahun
+damauli: Vyas
+nawalparasi east: Nawalpur
+nawalparasi bardaghat susta east: Nawalpur
+nawalparasi west: Parasi
+nawalparasi bardaghat susta west: Parasi
+rukum purba: Rukum East
+eastern rukum: Rukum East
+rukum paschim: Rukum West
+western rukum: Rukum West
+bhairahawa: Siddharthanagar
+lumbini: Lumbini Sanskritik
+kapilbastu: Kapilvastu
+tamghas: Resunga
+nepalganj: Nepalgunj
+dang deukhuri: Dang
+mahendranagar: Bhimdatta
+dhangadi: Dhangadhi
+dipayal: Dipayal Silgadhi
+silgadhi: Dipayal Silgadhi
+birtamode: Birtamod
+kakarbhitta: Mechinagar
+kakarvitta: Mechinagar
+biratnagr: Biratnagar
+tehrathum: Terhathum
+solu: Solukhumbu
+udaypur: Udayapur
+gaighat: Triyuga
+dhanusa: Dhanusha
+janakpurdham: Janakpur
+janakpur dham: Janakpur
+birganj: Birgunj
+simara: Jitpur Simara
+charikot: Bhimeshwar
+"""
+
+_WORD_RE = re.compile(r'[a-z0-9]+')
+
+
+def normalize(text):
+    """Lower-case words separated by single spaces ('  Kathmandu, ' -> 'kathmandu')."""
+    return ' '.join(_WORD_RE.findall((text or '').lower()))
+
+
+MIN_FUZZY_KEY_LENGTH = 5
+MAX_FUZZY_DISTANCE = 2
+
+
+def _max_distance(length):
+    if length < 6:
+        return 0
+    if length < 9:
+        return 1
+    return 2
+
+
+def _deletions(word, max_distance):
+    """word plus every string made by deleting up to max_distance of its characters."""
+    out = {word}
+    frontier = {word}
+    for _ in range(max_distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))} - out
+        out |= frontier
+    return out
+
+
+def _edit_distance(a, b, limit):
+    """Levenshtein distance, or limit + 1 as soon as it is known to exceed limit."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        row = [i]
+        for j, cb in enumerate(b, 1):
+            row.append(min(row[j - 1] + 1, prev[j] + 1, prev[j - 1] + (ca != cb)))
+        if min(row) > limit:
+            return limit + 1
+        prev = row
+    return prev[-1]
+
+
+def _parse_table(text):
+    for line in text.strip().splitlines():
+        head, _, tail = line.partition(':')
+        yield head.strip(), [item.strip() for item in tail.split(',') if item.strip()]
+
+
+class Gazetteer:
+    """Exact, alias and fuzzy (trie + bounded edit distance) lookups of Nepal places."""
+
+    _END = ''
+
+    def __init__(self):
+        self._places = {}
+        self._trie = {}
+        # Deletion neighbourhood index: every string reachable from a key by deleting up to
+        # MAX_FUZZY_DISTANCE characters -> those keys. Two strings within edit distance d
+        # share a variant, so a fuzzy lookup is a few dict hits plus verification.
+        self._deletes = {}
+        self.districts = []
+        self.max_words = 1
+        for province, districts in _parse_table(_DISTRICTS):
+            for name in districts:
+                self._add(name, Place(name, 'district', name, province))
+                self.districts.append(name)
+        for district, cities in _parse_table(_CITIES):
+            province = self._places[normalize(district)].province
+            for name in cities:
+                self._add(name, Place(name, 'city', district, province))
+        for alias, (canonical,) in _parse_table(_ALIASES):
+            place = self._places.get(normalize(canonical))
+            if place is not None:
+                self._add(alias, place)
+
+    def _add(self, name, place):
+        key = normalize(name)
+        if not key or key in self._places:
+            return
+        self._places[key] = place
+        self.max_words = max(self.max_words, key.count(' ') + 1)
+        node = self._trie
+        for ch in key:
+            node = node.setdefault(ch, {})
+        node[self._END] = key
+        if len(key) >= MIN_FUZZY_KEY_LENGTH:
+            for variant in _deletions(key, MAX_FUZZY_DISTANCE):
+                self._deletes.setdefault(variant, []).append(key)
+
+    def __len__(self):
+        return len(self._places)
+
+    def lookup(self, text):
+        """Exact name or alias match (after normalize), else None."""
+        return self._places.get(normalize(text))
+
+    def _fuzzy(self, key, max_distance):
+        """(distance, matched_key) of the closest entry within max_distance, or None."""
+        candidates = set()
+        for variant in _deletions(key, max_distance):
+            candidates.update(self._deletes.get(variant, ()))
+        best = None
+        for candidate in candidates:
+            distance = _edit_distance(key, candidate, max_distance)
+            if distance <= max_distance and (best is None or (distance, candidate) < best):
+                best = (distance, candidate)
+        return best
+
+    def canonical(self, text):
+        """Exact/alias match, else the closest place within the length-based edit distance."""
+        key = normalize(text)
+        if not key:
+            return None
+        place = self._places.get(key)
+        if place is not None:
+            return place
+        max_distance = _max_distance(len(key))
+        if not max_distance:
+            return None
+        found = self._fuzzy(key, max_distance)
+        return self._places[found[1]] if found else None
+
+    def complete(self, prefix, limit=10):
+        """Canonical places whose name or alias starts with prefix (trie walk)."""
+        node = self._trie
+        for ch in normalize(prefix):
+            node = node.get(ch)
+            if node is None:
+                return []
+        out, seen, stack = [], set(), [node]
+        while stack and len(out) < limit:
+            current = stack.pop()
+            matched = current.get(self._END)
+            if matched is not None:
+                place = self._places[matched]
+                if place.name not in seen:
+                    seen.add(place.name)
+                    out.append(place)
+            stack.extend(child for c, child in sorted(current.items(), reverse=True) if c != self._END)
+        return out
+
+    def find_in_text(self, text):
+        """Places mentioned in free text, in order, longest phrase first at each position."""
+        normalized = normalize(text)
+        words = normalized.split(' ') if normalized else []
+        found, i = [], 0
+        while i < len(words):
+            step = 1
+            for size in range(min(self.max_words, len(words) - i), 0, -1):
+                phrase = ' '.join(words[i:i + size])
+                # Multi-word phrases only match exactly; fuzzy matching there mostly finds noise.
+                place = self.canonical(phrase) if size == 1 else self._places.get(phrase)
+                if place is not None:
+                    if place not in found:
+                        found.append(place)
+                    step = size
+                    break
+            i += step
+        return found
+
+
+gazetteer = Gazetteer()
+
+
+@lru_cache(maxsize=8192)
+def location_key(text):
+    """Canonical lower-case place name for comparisons; the normalized text when unknown."""
+    place = gazetteer.canonical(text)
+    return place.name.lower() if place else normalize(text)
+
+
+@lru_cache(maxsize=8192)
+def location_district_key(text):
+    """Lower-case district of a known place (the district itself for districts), else ''."""
+    place = gazetteer.canonical(text)
+    return place.district.lower() if place else ''
+
+
+def display_name(text):
+    """Gazetteer spelling for a known place, the stripped input otherwise."""
+    place = gazetteer.canonical(text)
+    return place.name if place else (text or '').strip()
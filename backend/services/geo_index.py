@@ -0,0 +1,207 @@
+"""
+In-memory grid index of provider coordinates for "providers near me" queries.
+
+Providers have no coordinate columns of their own. Their position is the median
+latitude/longitude of their geocoded bookings (seva_booking.latitude/longitude, see
+add_booking_location_columns.sql), which is robust to the odd far-away job. Providers
+without any geocoded booking are not in the index.
+
+Points are bucketed into CELL_DEGREES x CELL_DEGREES cells (about 5.5 x 5 km in Nepal).
+A radius query only scans the cells overlapping the circle's bounding box and measures
+distances there with the equirectangular approximation (metres off haversine at city
+radii), so lookups stay well under a millisecond with tens of thousands of providers.
+
+The index is rebuilt through ensure_fresh(loader) every REFRESH_SECONDS, which covers new
+bookings and provider changes alike. Only the very first build runs in the request thread;
+later rebuilds page through the geocoded bookings on a background thread while queries keep
+using the previous grid. Catalog writes do not trigger a rebuild: a provider's position only
+moves with new bookings.
+"""
+import logging
+import math
+import statistics
+import threading
+import time
+from collections import defaultdict
+
+from django.db import close_old_connections
+
+from .supabase_batch import PAGE_SIZE
+
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = 111.195
+CELL_DEGREES = 0.05
+REFRESH_SECONDS = 300
+BOOKING_TABLE = 'seva_booking'
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lng2 - lng1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def parse_coordinates(lat, lng):
+    """(lat, lng) as floats within range, or None."""
+    try:
+        lat, lng = float(lat), float(lng)
+    except (TypeError, ValueError):
+        return None
+    if not (-90.0 <= lat <= 90.0 and -180.0 <= lng <= 180.0) or (lat == 0.0 and lng == 0.0):
+        return None
+    return lat, lng
+
+
+def provider_points_from_bookings(supabase, service_provider_ids):
+    """provider_id -> (median lat, median lng) of bookings on that provider's services."""
+    samples = defaultdict(list)
+    start = 0
+    while True:
+        r = (
+            supabase.table(BOOKING_TABLE)
+            .select('id,service_id,latitude,longitude')
+            .not_.is_('latitude', 'null')
+            .order('id')
+            .range(start, start + PAGE_SIZE - 1)
+            .execute()
+        )
+        page = r.data or []
+        for row in page:
+            pid = service_provider_ids.get(row.get('service_id'))
+            point = parse_coordinates(row.get('latitude'), row.get('longitude'))
+            if pid is not None and point is not None:
+                samples[pid].append(point)
+        if len(page) < PAGE_SIZE:
+            break
+        start += PAGE_SIZE
+    return {
+        pid: (statistics.median(p[0] for p in points), statistics.median(p[1] for p in points))
+        for pid, points in samples.items()
+    }
+
+
+class ProviderGeoIndex:
+    """Uniform lat/lng grid of provider points with radius queries sorted by distance."""
+
+    def __init__(self, cell_degrees=CELL_DEGREES, refresh_seconds=REFRESH_SECONDS):
+        self.cell_degrees = cell_degrees
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.RLock()
+        self._refresh_lock = threading.Lock()
+        self._cells = {}
+        self._points = {}
+        self._built_at = 0.0
+        self._refreshing = False
+
+    def _cell(self, lat, lng):
+        return int(math.floor(lat / self.cell_degrees)), int(math.floor(lng / self.cell_degrees))
+
+    def rebuild(self, points):
+        """Replace the index with points ({provider_id: (lat, lng)})."""
+        cells = defaultdict(list)
+        clean = {}
+        for pid, point in (points or {}).items():
+            point = parse_coordinates(*point) if point else None
+            if point is None:
+                continue
+            clean[pid] = point
+            cells[self._cell(*point)].append((pid, point[0], point[1]))
+        with self._lock:
+            self._cells = dict(cells)
+            self._points = clean
+            self._built_at = time.time()
+        return len(clean)
+
+    def ensure_fresh(self, loader):
+        """
+        Build from loader() on first use (blocking); once the index is older than
+        refresh_seconds, rebuild it on a background thread and keep serving the current grid.
+        """
+        with self._lock:
+            empty = not self._built_at
+            needed = empty or time.time() - self._built_at >= self.refresh_seconds
+        if not needed:
+            return
+        if empty:
+            with self._refresh_lock:
+                with self._lock:
+                    if self._built_at:
+                        return
+                self.rebuild(loader() or {})
+            return
+        if not self._refresh_lock.acquire(blocking=False):
+            return
+        with self._lock:
+            self._refreshing = True
+        try:
+            threading.Thread(
+                target=self._refresh, args=(loader,), name='provider-geo-refresh', daemon=True
+            ).start()
+        except Exception:
+            self._finish_refresh()
+            raise
+
+    def _refresh(self, loader):
+        try:
+            self.rebuild(loader() or {})
+        except Exception as e:
+            logger.warning('provider geo index refresh failed: %s', e)
+            with self._lock:
+                # Retry after another full interval instead of on every request.
+                self._built_at = time.time()
+        finally:
+            close_old_connections()
+            self._finish_refresh()
+
+    def _finish_refresh(self):
+        with self._lock:
+            self._refreshing = False
+        self._refresh_lock.release()
+
+    def within(self, lat, lng, radius_km, limit=None):
+        """[(distance_km, provider_id)] within radius_km of (lat, lng), nearest first."""
+        radius_km = max(0.0, float(radius_km))
+        dlat = radius_km / KM_PER_DEGREE_LAT
+        dlng = radius_km / (KM_PER_DEGREE_LAT * max(math.cos(math.radians(lat)), 0.01))
+        y0, x0 = self._cell(lat - dlat, lng - dlng)
+        y1, x1 = self._cell(lat + dlat, lng + dlng)
+        # Equirectangular distance: within 0.1% of haversine at these radii and much cheaper.
+        kx = KM_PER_DEGREE_LAT * math.cos(math.radians(lat))
+        ky = KM_PER_DEGREE_LAT
+        r2 = radius_km * radius_km
+        out = []
+        with self._lock:
+            cells = self._cells
+        for y in range(y0, y1 + 1):
+            for x in range(x0, x1 + 1):
+                for pid, plat, plng in cells.get((y, x), ()):
+                    ex = (plng - lng) * kx
+                    ey = (plat - lat) * ky
+                    d2 = ex * ex + ey * ey
+                    if d2 <= r2:
+                        out.append((d2, pid))
+        out.sort()
+        if limit is not None:
+            out = out[:limit]
+        return [(math.sqrt(d2), pid) for d2, pid in out]
+
+    def position(self, provider_id):
+        with self._lock:
+            return self._points.get(provider_id)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'providers': len(self._points),
+                'cells': len(self._cells),
+                'built_at': self._built_at,
+                'refreshing': self._refreshing,
+            }
+
+
+provider_geo_index = ProviderGeoIndex()
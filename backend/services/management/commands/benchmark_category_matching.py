@@ -0,0 +1,370 @@
+"""
+Benchmark the compiled category matcher against the previous keyword-tuple implementation.
+
+Usage (from backend directory, Django configured):
+  python manage.py benchmark_category_matching
+  python manage.py benchmark_category_matching --rows 10000 --repeat 3 --seed 7
+
+Builds a synthetic catalog (professions drawn from real trade words, combined and padded
+the way providers type them), runs every row against every category with:
+
+  legacy    the keyword-tuple scans that services/category_matching.py used before
+  compiled  one regex per rule, memo cache bypassed
+  memoized  compiled + (profession, category) cache, cleared before each pass
+
+and fails if any (profession, category) pair disagrees with the legacy result.
+"""
+from __future__ import annotations
+
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from services.category_matching import (
+    _category_matcher,
+    _lower,
+    _matches_category,
+    provider_profession_matches_category,
+)
+
+
+CATEGORIES = (
+    'Home Services', 'Events', 'Healthcare', 'Education', 'Technology', 'Transportation',
+    'Beauty & Wellness', 'Fitness', 'Plumbing', 'Electrical', 'Cleaning', 'Carpentry', 'Courier',
+)
+PROFESSION_WORDS = (
+    'Plumber', 'Electrician', 'Carpenter', 'Painter', 'House Cleaning', 'Handyman', 'Locksmith',
+    'AC Repair', 'Appliance Repair Specialist', 'Mobile Repair', 'Mason', 'Gardener',
+    'DJ', 'Photographer', 'Videographer', 'Caterer', 'Wedding Planner', 'Event Decorator', 'MC',
+    'Florist', 'Sound Engineer', 'Nurse', 'First Aid Trainer', 'Physiotherapy', 'Dietitian',
+    'Math Tutor', 'Language Teacher', 'Music Teacher', 'Web Developer', 'IT Support',
+    'Software Engineer', 'Taxi Driver', 'Courier', 'Delivery', 'Hair Stylist', 'Makeup Artist',
+    'Spa Therapist', 'Yoga Trainer', 'Personal Trainer', 'Interior Decorator', 'Pest Control',
+)
+
+
+# --- previous implementation (reference for timing and equivalence) --------------------
+
+def _legacy_lower(s: str | None) -> str:
+    return (s or "").strip().lower()
+
+
+def _legacy_home_services(text: str) -> bool:
+    """Trades and domestic services — Home Services category only."""
+    t = _legacy_lower(text)
+    if not t:
+        return False
+    # Interior decorator / design belongs with home styling, not standalone event decorator
+    if "interior" in t and "decor" in t:
+        return True
+    home_keywords = (
+        "plumber",
+        "plumbing",
+        "carpenter",
+        "carpentry",
+        "electrician",
+        "electrical",
+        "electric repair",
+        "appliance",
+        "application repair",  # common typo → still home context
+        "painter",
+        "painting",
+        "cleaner",
+        "cleaning",
+        "handyman",
+        "home repair",
+        "household",
+        "hvac",
+        "gardener",
+        "gardener",
+        "locksmith",
+        "pest control",
+        "plumber",
+        "mobile repair",
+        "ac repair",
+        "plumber",
+        "pipe",
+        "woodwork",
+        "tiling",
+        "mason",
+    )
+    if any(k in t for k in home_keywords):
+        return True
+    # "Plumber , Electrician" style combined professions
+    if "plumber" in t or "electrician" in t or "carpenter" in t:
+        return True
+    if "repair specialist" in t:
+        if any(
+            x in t
+            for x in ("appliance", "electrical", "electric", "ac ", "mobile", "hvac")
+        ):
+            return True
+    return False
+
+
+def _legacy_events(text: str) -> bool:
+    """Weddings, parties, AV, catering — Events category only."""
+    t = _legacy_lower(text)
+    if not t:
+        return False
+    # Hard exclude home trades (never Events)
+    if _legacy_home_services(text):
+        return False
+    if any(
+        x in t
+        for x in (
+            "tutor",
+            "math",
+            "education",
+            "courier",
+            "dietitian",
+            "software",
+            "nurse",
+            "medical",
+            "electrician",
+            "plumber",
+            "carpenter",
+            "appliance",
+        )
+    ):
+        return False
+
+    event_keywords = (
+        "dj",
+        "disc jockey",
+        "photographer",
+        "photography",
+        "videographer",
+        "videography",
+        "cinematography",
+        "caterer",
+        "catering",
+        "event planner",
+        "wedding planner",
+        "party planner",
+        "decorator",
+        "event decor",
+        "wedding",
+        "banquet",
+        "ceremony",
+        "host",
+        "emcee",
+        "mc",
+        "master of ceremony",
+        "sound engineer",
+        "lighting",
+        "stage",
+        "florist",
+        "flower",
+        "band",
+        "entertainment",
+        "coordination",
+        "event management",
+        "event staff",
+    )
+    if any(k in t for k in event_keywords):
+        return True
+    # Short titles
+    if t.strip() in ("dj", "mc", "photographer", "videographer", "caterer", "decorator"):
+        return True
+    return False
+
+
+def legacy_provider_profession_matches_category(provider_profession: str, category_name: str) -> bool:
+    """
+    True if the provider's profession string belongs in this category.
+    Strict: unknown category names return False (no permissive default).
+    """
+    pro = _legacy_lower(provider_profession)
+    cat = _legacy_lower(category_name)
+    if not cat:
+        return False
+
+    # Healthcare
+    if any(x in cat for x in ("health", "medical", "first aid", "clinic", "hospital")):
+        return any(
+            x in pro
+            for x in (
+                "first aid",
+                "health",
+                "nurse",
+                "medical",
+                "paramedic",
+                "doctor",
+                "care",
+                "cpr",
+                "training",
+                "diet",
+                "therapy",
+                "massage",
+            )
+        )
+
+    # Education
+    if "education" in cat or "tutor" in cat:
+        return any(
+            x in pro
+            for x in (
+                "tutor",
+                "education",
+                "math",
+                "teaching",
+                "teacher",
+                "language",
+                "music teacher",
+                "elderly",
+            )
+        )
+
+    # Technology / IT
+    if "tech" in cat or "technology" in cat:
+        return any(
+            x in pro
+            for x in (
+                "tech",
+                "computer",
+                "developer",
+                "web",
+                "it",
+                "software",
+                "support",
+                "programming",
+            )
+        )
+
+    # Transportation
+    if "transport" in cat or "logistics" in cat:
+        return any(
+            x in pro
+            for x in (
+                "taxi",
+                "driver",
+                "courier",
+                "delivery",
+                "transport",
+                "vehicle",
+                "cargo",
+            )
+        )
+
+    # Events (name contains "event")
+    if "event" in cat:
+        return _legacy_events(provider_profession)
+
+    # Home Services — "Home", "Home Services", etc.
+    if "home" in cat or "household" in cat:
+        return _legacy_home_services(provider_profession)
+
+    # Legacy single-word category slugs
+    if "plumb" in cat:
+        return "plumb" in pro
+    if "electric" in cat and "home" not in cat:
+        return "electric" in pro
+    if "clean" in cat and "home" not in cat:
+        return "clean" in pro
+    if "carpent" in cat:
+        return "carpent" in pro
+
+    # Beauty & wellness
+    if "beauty" in cat or "wellness" in cat or "salon" in cat:
+        return any(x in pro for x in ("beauty", "salon", "massage", "hair", "wellness", "makeup", "spa"))
+
+    # Fitness / yoga (if used as a category name)
+    if any(x in cat for x in ("fitness", "yoga", "gym")):
+        return any(
+            x in pro
+            for x in (
+                "fitness",
+                "yoga",
+                "trainer",
+                "gym",
+                "pilates",
+                "workout",
+                "personal train",
+            )
+        )
+
+    # Unknown / unmapped category — do not match everyone
+    return False
+
+
+# --- benchmark -------------------------------------------------------------------------
+
+def _synthetic_professions(rows, distinct, seed):
+    """rows service rows whose provider professions come from a pool of distinct strings."""
+    rng = random.Random(seed)
+    pool = []
+    for _ in range(distinct):
+        words = rng.sample(PROFESSION_WORDS, rng.choice((1, 1, 1, 2, 3)))
+        text = rng.choice((', ', ' , ', ' / ')).join(words)
+        if rng.random() < 0.3:
+            text = text.lower()
+        if rng.random() < 0.2:
+            text = f'  {text} '
+        pool.append(text)
+    return [rng.choice(pool) for _ in range(rows)]
+
+
+def _compiled_uncached(provider_profession, category_name):
+    cat = _lower(category_name)
+    matcher = _category_matcher(cat) if cat else None
+    return bool(matcher and matcher(_lower(provider_profession)))
+
+
+def _time_pass(fn, professions, before_pass=None):
+    if before_pass:
+        before_pass()
+    started = time.perf_counter()
+    hits = 0
+    for cat in CATEGORIES:
+        for pro in professions:
+            if fn(pro, cat):
+                hits += 1
+    return time.perf_counter() - started, hits
+
+
+class Command(BaseCommand):
+    help = 'Compare compiled/memoized category matching with the previous keyword-tuple scans.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000)
+        parser.add_argument('--distinct', type=int, default=1000, help='Distinct profession strings (providers).')
+        parser.add_argument('--repeat', type=int, default=3)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rows = max(1, options['rows'])
+        repeat = max(1, options['repeat'])
+        professions = _synthetic_professions(rows, max(1, options['distinct']), options['seed'])
+
+        mismatches = [
+            (pro, cat)
+            for cat in CATEGORIES
+            for pro in professions
+            if legacy_provider_profession_matches_category(pro, cat)
+            != provider_profession_matches_category(pro, cat)
+        ]
+        if mismatches:
+            sample = ', '.join(f'{p!r}/{c!r}' for p, c in mismatches[:5])
+            raise CommandError(f'{len(mismatches)} mismatching pairs, e.g. {sample}')
+
+        variants = (
+            ('legacy', legacy_provider_profession_matches_category, None),
+            ('compiled', _compiled_uncached, None),
+            ('memoized', provider_profession_matches_category, _matches_category.cache_clear),
+        )
+        checks = rows * len(CATEGORIES)
+        self.stdout.write(
+            f'{rows} rows ({options["distinct"]} distinct professions) x {len(CATEGORIES)} categories '
+            f'= {checks} checks, best of {repeat}'
+        )
+        baseline = None
+        for name, fn, before_pass in variants:
+            best, hits = min(_time_pass(fn, professions, before_pass) for _ in range(repeat))
+            baseline = baseline or best
+            self.stdout.write(
+                f'  {name:<9} {best * 1000:9.1f} ms  {checks / best:12,.0f} checks/s  '
+                f'x{baseline / best:5.1f}  ({hits} matches)'
+            )
+        self.stdout.write(self.style.SUCCESS(f'Results identical for all {checks} pairs.'))
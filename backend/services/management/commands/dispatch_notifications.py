@@ -0,0 +1,46 @@
+"""
+Deliver queued notifications (services/notification_outbox.py) from a dedicated process.
+
+Usage (from backend directory, Django configured):
+  python manage.py dispatch_notifications            # loop, draining every --interval seconds
+  python manage.py dispatch_notifications --once     # drain once and exit (cron)
+
+Set NOTIFICATION_OUTBOX_MODE=daemon on the web processes when this runs, so they only enqueue.
+Row leases keep it safe to run next to in-process dispatchers.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from services.notification_outbox import POLL_SECONDS, dispatcher, outbox_status
+
+
+class Command(BaseCommand):
+    help = 'Send queued seva_notification rows to Supabase in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Drain once and exit.')
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=POLL_SECONDS,
+            help=f'Seconds between drains (default {POLL_SECONDS:g}).',
+        )
+
+    def handle(self, *args, **options):
+        interval = max(0.5, float(options.get('interval') or POLL_SECONDS))
+        while True:
+            sent = dispatcher.drain()
+            if sent or options.get('once'):
+                status = outbox_status()
+                self.stdout.write(
+                    f"Sent {sent} notification(s); {status['pending']} pending, {status['dead']} failed for good."
+                )
+            close_old_connections()
+            if options.get('once'):
+                return
+            try:
+                time.sleep(interval)
+            except KeyboardInterrupt:
+                return
@@ -0,0 +1,48 @@
+"""
+Rebuild seva_provider_rating_summary from seva_review.
+
+Usage (from backend directory, Django configured):
+  python manage.py rebuild_rating_summaries                  # every provider
+  python manage.py rebuild_rating_summaries --provider 12    # one provider (repeatable)
+
+Apply create_provider_rating_summary_table.sql first. Review writes keep the table
+current on their own; run this after bulk imports, manual SQL edits or restores.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from services.rating_summary import PROVIDER_RATING_CACHE, rebuild_all, recompute_provider
+from supabase_config import get_supabase_client
+
+
+class Command(BaseCommand):
+    help = 'Recompute the materialized provider rating summaries from seva_review.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--provider',
+            type=int,
+            action='append',
+            default=[],
+            help='Only recompute this provider id (repeatable).',
+        )
+
+    def handle(self, *args, **options):
+        supabase = get_supabase_client()
+        started = time.time()
+        provider_ids = options.get('provider') or []
+        if provider_ids:
+            for pid in provider_ids:
+                summary = recompute_provider(supabase, pid)
+                PROVIDER_RATING_CACHE.delete(pid)
+                self.stdout.write(f"Provider {pid}: {summary['rating_count']} review(s), sum {summary['rating_sum']}")
+            self.stdout.write(self.style.SUCCESS(
+                f'Recomputed {len(provider_ids)} provider(s) in {time.time() - started:.1f}s.'
+            ))
+            return
+        result = rebuild_all(supabase)
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {result['providers']} provider summaries from {result['reviews']} review(s)"
+            f" ({result['zeroed']} zeroed) in {time.time() - started:.1f}s."
+        ))
@@ -0,0 +1,51 @@
+"""
+Keep the admin SQLite mirror fresh from a dedicated process.
+
+Usage (from backend directory, Django configured):
+  python manage.py run_admin_sync              # loop every ADMIN_SYNC_INTERVAL_SECONDS
+  python manage.py run_admin_sync --once       # single run (cron)
+  python manage.py run_admin_sync --full       # force a full re-copy on the first run
+
+Set ADMIN_SYNC_MODE=daemon on the web processes when this runs, so they only read.
+Shares the lock file with the in-process worker: if another process is syncing, the tick is skipped.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from services.sync_worker import run_sync_once, sync_interval_seconds
+
+
+class Command(BaseCommand):
+    help = 'Refresh the admin SQLite mirror from Supabase on a cadence (single process via file lock).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Run one sync and exit.')
+        parser.add_argument('--full', action='store_true', help='Force a full re-copy on the first run.')
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=None,
+            help='Seconds between runs (default ADMIN_SYNC_INTERVAL_SECONDS).',
+        )
+
+    def handle(self, *args, **options):
+        interval = max(5, options.get('interval') or sync_interval_seconds())
+        full = bool(options.get('full'))
+        verbosity = int(options.get('verbosity', 1))
+        while True:
+            started = time.time()
+            ran = run_sync_once(full=full, verbosity=max(0, verbosity - 1))
+            close_old_connections()
+            if ran:
+                self.stdout.write(self.style.SUCCESS(f'Admin mirror synced in {time.time() - started:.1f}s.'))
+            else:
+                self.stdout.write('Another process holds the sync lock; skipped.')
+            full = False
+            if options.get('once'):
+                return
+            try:
+                time.sleep(max(0.0, interval - (time.time() - started)))
+            except KeyboardInterrupt:
+                return
@@ -1,12 +1,28 @@
 """
 Sync from Supabase to SQLite for Django admin: service categories, services,
-bookings, reviews, and referrals. Run: python manage.py sync_supabase_all
+bookings, reviews, and referrals. Run: python manage.py sync_supabase_all [--full]
+Incremental by default: only rows past each table's high-water mark in seva_sync_state
+are fetched (see services/sync_state.py). Rows are streamed page by page into batched
+upserts, and each table reports rows/second.
 Uses raw sqlite3 connection to avoid Django cursor formatting issues.
 """
+import time
+
 from django.core.management.base import BaseCommand
 from django.db import connection
 from django.utils import timezone
 
+from services.sync_state import (
+    MODE_FULL,
+    BatchWriter,
+    MarkTracker,
+    choose_mode,
+    ensure_sync_state_table,
+    iter_rows,
+    load_sync_state,
+    save_sync_state,
+)
+
 
 def _scalar(val):
     if val is None:
@@ -33,9 +49,152 @@ def _row_to_tuple(row, keys, default_now=None):
     return tuple(out)
 
 
+def _prepare_payment(raw, row):
+    """Fill customer_id from the (already synced) booking; skip legacy rows without one."""
+    if row.get('customer_id') is not None:
+        return row
+    booking_id = row.get('booking_id')
+    if booking_id is None:
+        return None
+    found = raw.execute('SELECT customer_id FROM seva_booking WHERE id = ?', (booking_id,)).fetchone()
+    if not found or found[0] is None:
+        # Keep admin sync resilient even if legacy payment row is incomplete.
+        return None
+    row = dict(row)
+    row['customer_id'] = found[0]
+    return row
+
+
+# Order matters: payments resolve customer_id from bookings synced earlier in the run.
+# watermark=None means the table is small and always copied in full.
+TABLE_SPECS = [
+    {
+        'table': 'seva_servicecategory', 'stat': 'service_categories', 'label': 'Service categories',
+        'watermark': None,
+        'columns': ['id', 'name', 'description', 'icon', 'created_at'],
+    },
+    {
+        'table': 'seva_service', 'stat': 'services', 'label': 'Services',
+        'watermark': 'updated_at',
+        'columns': [
+            'id', 'provider_id', 'category_id', 'title', 'description', 'price',
+            'duration_minutes', 'location', 'status', 'image_url', 'created_at', 'updated_at',
+        ],
+    },
+    {
+        'table': 'seva_booking', 'stat': 'bookings', 'label': 'Bookings',
+        'watermark': 'updated_at',
+        'columns': [
+            'id', 'customer_id', 'service_id', 'booking_date', 'booking_time',
+            'status', 'notes', 'total_amount', 'quoted_price', 'request_image_url',
+            'address', 'latitude', 'longitude', 'created_at', 'updated_at',
+        ],
+    },
+    {
+        'table': 'seva_review', 'stat': 'reviews', 'label': 'Reviews',
+        'watermark': 'updated_at',
+        'columns': ['id', 'booking_id', 'customer_id', 'provider_id', 'rating', 'comment', 'created_at'],
+    },
+    {
+        'table': 'seva_referral', 'stat': 'referrals', 'label': 'Referrals',
+        'watermark': 'updated_at',
+        'columns': [
+            'id', 'referrer_id', 'referred_user_id', 'status',
+            'points_referrer', 'points_referred', 'created_at', 'updated_at',
+        ],
+    },
+    {
+        'table': 'seva_payment', 'stat': 'payments', 'label': 'Payments',
+        'watermark': 'updated_at',
+        'prepare': _prepare_payment,
+        'columns': [
+            'id', 'booking_id', 'customer_id', 'provider_id', 'amount', 'payment_method',
+            'status', 'transaction_id', 'ref_id', 'refund_amount', 'refund_reason',
+            'refund_reference', 'created_at', 'updated_at',
+        ],
+    },
+    {
+        'table': 'seva_refund', 'stat': 'refunds', 'label': 'Refunds',
+        'watermark': 'updated_at',
+        'columns': [
+            'id', 'booking_id', 'payment_id', 'customer_id', 'provider_id', 'amount',
+            'status', 'refund_reason', 'system_note', 'admin_note', 'refund_reference',
+            'requested_by', 'requested_at', 'reviewed_by', 'reviewed_at', 'created_at', 'updated_at',
+        ],
+    },
+    {
+        'table': 'seva_provider_verification', 'stat': 'provider_verifications', 'label': 'Provider verification',
+        'watermark': 'updated_at',
+        'columns': [
+            'id', 'provider_id', 'document_type', 'document_number', 'document_url',
+            'status', 'upload_status', 'review_note', 'reviewed_by', 'reviewed_at',
+            'created_at', 'updated_at',
+        ],
+    },
+    {
+        'table': 'seva_receipt', 'stat': 'receipts', 'label': 'Receipts',
+        'watermark': 'updated_at',
+        'columns': [
+            'id', 'receipt_id', 'booking_id', 'payment_id', 'customer_id', 'provider_id',
+            'service_name', 'payment_method', 'paid_amount', 'discount_amount', 'tax_amount',
+            'service_charge', 'final_total', 'payment_status', 'refund_status', 'issued_at',
+            'created_at', 'updated_at',
+        ],
+    },
+]
+
+
 class Command(BaseCommand):
     help = 'Sync service categories, services, bookings, reviews, and referrals from Supabase to SQLite.'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Re-copy every row instead of only rows changed since the last high-water mark.',
+        )
+
+    def _sync_table(self, supabase, raw, spec, force_full, now):
+        """Stream changed rows for one table into batched upserts, record the run in seva_sync_state."""
+        table, columns, watermark = spec['table'], spec['columns'], spec['watermark']
+        started = time.time()
+        state = load_sync_state(raw, table)
+        mode = MODE_FULL if watermark is None else choose_mode(state, force_full)
+        sql = (
+            f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) "
+            f"VALUES ({', '.join(['?'] * len(columns))})"
+        )
+        writer = BatchWriter(raw, sql)
+        tracker = MarkTracker({} if mode == MODE_FULL else state, watermark_column=watermark)
+        prepare = spec.get('prepare')
+        fetched = 0
+        try:
+            for row in iter_rows(supabase, table, mode, state, watermark_column=watermark):
+                fetched += 1
+                tracker.add(row)
+                if row.get('id') is None:
+                    continue
+                if prepare is not None:
+                    row = prepare(raw, row)
+                    if row is None:
+                        continue
+                writer.add(_row_to_tuple(row, columns, now))
+            writer.close()
+        except Exception as e:
+            # Batches already committed are idempotent upserts; marks stay put so the next run redoes them.
+            self.stderr.write(self.style.WARNING(f"{spec['label']}: {e}"))
+            save_sync_state(raw, table, state, mode, started, writer.written, error=e)
+            return writer.written
+        save_sync_state(raw, table, state, mode, started, fetched, marks=tracker.marks)
+        if self.verbosity >= 1:
+            elapsed = time.time() - started
+            rate = fetched / elapsed if elapsed > 0 else 0.0
+            self.stdout.write(
+                f"  {spec['label']}: {fetched} rows ({mode}) in {elapsed:.2f}s, "
+                f"{rate:,.0f} rows/s, {writer.batches} batch(es)"
+            )
+        return fetched
+
     def handle(self, *args, **options):
         try:
             from supabase_config import get_supabase_client
@@ -43,11 +202,11 @@ class Command(BaseCommand):
             self.stderr.write(self.style.ERROR('supabase_config not found.'))
             return
         supabase = get_supabase_client()
+        self.verbosity = int(options.get('verbosity', 1))
         connection.ensure_connection()
         raw = connection.connection
         now = timezone.now().isoformat()
         stats = {}
-        booking_customer_by_id = {}
 
         # Ensure seva_referral exists in SQLite
         raw.execute("""
@@ -140,220 +299,10 @@ class Command(BaseCommand):
             )
         """)
 
-        # 1) Service categories
-        try:
-            r = supabase.table('seva_servicecategory').select('*').execute()
-            if r.data:
-                sql = "INSERT OR REPLACE INTO seva_servicecategory (id, name, description, icon, created_at) VALUES (?, ?, ?, ?, ?)"
-                for row in r.data:
-                    pid = row.get('id')
-                    if pid is None:
-                        continue
-                    params = _row_to_tuple(row, ['id', 'name', 'description', 'icon', 'created_at'], now)
-                    raw.execute(sql, params)
-            stats['service_categories'] = len(r.data) if r.data else 0
-        except Exception as e:
-            self.stderr.write(self.style.WARNING(f'Service categories: {e}'))
-            stats['service_categories'] = 0
-
-        # 2) Services
-        try:
-            r = supabase.table('seva_service').select('*').execute()
-            if r.data:
-                sql = """INSERT OR REPLACE INTO seva_service (
-                    id, provider_id, category_id, title, description, price, duration_minutes,
-                    location, status, image_url, created_at, updated_at
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"""
-                for row in r.data:
-                    pid = row.get('id')
-                    if pid is None:
-                        continue
-                    params = _row_to_tuple(row, [
-                        'id', 'provider_id', 'category_id', 'title', 'description', 'price',
-                        'duration_minutes', 'location', 'status', 'image_url', 'created_at', 'updated_at'
-                    ], now)
-                    raw.execute(sql, params)
-            stats['services'] = len(r.data) if r.data else 0
-        except Exception as e:
-            self.stderr.write(self.style.WARNING(f'Services: {e}'))
-            stats['services'] = 0
-
-        # 3) Bookings
-        try:
-            r = supabase.table('seva_booking').select('*').execute()
-            if r.data:
-                booking_customer_by_id = {
-                    row.get('id'): row.get('customer_id')
-                    for row in r.data
-                    if row.get('id') is not None
-                }
-                sql = """INSERT OR REPLACE INTO seva_booking (
-                    id, customer_id, service_id, booking_date, booking_time, status, notes,
-                    total_amount, quoted_price, request_image_url, address, latitude, longitude,
-                    created_at, updated_at
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"""
-                for row in r.data:
-                    pid = row.get('id')
-                    if pid is None:
-                        continue
-                    params = _row_to_tuple(row, [
-                        'id', 'customer_id', 'service_id', 'booking_date', 'booking_time',
-                        'status', 'notes', 'total_amount', 'quoted_price', 'request_image_url',
-                        'address', 'latitude', 'longitude', 'created_at', 'updated_at'
-                    ], now)
-                    raw.execute(sql, params)
-            stats['bookings'] = len(r.data) if r.data else 0
-        except Exception as e:
-            self.stderr.write(self.style.WARNING(f'Bookings: {e}'))
-            stats['bookings'] = 0
-
-        # 4) Reviews
-        try:
-            r = supabase.table('seva_review').select('*').execute()
-            if r.data:
-                sql = """INSERT OR REPLACE INTO seva_review (
-                    id, booking_id, customer_id, provider_id, rating, comment, created_at
-                ) VALUES (?, ?, ?, ?, ?, ?, ?)"""
-                for row in r.data:
-                    pid = row.get('id')
-                    if pid is None:
-                        continue
-                    params = _row_to_tuple(row, [
-                        'id', 'booking_id', 'customer_id', 'provider_id', 'rating', 'comment', 'created_at'
-                    ], now)
-                    raw.execute(sql, params)
-            stats['reviews'] = len(r.data) if r.data else 0
-        except Exception as e:
-            self.stderr.write(self.style.WARNING(f'Reviews: {e}'))
-            stats['reviews'] = 0
-
-        # 5) Referrals
-        try:
-            r = supabase.table('seva_referral').select('*').execute()
-            if r.data:
-                sql = """INSERT OR REPLACE INTO seva_referral (
-                    id, referrer_id, referred_user_id, status, points_referrer, points_referred,
-                    created_at, updated_at
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)"""
-                for row in r.data:
-                    pid = row.get('id')
-                    if pid is None:
-                        continue
-                    params = _row_to_tuple(row, [
-                        'id', 'referrer_id', 'referred_user_id', 'status',
-                        'points_referrer', 'points_referred', 'created_at', 'updated_at'
-                    ], now)
-                    raw.execute(sql, params)
-            stats['referrals'] = len(r.data) if r.data else 0
-        except Exception as e:
-            self.stderr.write(self.style.WARNING(f'Referrals: {e}'))
-            stats['referrals'] = 0
-
-        # 6) Payments
-        try:
-            r = supabase.table('seva_payment').select('*').execute()
-            if r.data:
-                sql = """INSERT OR REPLACE INTO seva_payment (
-                    id, booking_id, customer_id, provider_id, amount, payment_method, status,
-                    transaction_id, ref_id, refund_amount, refund_reason, refund_reference,
-                    created_at, updated_at
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"""
-                for row in r.data:
-                    pid = row.get('id')
-                    if pid is None:
-                        continue
-                    booking_id = row.get('booking_id')
-                    customer_id = row.get('customer_id')
-                    if customer_id is None and booking_id is not None:
-                        customer_id = booking_customer_by_id.get(booking_id)
-                    if customer_id is None:
-                        # Keep admin sync resilient even if legacy payment row is incomplete.
-                        continue
-                    row = dict(row)
-                    row['customer_id'] = customer_id
-                    params = _row_to_tuple(row, [
-                        'id', 'booking_id', 'customer_id', 'provider_id', 'amount', 'payment_method',
-                        'status', 'transaction_id', 'ref_id', 'refund_amount', 'refund_reason',
-                        'refund_reference', 'created_at', 'updated_at'
-                    ], now)
-                    raw.execute(sql, params)
-            stats['payments'] = len(r.data) if r.data else 0
-        except Exception as e:
-            self.stderr.write(self.style.WARNING(f'Payments: {e}'))
-            stats['payments'] = 0
-
-        # 7) Refunds
-        try:
-            r = supabase.table('seva_refund').select('*').execute()
-            if r.data:
-                sql = """INSERT OR REPLACE INTO seva_refund (
-                    id, booking_id, payment_id, customer_id, provider_id, amount, status,
-                    refund_reason, system_note, admin_note, refund_reference, requested_by,
-                    requested_at, reviewed_by, reviewed_at, created_at, updated_at
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"""
-                for row in r.data:
-                    pid = row.get('id')
-                    if pid is None:
-                        continue
-                    params = _row_to_tuple(row, [
-                        'id', 'booking_id', 'payment_id', 'customer_id', 'provider_id', 'amount',
-                        'status', 'refund_reason', 'system_note', 'admin_note', 'refund_reference',
-                        'requested_by', 'requested_at', 'reviewed_by', 'reviewed_at', 'created_at', 'updated_at'
-                    ], now)
-                    raw.execute(sql, params)
-            stats['refunds'] = len(r.data) if r.data else 0
-        except Exception as e:
-            self.stderr.write(self.style.WARNING(f'Refunds: {e}'))
-            stats['refunds'] = 0
-
-        # 8) Provider verification documents
-        try:
-            r = supabase.table('seva_provider_verification').select('*').execute()
-            if r.data:
-                sql = """INSERT OR REPLACE INTO seva_provider_verification (
-                    id, provider_id, document_type, document_number, document_url, status,
-                    upload_status, review_note, reviewed_by, reviewed_at, created_at, updated_at
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"""
-                for row in r.data:
-                    pid = row.get('id')
-                    if pid is None:
-                        continue
-                    params = _row_to_tuple(row, [
-                        'id', 'provider_id', 'document_type', 'document_number', 'document_url',
-                        'status', 'upload_status', 'review_note', 'reviewed_by', 'reviewed_at',
-                        'created_at', 'updated_at'
-                    ], now)
-                    raw.execute(sql, params)
-            stats['provider_verifications'] = len(r.data) if r.data else 0
-        except Exception as e:
-            self.stderr.write(self.style.WARNING(f'Provider verification: {e}'))
-            stats['provider_verifications'] = 0
-
-        # 9) Receipts
-        try:
-            r = supabase.table('seva_receipt').select('*').execute()
-            if r.data:
-                sql = """INSERT OR REPLACE INTO seva_receipt (
-                    id, receipt_id, booking_id, payment_id, customer_id, provider_id,
-                    service_name, payment_method, paid_amount, discount_amount, tax_amount,
-                    service_charge, final_total, payment_status, refund_status, issued_at,
-                    created_at, updated_at
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"""
-                for row in r.data:
-                    pid = row.get('id')
-                    if pid is None:
-                        continue
-                    params = _row_to_tuple(row, [
-                        'id', 'receipt_id', 'booking_id', 'payment_id', 'customer_id', 'provider_id',
-                        'service_name', 'payment_method', 'paid_amount', 'discount_amount', 'tax_amount',
-                        'service_charge', 'final_total', 'payment_status', 'refund_status', 'issued_at',
-                        'created_at', 'updated_at'
-                    ], now)
-                    raw.execute(sql, params)
-            stats['receipts'] = len(r.data) if r.data else 0
-        except Exception as e:
-            self.stderr.write(self.style.WARNING(f'Receipts: {e}'))
-            stats['receipts'] = 0
+        ensure_sync_state_table(raw)
+        force_full = bool(options.get('full'))
+        for spec in TABLE_SPECS:
+            stats[spec['stat']] = self._sync_table(supabase, raw, spec, force_full, now)
 
         self.stdout.write(self.style.SUCCESS(
             f"Synced: {stats.get('service_categories', 0)} categories, {stats.get('services', 0)} services, "
@@ -0,0 +1,370 @@
+"""
+Local outbox for seva_notification rows (SQLite table seva_notification_outbox).
+
+Write paths used to insert every notification into Supabase inside the request, one HTTP
+call per row. They now call enqueue_notification() / enqueue_notifications(): one local
+SQLite insert (inside the request's transaction when there is one), and a dispatcher thread
+in each web process drains the outbox with one bulk Supabase insert per BATCH_SIZE rows.
+
+Delivery:
+  - Rows are claimed with a lease (claimed_by / lease_until), so processes sharing the
+    SQLite file never send the same row at once; a crashed process's lease just expires.
+  - Every row has a dedupe_key (caller supplied, else random). The outbox ignores repeated
+    keys, and Supabase does too once add_notification_dedupe_key.sql has been applied, so
+    a batch retried after a lost response is not delivered twice.
+  - A failed batch is retried with exponential backoff (RETRY_BASE_SECONDS doubling up to
+    RETRY_MAX_SECONDS). Batches rejected for bad data are split to isolate the bad rows.
+    After MAX_ATTEMPTS a row stays in the outbox with its last_error and is not retried.
+  - If the local insert fails (e.g. SQLite "database is locked"), enqueue_notifications()
+    inserts the rows into Supabase directly instead of dropping them.
+  - Columns Supabase does not have (PGRST204, e.g. notification_type on older schemas) are
+    dropped and the insert retried, as the old per-row inserts tolerated.
+
+Sent rows are deleted after SENT_RETENTION_SECONDS.
+
+NOTIFICATION_OUTBOX_MODE:
+  thread  (default) start the in-process dispatcher on first enqueue
+  daemon  `manage.py dispatch_notifications` drains the outbox; web processes only enqueue
+  inline  deliver inside enqueue (scripts / one-off shells)
+"""
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+
+from supabase_config import get_supabase_client
+
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_TABLE = 'seva_notification_outbox'
+NOTIFICATION_TABLE = 'seva_notification'
+BATCH_SIZE = 200
+POLL_SECONDS = 5.0
+LEASE_SECONDS = 60
+MAX_ATTEMPTS = 8
+RETRY_BASE_SECONDS = 5
+RETRY_MAX_SECONDS = 15 * 60
+SENT_RETENTION_SECONDS = 24 * 60 * 60
+
+MODE_THREAD = 'thread'
+MODE_DAEMON = 'daemon'
+MODE_INLINE = 'inline'
+
+_table_ready = False
+
+
+def outbox_mode():
+    mode = (getattr(settings, 'NOTIFICATION_OUTBOX_MODE', MODE_THREAD) or MODE_THREAD).strip().lower()
+    return mode if mode in (MODE_THREAD, MODE_DAEMON, MODE_INLINE) else MODE_THREAD
+
+
+def _raw():
+    global _table_ready
+    connection.ensure_connection()
+    raw = connection.connection
+    if not _table_ready:
+        ensure_outbox_table(raw)
+        _table_ready = True
+    return raw
+
+
+def ensure_outbox_table(raw):
+    raw.execute(f"""
+        CREATE TABLE IF NOT EXISTS {OUTBOX_TABLE} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            dedupe_key VARCHAR(120) NOT NULL UNIQUE,
+            payload TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at REAL NOT NULL,
+            claimed_by VARCHAR(80),
+            lease_until REAL,
+            last_error TEXT,
+            created_at REAL NOT NULL,
+            sent_at REAL
+        )
+    """)
+    raw.execute(
+        f"CREATE INDEX IF NOT EXISTS idx_{OUTBOX_TABLE}_due ON {OUTBOX_TABLE} (sent_at, next_attempt_at)"
+    )
+
+
+def notification_row(user_id, title, body, booking_id=None, **extra):
+    """A seva_notification row as the old inline inserts built it (created_at = enqueue time)."""
+    row = {
+        'user_id': int(user_id),
+        'title': (title or '')[:200],
+        'body': body or '',
+        'booking_id': int(booking_id) if booking_id is not None else None,
+        'created_at': datetime.now(dt_timezone.utc).isoformat(),
+    }
+    row.update(extra)
+    return row
+
+
+def enqueue_notifications(rows, dedupe_keys=None):
+    """
+    Queue seva_notification rows (dicts from notification_row) for delivery. dedupe_keys
+    is an optional parallel list; None entries get a random key. Returns rows queued.
+
+    If the local outbox cannot take them (e.g. SQLite "database is locked" while the sync
+    BatchWriter holds the write lock), the rows are inserted into Supabase directly with
+    their dedupe keys; only a failure of that insert too is raised.
+    """
+    rows = [r for r in rows or () if r and r.get('user_id') is not None]
+    if not rows:
+        return 0
+    keys = list(dedupe_keys or ())
+    keys = [str((keys[i] if i < len(keys) else None) or uuid.uuid4().hex)[:120] for i in range(len(rows))]
+    now = time.time()
+    params = [(key, json.dumps(row, default=str), now, now) for key, row in zip(keys, rows)]
+    try:
+        queued = _enqueue_local(params)
+    except Exception as e:
+        logger.warning('notification enqueue of %s rows failed, inserting directly: %s', len(rows), e)
+        return insert_notifications(
+            get_supabase_client(), [dict(row, dedupe_key=key) for key, row in zip(keys, rows)]
+        )
+    try:
+        _after_enqueue()
+    except Exception as e:
+        # Rows are queued; a failed dispatch is retried by the next drain.
+        logger.warning('notification dispatch after enqueue failed: %s', e)
+    return queued
+
+
+def _enqueue_local(params):
+    raw = _raw()
+    owns_transaction = not raw.in_transaction
+    if owns_transaction:
+        raw.execute('BEGIN')
+    try:
+        before = raw.total_changes
+        raw.executemany(
+            f"""INSERT OR IGNORE INTO {OUTBOX_TABLE} (dedupe_key, payload, next_attempt_at, created_at)
+                VALUES (?, ?, ?, ?)""",
+            params,
+        )
+        queued = raw.total_changes - before
+        if owns_transaction:
+            raw.execute('COMMIT')
+    except Exception:
+        if owns_transaction and raw.in_transaction:
+            raw.execute('ROLLBACK')
+        raise
+    return queued
+
+
+def enqueue_notification(user_id, title, body, booking_id=None, dedupe_key=None, **extra):
+    """Queue one notification (see enqueue_notifications); never raises into the caller's write path."""
+    if user_id is None:
+        return 0
+    row = notification_row(user_id, title, body, booking_id=booking_id, **extra)
+    try:
+        return enqueue_notifications([row], [dedupe_key])
+    except Exception as e:
+        logger.warning('notification for user %s was not delivered: %s', user_id, e)
+        return 0
+
+
+def _after_enqueue():
+    mode = outbox_mode()
+    if mode == MODE_INLINE:
+        dispatcher.drain()
+    elif mode == MODE_THREAD:
+        dispatcher.wake()
+
+
+# --- delivery ----------------------------------------------------------------
+
+
+def _missing_column(error):
+    msg = str(error)
+    if 'PGRST204' not in msg or "Could not find the '" not in msg:
+        return None
+    return msg.split("Could not find the '", 1)[1].split("' column", 1)[0]
+
+
+def _is_data_error(error):
+    # SQLSTATE class 22 (data exception) / 23 (integrity violation): retrying the same rows won't help.
+    code = str(getattr(error, 'code', '') or '')
+    return code[:2] in ('22', '23')
+
+
+def insert_notifications(supabase, rows):
+    """Bulk insert rows into seva_notification (one request), ignoring known dedupe keys."""
+    columns = sorted({k for row in rows for k in row})
+    rows = [{c: row.get(c) for c in columns} for row in rows]
+    use_upsert = True
+    while True:
+        try:
+            table = supabase.table(NOTIFICATION_TABLE)
+            if use_upsert and 'dedupe_key' in columns:
+                table.upsert(rows, on_conflict='dedupe_key', ignore_duplicates=True).execute()
+            else:
+                table.insert(rows).execute()
+            return len(rows)
+        except Exception as e:
+            missing = _missing_column(e)
+            if missing is None and use_upsert and '42P10' in str(e):
+                # dedupe_key exists without its unique index: plain insert.
+                use_upsert = False
+                continue
+            if missing is None or missing not in columns:
+                raise
+            columns.remove(missing)
+            for row in rows:
+                row.pop(missing, None)
+
+
+class NotificationDispatcher:
+    """Daemon thread draining the outbox; wake() makes it run right away."""
+
+    def __init__(self, batch_size=BATCH_SIZE, poll_seconds=POLL_SECONDS):
+        self.batch_size = batch_size
+        self.poll_seconds = poll_seconds
+        self._wake = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._drain_lock = threading.Lock()
+        self.sent = 0
+        self.batches = 0
+        self.failed_batches = 0
+        self.last_error = None
+        self.last_sent_at = None
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._loop, name='notification-dispatcher', daemon=True)
+            self._thread.start()
+
+    def is_alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def wake(self):
+        self.start()
+        self._wake.set()
+
+    def _loop(self):
+        while True:
+            self._wake.wait(self.poll_seconds)
+            self._wake.clear()
+            try:
+                self.drain()
+            except Exception as e:
+                logger.warning('notification dispatcher tick failed: %s', e)
+            finally:
+                # The dispatcher thread owns its own DB connection; don't leak it between ticks.
+                close_old_connections()
+
+    def _claim(self, raw):
+        owner = f'{os.getpid()}:{uuid.uuid4().hex[:12]}'
+        now = time.time()
+        raw.execute(
+            f"""UPDATE {OUTBOX_TABLE} SET claimed_by = ?, lease_until = ?
+                WHERE id IN (
+                    SELECT id FROM {OUTBOX_TABLE}
+                    WHERE sent_at IS NULL AND attempts < ? AND next_attempt_at <= ?
+                      AND (lease_until IS NULL OR lease_until < ?)
+                    ORDER BY id LIMIT ?
+                )""",
+            (owner, now + LEASE_SECONDS, MAX_ATTEMPTS, now, now, self.batch_size),
+        )
+        cur = raw.execute(
+            f"SELECT id, dedupe_key, payload, attempts FROM {OUTBOX_TABLE} WHERE claimed_by = ? AND sent_at IS NULL",
+            (owner,),
+        )
+        return cur.fetchall()
+
+    def _mark_sent(self, raw, ids):
+        raw.executemany(
+            f"UPDATE {OUTBOX_TABLE} SET sent_at = ?, claimed_by = NULL, lease_until = NULL, last_error = NULL WHERE id = ?",
+            [(time.time(), i) for i in ids],
+        )
+
+    def _mark_failed(self, raw, claimed, error):
+        now = time.time()
+        raw.executemany(
+            f"""UPDATE {OUTBOX_TABLE}
+                SET attempts = ?, next_attempt_at = ?, claimed_by = NULL, lease_until = NULL, last_error = ?
+                WHERE id = ?""",
+            [
+                (attempts + 1, now + min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** attempts), str(error)[:500], i)
+                for i, _key, _payload, attempts in claimed
+            ],
+        )
+
+    def _deliver(self, raw, supabase, claimed):
+        rows = [dict(json.loads(payload), dedupe_key=key) for _id, key, payload, _attempts in claimed]
+        try:
+            insert_notifications(supabase, rows)
+        except Exception as e:
+            if _is_data_error(e) and len(claimed) > 1:
+                middle = len(claimed) // 2
+                self._deliver(raw, supabase, claimed[:middle])
+                self._deliver(raw, supabase, claimed[middle:])
+                return
+            self.failed_batches += 1
+            self.last_error = str(e)[:500]
+            logger.warning('notification batch of %s failed: %s', len(claimed), e)
+            self._mark_failed(raw, claimed, e)
+            return
+        self._mark_sent(raw, [row[0] for row in claimed])
+        self.sent += len(claimed)
+        self.batches += 1
+        self.last_sent_at = time.time()
+
+    def drain(self):
+        """Deliver every due row (batch by batch); returns rows sent."""
+        with self._drain_lock:
+            raw = _raw()
+            supabase = None
+            sent_before = self.sent
+            while True:
+                claimed = self._claim(raw)
+                if not claimed:
+                    break
+                supabase = supabase or get_supabase_client()
+                self._deliver(raw, supabase, claimed)
+                if len(claimed) < self.batch_size:
+                    break
+            raw.execute(
+                f"DELETE FROM {OUTBOX_TABLE} WHERE sent_at IS NOT NULL AND sent_at < ?",
+                (time.time() - SENT_RETENTION_SECONDS,),
+            )
+            return self.sent - sent_before
+
+    def stats(self):
+        return {
+            'alive': self.is_alive(),
+            'sent': self.sent,
+            'batches': self.batches,
+            'failed_batches': self.failed_batches,
+            'last_error': self.last_error,
+            'last_sent_at': (
+                datetime.fromtimestamp(self.last_sent_at, dt_timezone.utc).isoformat()
+                if self.last_sent_at else None
+            ),
+        }
+
+
+dispatcher = NotificationDispatcher()
+
+
+def outbox_status():
+    """Dispatcher counters plus queued / failed-for-good row counts in the outbox."""
+    raw = _raw()
+    pending, dead = raw.execute(
+        f"""SELECT COALESCE(SUM(attempts < ?), 0), COALESCE(SUM(attempts >= ?), 0)
+            FROM {OUTBOX_TABLE} WHERE sent_at IS NULL""",
+        (MAX_ATTEMPTS, MAX_ATTEMPTS),
+    ).fetchone()
+    return dict(dispatcher.stats(), mode=outbox_mode(), pending=pending, dead=dead)
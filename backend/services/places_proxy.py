@@ -0,0 +1,295 @@
+"""
+Cached, pooled client for the Google Maps proxies (places_autocomplete, place_details,
+reverse_geocode).
+
+Every lookup goes through three layers before it costs Maps quota:
+
+  1. a small per-process LRU (microsecond hits for the hottest Nepal places)
+  2. the shared cache (places:* namespaces, see cache_events.py), so all workers share answers
+  3. in-flight coalescing: concurrent identical misses wait for one upstream call
+
+Keys are normalized: autocomplete input is lower-cased with punctuation and repeated spaces
+collapsed (combining marks such as Devanagari vowel signs are kept), while Google still gets
+the text as the user typed it; reverse geocode rounds lat/lng to REVERSE_GEOCODE_PRECISION decimals (about 11 m)
+and queries Google with the rounded point, so every request in a bucket shares one answer.
+
+Autocomplete is prefix-aware. Typing "kathmandu" issues "ka", "kat", "kath", ... and a shorter
+cached prefix can answer a longer one without a call:
+  - the prefix had no results, so nothing longer can match either
+  - the prefix returned a complete list (fewer than AUTOCOMPLETE_FULL_PAGE predictions)
+    and some of those predictions still match every word of the longer input
+
+Only OK / ZERO_RESULTS answers are cached; quota and key errors raise PlacesApiError and are
+retried on the next call. Upstream requests share one requests.Session (keep-alive pool).
+"""
+import logging
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .cache_events import PLACE_DETAILS_CACHE, PLACES_AUTOCOMPLETE_CACHE, REVERSE_GEOCODE_CACHE
+
+
+logger = logging.getLogger(__name__)
+
+AUTOCOMPLETE_URL = 'https://maps.googleapis.com/maps/api/place/autocomplete/json'
+DETAILS_URL = 'https://maps.googleapis.com/maps/api/place/details/json'
+GEOCODE_URL = 'https://maps.googleapis.com/maps/api/geocode/json'
+REQUEST_TIMEOUT_SECONDS = 10
+HTTP_POOL_SIZE = 16
+LOCAL_CACHE_SIZE = 2048
+AUTOCOMPLETE_FULL_PAGE = 5
+MIN_PREFIX_LENGTH = 2
+REVERSE_GEOCODE_PRECISION = 4
+CACHEABLE_STATUSES = ('OK', 'ZERO_RESULTS')
+
+_PUNCTUATION_RE = re.compile(r'[^\w\s]', re.UNICODE)
+_SPACE_RE = re.compile(r'\s+')
+
+
+class PlacesApiError(Exception):
+    """Google answered with an error status (REQUEST_DENIED, OVER_QUERY_LIMIT, ...)."""
+
+    def __init__(self, status, message=None):
+        super().__init__(message or status)
+        self.status = status
+
+
+def _strip_punctuation(match):
+    # \w does not cover combining marks (Unicode category M), e.g. the vowel signs in "काठमाडौं".
+    char = match.group(0)
+    return char if unicodedata.category(char).startswith('M') else ' '
+
+
+def normalize_query(text):
+    """Cache / coalescing key for autocomplete input; never sent upstream."""
+    text = _PUNCTUATION_RE.sub(_strip_punctuation, (text or '').lower())
+    return _SPACE_RE.sub(' ', text).strip()
+
+
+def reverse_geocode_bucket(lat, lng, precision=REVERSE_GEOCODE_PRECISION):
+    """(lat, lng) rounded to the cache bucket; raises ValueError for non-numeric input."""
+    return round(float(lat), precision), round(float(lng), precision)
+
+
+class _LocalLRU:
+    def __init__(self, size):
+        self.size = size
+        self._lock = threading.Lock()
+        self._data = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.size:
+                self._data.popitem(last=False)
+
+
+class _SingleFlight:
+    """Runs one call per key at a time; concurrent callers for the same key share its result."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        """(result, shared) where shared is True for callers that waited on another thread."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = {'done': threading.Event(), 'result': None, 'error': None}
+        if not leader:
+            if not call['done'].wait(REQUEST_TIMEOUT_SECONDS * 2):
+                raise PlacesApiError('TIMEOUT', 'timed out waiting for a concurrent Places request')
+            if call['error'] is not None:
+                raise call['error']
+            return call['result'], True
+        try:
+            call['result'] = fn()
+        except Exception as e:
+            call['error'] = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call['done'].set()
+        return call['result'], False
+
+
+class PlacesClient:
+    def __init__(self):
+        self._local = _LocalLRU(LOCAL_CACHE_SIZE)
+        self._flight = _SingleFlight()
+        self._session = None
+        self._session_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.counters = {'local_hits': 0, 'shared_hits': 0, 'prefix_hits': 0, 'coalesced': 0, 'upstream': 0}
+
+    def _count(self, name):
+        with self._stats_lock:
+            self.counters[name] += 1
+
+    def _http(self):
+        with self._session_lock:
+            if self._session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_SIZE)
+                session.mount('https://', adapter)
+                session.headers.update({'Accept': 'application/json'})
+                self._session = session
+            return self._session
+
+    def _fetch(self, url, params):
+        self._count('upstream')
+        r = self._http().get(url, params=params, timeout=REQUEST_TIMEOUT_SECONDS)
+        r.raise_for_status()
+        return r.json()
+
+    def _cached(self, namespace, key, load):
+        """Local LRU -> shared cache -> one coalesced upstream load()."""
+        local_key = (namespace.name, key)
+        value = self._local.get(local_key)
+        if value is not None:
+            self._count('local_hits')
+            return value
+        value = namespace.get(key)
+        if value is not None:
+            self._count('shared_hits')
+            self._local.set(local_key, value)
+            return value
+
+        def fill():
+            fresh = load()
+            namespace.set(key, fresh)
+            self._local.set(local_key, fresh)
+            return fresh
+
+        value, shared = self._flight.do(local_key, fill)
+        if shared:
+            self._count('coalesced')
+        return value
+
+    # --- autocomplete ------------------------------------------------------
+
+    def _from_prefix(self, query):
+        """Answer query from a cached shorter prefix, or None."""
+        words = query.split(' ')
+        # Longest first: the nearest cached prefix is the most specific answer.
+        prefixes = list(dict.fromkeys(
+            query[:n].rstrip() for n in range(len(query) - 1, MIN_PREFIX_LENGTH - 1, -1)
+        ))
+        prefixes = [p for p in prefixes if len(p) >= MIN_PREFIX_LENGTH and p != query]
+        found = {}
+        for prefix in prefixes:
+            value = self._local.get((PLACES_AUTOCOMPLETE_CACHE.name, prefix))
+            if value is not None:
+                found[prefix] = value
+        missing = [p for p in prefixes if p not in found]
+        if missing:
+            found.update(PLACES_AUTOCOMPLETE_CACHE.get_many(missing))
+        for prefix in prefixes:
+            cached = found.get(prefix)
+            if cached is None:
+                continue
+            predictions = cached.get('predictions') or []
+            if not predictions:
+                return {'predictions': []}
+            if len(predictions) >= AUTOCOMPLETE_FULL_PAGE:
+                # Google may have cut the list off; a longer query can surface other places.
+                return None
+            narrowed = [p for p in predictions if _matches_words(p.get('description'), words)]
+            return {'predictions': narrowed} if narrowed else None
+        return None
+
+    def autocomplete(self, text, key):
+        """{'predictions': [{place_id, description}]} for the Nepal-biased geocode autocomplete."""
+        query = normalize_query(text)
+        if len(query) < MIN_PREFIX_LENGTH:
+            return {'predictions': []}
+        local_key = (PLACES_AUTOCOMPLETE_CACHE.name, query)
+        if self._local.get(local_key) is None and PLACES_AUTOCOMPLETE_CACHE.get(query) is None:
+            answer = self._from_prefix(query)
+            if answer is not None:
+                self._count('prefix_hits')
+                return answer
+
+        def load():
+            data = self._fetch(AUTOCOMPLETE_URL, {
+                'input': text.strip(),
+                'key': key,
+                'types': 'geocode',  # addresses and place names
+                'components': 'country:np',  # bias to Nepal
+            })
+            status = data.get('status') or ''
+            if status not in CACHEABLE_STATUSES:
+                raise PlacesApiError(status, data.get('error_message', status))
+            return {
+                'predictions': [
+                    {'place_id': p.get('place_id'), 'description': p.get('description', '')}
+                    for p in (data.get('predictions') or [])
+                ],
+            }
+
+        return self._cached(PLACES_AUTOCOMPLETE_CACHE, query, load)
+
+    # --- details / reverse geocode -------------------------------------------
+
+    def details(self, place_id, key):
+        """{'formatted_address', 'latitude', 'longitude'} for a place_id."""
+        place_id = (place_id or '').strip()
+
+        def load():
+            data = self._fetch(DETAILS_URL, {'place_id': place_id, 'fields': 'formatted_address,geometry', 'key': key})
+            status = data.get('status') or ''
+            if status != 'OK':
+                raise PlacesApiError(status, data.get('error_message', status))
+            result = data.get('result') or {}
+            location = (result.get('geometry') or {}).get('location') or {}
+            return {
+                'formatted_address': result.get('formatted_address', ''),
+                'latitude': location.get('lat'),
+                'longitude': location.get('lng'),
+            }
+
+        return self._cached(PLACE_DETAILS_CACHE, place_id, load)
+
+    def reverse_geocode(self, lat, lng, key):
+        """{'formatted_address'} for the rounded (lat, lng) bucket."""
+        lat, lng = reverse_geocode_bucket(lat, lng)
+        bucket = f'{lat:.{REVERSE_GEOCODE_PRECISION}f},{lng:.{REVERSE_GEOCODE_PRECISION}f}'
+
+        def load():
+            data = self._fetch(GEOCODE_URL, {'latlng': bucket, 'key': key})
+            status = data.get('status') or ''
+            if status not in CACHEABLE_STATUSES:
+                raise PlacesApiError(status, data.get('error_message', status))
+            results = data.get('results') or []
+            return {'formatted_address': results[0].get('formatted_address', '') if results else ''}
+
+        return self._cached(REVERSE_GEOCODE_CACHE, bucket, load)
+
+    def stats(self):
+        with self._stats_lock:
+            return dict(self.counters)
+
+
+def _matches_words(description, words):
+    """Every query word is a prefix of some word of the description."""
+    desc_words = normalize_query(description).split(' ')
+    return all(any(d.startswith(w) for d in desc_words) for w in words if w)
+
+
+places_client = PlacesClient()
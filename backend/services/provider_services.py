@@ -12,6 +12,7 @@ from decimal import Decimal
 
 from supabase_config import get_supabase_client
 from .models import Service, ServiceCategory
+from .cache_events import publish_service_changed
 from .category_matching import provider_profession_matches_category
 from .service_name_utils import (
     dedupe_services_offered_list,
@@ -129,6 +130,7 @@ def ensure_provider_default_service(provider_id, profession):
             'location': '',
             'status': 'active',
         }).execute()
+        publish_service_changed(cid, provider_id)
         print(f"✅ Created default service for provider {provider_id} ({display}) in category {category_name}")
     except Exception as e:
         print(f"ensure_provider_default_service warning: {e}")
@@ -170,6 +172,7 @@ def ensure_provider_service_in_category(provider_id, profession, category_id, ca
             'location': '',
             'status': 'active',
         }).execute()
+        publish_service_changed(cid, provider_id)
         print(f"✅ ensure_provider_service_in_category: provider {provider_id} ({display}) in category {category_name} (id={cid})")
     except Exception as e:
         print(f"ensure_provider_service_in_category warning: {e}")
@@ -214,6 +217,7 @@ def upsert_provider_service_row(provider_id, category_id, title, price=None):
             'location': '',
             'status': 'active',
         }).execute()
+        publish_service_changed(cid, provider_id)
     except Exception as e:
         print(f'upsert_provider_service_row: {e}')
 
@@ -222,6 +226,7 @@ def sync_services_offered(provider_id, services_offered):
     """
     services_offered: list of {"category_id": int, "title": str} from registration.
     Creates one seva_service per item; skips duplicates by normalized title per category.
+    Each inserted row publishes a service_changed event for its (category, provider) keys.
     """
     if not provider_id or not services_offered:
         return
@@ -0,0 +1,240 @@
+"""
+Materialized per-provider rating aggregates (seva_provider_rating_summary, see
+create_provider_rating_summary_table.sql).
+
+One row per provider holds rating_sum, rating_count, the 1-5 star distribution and
+last_review_at, so reading a provider's rating is one primary-key lookup instead of
+downloading their reviews. Reads go through the services:rating shared cache first.
+
+Review writes keep the row current:
+  - create / update: apply_review_change(), backed by the seva_apply_rating_delta RPC
+    (one atomic upsert, safe under concurrent writes)
+  - delete: recompute_provider() from that provider's reviews, so last_review_at stays
+    exact
+
+If the RPC or the table is missing (SQL not applied yet), writes fall back to
+recompute_provider() and reads fall back to aggregating seva_review for the requested
+providers. `python manage.py rebuild_rating_summaries` rebuilds every row.
+"""
+import logging
+from datetime import datetime, timezone
+
+from .cache_events import PROVIDER_RATING_CACHE
+from .supabase_batch import PAGE_SIZE, chunked, select_eq_paged, select_in
+
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_TABLE = 'seva_provider_rating_summary'
+REVIEW_TABLE = 'seva_review'
+DELTA_RPC = 'seva_apply_rating_delta'
+STARS = (1, 2, 3, 4, 5)
+UPSERT_BATCH_SIZE = 500
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _valid_rating(value):
+    rating = _to_int(value)
+    return rating if rating is not None and 1 <= rating <= 5 else None
+
+
+def empty_summary(provider_id):
+    summary = {'provider_id': provider_id, 'rating_sum': 0, 'rating_count': 0, 'last_review_at': None}
+    for star in STARS:
+        summary[f'count_{star}'] = 0
+    return summary
+
+
+def _normalize(row):
+    pid = _to_int(row.get('provider_id'))
+    summary = empty_summary(pid)
+    summary['rating_sum'] = _to_int(row.get('rating_sum')) or 0
+    summary['rating_count'] = _to_int(row.get('rating_count')) or 0
+    for star in STARS:
+        summary[f'count_{star}'] = _to_int(row.get(f'count_{star}')) or 0
+    summary['last_review_at'] = row.get('last_review_at')
+    return summary
+
+
+def rating_average(summary, digits=2):
+    count = (summary or {}).get('rating_count') or 0
+    return round(summary['rating_sum'] / count, digits) if count else 0.0
+
+
+def distribution(summary):
+    """{'1': n, ..., '5': n} (string keys, JSON friendly)."""
+    return {str(star): (summary or {}).get(f'count_{star}', 0) for star in STARS}
+
+
+def summaries_from_reviews(rows):
+    """provider_id -> summary aggregated from seva_review rows (provider_id, rating, *_at)."""
+    out = {}
+    for row in rows or []:
+        pid = _to_int(row.get('provider_id'))
+        rating = _valid_rating(row.get('rating'))
+        if pid is None or rating is None:
+            continue
+        summary = out.get(pid)
+        if summary is None:
+            summary = out[pid] = empty_summary(pid)
+        summary['rating_sum'] += rating
+        summary['rating_count'] += 1
+        summary[f'count_{rating}'] += 1
+        reviewed_at = row.get('updated_at') or row.get('created_at')
+        if reviewed_at and (summary['last_review_at'] is None or str(reviewed_at) > str(summary['last_review_at'])):
+            summary['last_review_at'] = reviewed_at
+    return out
+
+
+def _read_summaries(supabase, provider_ids):
+    try:
+        rows = select_in(supabase, SUMMARY_TABLE, 'provider_id', provider_ids, order_column='provider_id')
+        return {s['provider_id']: s for s in (_normalize(r) for r in rows) if s['provider_id'] is not None}
+    except Exception as e:
+        logger.warning('%s read failed, aggregating reviews instead: %s', SUMMARY_TABLE, e)
+    rows = select_in(
+        supabase, REVIEW_TABLE, 'provider_id', provider_ids,
+        columns='id,provider_id,rating,created_at,updated_at',
+    )
+    return summaries_from_reviews(rows)
+
+
+def rating_summaries(supabase, provider_ids):
+    """provider_id -> summary for every requested provider (zeros when they have no reviews)."""
+    pids = list(dict.fromkeys(p for p in (_to_int(v) for v in provider_ids or ()) if p is not None))
+    if not pids:
+        return {}
+    out = {}
+    for pid, entry in PROVIDER_RATING_CACHE.get_many(pids).items():
+        if isinstance(entry, dict) and 'rating_count' in entry:
+            out[pid] = entry
+    missing = [pid for pid in pids if pid not in out]
+    if missing:
+        fetched = _read_summaries(supabase, missing)
+        fresh = {pid: fetched.get(pid) or empty_summary(pid) for pid in missing}
+        PROVIDER_RATING_CACHE.set_many(fresh)
+        out.update(fresh)
+    return out
+
+
+def rating_summary(supabase, provider_id):
+    pid = _to_int(provider_id)
+    if pid is None:
+        return empty_summary(None)
+    return rating_summaries(supabase, [pid]).get(pid) or empty_summary(pid)
+
+
+def all_rating_summaries(supabase):
+    """provider_id -> summary for every provider with a summary row (one paged read)."""
+    out = {}
+    start = 0
+    while True:
+        r = (
+            supabase.table(SUMMARY_TABLE)
+            .select('*')
+            .order('provider_id')
+            .range(start, start + PAGE_SIZE - 1)
+            .execute()
+        )
+        page = r.data or []
+        for row in page:
+            summary = _normalize(row)
+            if summary['provider_id'] is not None:
+                out[summary['provider_id']] = summary
+        if len(page) < PAGE_SIZE:
+            return out
+        start += PAGE_SIZE
+
+
+# --- writes ---------------------------------------------------------------
+
+
+def _summary_row(summary):
+    row = dict(summary)
+    row['updated_at'] = datetime.now(timezone.utc).isoformat()
+    return row
+
+
+def recompute_provider(supabase, provider_id):
+    """Rebuild one provider's row from their reviews (one indexed read + one upsert)."""
+    pid = _to_int(provider_id)
+    if pid is None:
+        return None
+    rows = select_eq_paged(
+        supabase, REVIEW_TABLE, 'provider_id', pid, columns='id,provider_id,rating,created_at,updated_at'
+    )
+    summary = summaries_from_reviews(rows).get(pid) or empty_summary(pid)
+    supabase.table(SUMMARY_TABLE).upsert(_summary_row(summary), on_conflict='provider_id').execute()
+    return summary
+
+
+def apply_review_change(supabase, provider_id, old_rating=None, new_rating=None, reviewed_at=None):
+    """
+    Fold one review write into the provider's summary: old_rating is the value being
+    replaced (None for a new review), new_rating the value written (None for a delete).
+    Callers still publish_review_changed() so cached summaries are dropped.
+    """
+    pid = _to_int(provider_id)
+    if pid is None:
+        return None
+    old_rating, new_rating = _valid_rating(old_rating), _valid_rating(new_rating)
+    if new_rating is None:
+        # Deletes recompute so last_review_at does not point at a removed review.
+        return _recompute_quietly(supabase, pid)
+    try:
+        r = supabase.rpc(DELTA_RPC, {
+            'p_provider_id': pid,
+            'p_old_rating': old_rating,
+            'p_new_rating': new_rating,
+            'p_reviewed_at': reviewed_at or datetime.now(timezone.utc).isoformat(),
+        }).execute()
+        rows = r.data or []
+        return _normalize(rows[0]) if rows else None
+    except Exception as e:
+        logger.warning('%s failed for provider %s, recomputing: %s', DELTA_RPC, pid, e)
+    return _recompute_quietly(supabase, pid)
+
+
+def _recompute_quietly(supabase, provider_id):
+    try:
+        return recompute_provider(supabase, provider_id)
+    except Exception as e:
+        logger.warning('rating summary recompute failed for provider %s: %s', provider_id, e)
+        return None
+
+
+def rebuild_all(supabase, batch_size=UPSERT_BATCH_SIZE):
+    """
+    Recompute every summary row from seva_review. Providers whose reviews are all gone get
+    their row zeroed. Returns {'reviews', 'providers', 'zeroed'}.
+    """
+    rows = []
+    start = 0
+    while True:
+        r = (
+            supabase.table(REVIEW_TABLE)
+            .select('id,provider_id,rating,created_at,updated_at')
+            .order('id')
+            .range(start, start + PAGE_SIZE - 1)
+            .execute()
+        )
+        page = r.data or []
+        rows.extend(page)
+        if len(page) < PAGE_SIZE:
+            break
+        start += PAGE_SIZE
+    summaries = summaries_from_reviews(rows)
+    existing = set(all_rating_summaries(supabase))
+    zeroed = existing - set(summaries)
+    payload = [_summary_row(s) for s in summaries.values()]
+    payload.extend(_summary_row(empty_summary(pid)) for pid in sorted(zeroed))
+    for batch in chunked(payload, batch_size):
+        supabase.table(SUMMARY_TABLE).upsert(batch, on_conflict='provider_id').execute()
+    PROVIDER_RATING_CACHE.clear()
+    return {'reviews': len(rows), 'providers': len(summaries), 'zeroed': len(zeroed)}
@@ -0,0 +1,282 @@
+"""
+Shared in-process fan-out of new chat messages and notifications to streaming clients.
+
+Clients connected to the realtime stream (services.views.realtime_stream, served over
+ASGI) subscribe here with the user id and the booking ids they may chat on. One watcher
+thread per process polls Supabase every REALTIME_POLL_SECONDS for rows past a per-table
+id watermark:
+
+  seva_chat_message   delivered to subscribers watching the row's booking_id
+  seva_notification   delivered to the subscriber whose user_id matches
+
+So the upstream cost is two small reads per interval no matter how many clients are
+connected. The thread only polls while someone is subscribed. When the last subscriber
+leaves, the watermarks are dropped; clients pass their last seen ids on connect (catch_up)
+to cover the gap themselves. A missing watermark is seeded from the table's newest id, and
+catch_up seeds it before its own reads, so every row is either in the subscriber's catch-up
+read or past the watermark. Older history only ever comes from a subscriber's own catch-up
+read; the shared watermark never moves back for it.
+"""
+import asyncio
+import logging
+import threading
+from collections import defaultdict, deque
+
+from django.conf import settings
+
+from supabase_config import get_supabase_client
+
+
+logger = logging.getLogger(__name__)
+
+CHAT_TABLE = 'seva_chat_message'
+NOTIFICATION_TABLE = 'seva_notification'
+CHAT_EVENT = 'chat_message'
+NOTIFICATION_EVENT = 'notification'
+TICK_BATCH_SIZE = 500
+MAX_BUFFERED_EVENTS = 500
+
+
+def poll_seconds():
+    return max(0.5, float(getattr(settings, 'REALTIME_POLL_SECONDS', 2) or 2))
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class Subscription:
+    """One connected client: buffered events plus an asyncio wake-up for its stream."""
+
+    def __init__(self, user_id, booking_ids, loop):
+        self.user_id = _to_int(user_id)
+        self.booking_ids = frozenset(b for b in (_to_int(v) for v in booking_ids or ()) if b is not None)
+        self._loop = loop
+        self._ready = asyncio.Event()
+        self._lock = threading.Lock()
+        self._events = deque(maxlen=MAX_BUFFERED_EVENTS)
+        # Ids already delivered per event type: hub ticks and the catch-up read may overlap.
+        self._seen = {CHAT_EVENT: set(), NOTIFICATION_EVENT: set()}
+        # Rows at or below the starting cursor are ones the client already has.
+        self._floor = {CHAT_EVENT: 0, NOTIFICATION_EVENT: 0}
+        self.last_ids = {CHAT_EVENT: 0, NOTIFICATION_EVENT: 0}
+
+    def push(self, event_type, row):
+        row_id = _to_int(row.get('id'))
+        if row_id is None:
+            return False
+        with self._lock:
+            seen = self._seen.setdefault(event_type, set())
+            if row_id in seen or row_id <= self._floor.get(event_type, 0):
+                return False
+            seen.add(row_id)
+            self.last_ids[event_type] = max(self.last_ids.get(event_type, 0), row_id)
+            self._events.append((event_type, row))
+        try:
+            self._loop.call_soon_threadsafe(self._ready.set)
+        except RuntimeError:
+            # Loop already closed: the client is gone and will be unsubscribed.
+            pass
+        return True
+
+    def drain(self):
+        with self._lock:
+            events = list(self._events)
+            self._events.clear()
+            self._ready.clear()
+        return events
+
+    def start_after(self, event_type, row_id):
+        """Only deliver rows newer than row_id; it is the cursor until one arrives."""
+        with self._lock:
+            self._floor[event_type] = max(self._floor.get(event_type, 0), row_id or 0)
+            self.last_ids[event_type] = max(self.last_ids.get(event_type, 0), row_id or 0)
+
+
+    async def wait(self, timeout):
+        """Buffered events, waiting up to timeout seconds for the first one."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while not self._events:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                await asyncio.wait_for(self._ready.wait(), remaining)
+            except asyncio.TimeoutError:
+                break
+            # A wake-up scheduled before the last drain() may arrive with nothing buffered.
+            self._ready.clear()
+        return self.drain()
+
+
+class RealtimeHub:
+    """Polls upstream once per interval for all subscribers and routes new rows to them."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_user = defaultdict(set)
+        self._by_booking = defaultdict(set)
+        self._subscriptions = set()
+        self._watermarks = {}
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.ticks = 0
+        self.rows_seen = 0
+        self.events_delivered = 0
+        self.errors = 0
+
+    # --- subscriptions -----------------------------------------------------
+
+    def subscribe(self, user_id, booking_ids, loop):
+        sub = Subscription(user_id, booking_ids, loop)
+        with self._lock:
+            self._subscriptions.add(sub)
+            self._by_user[sub.user_id].add(sub)
+            for bid in sub.booking_ids:
+                self._by_booking[bid].add(sub)
+        self._ensure_thread()
+        self._wake.set()
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscriptions.discard(sub)
+            self._discard(self._by_user, sub.user_id, sub)
+            for bid in sub.booking_ids:
+                self._discard(self._by_booking, bid, sub)
+            if not self._subscriptions:
+                self._watermarks.clear()
+
+    @staticmethod
+    def _discard(index, key, sub):
+        bucket = index.get(key)
+        if bucket is not None:
+            bucket.discard(sub)
+            if not bucket:
+                del index[key]
+
+    def catch_up(self, supabase, sub, after_chat_id=None, after_notification_id=None):
+        """
+        Deliver rows the client missed before subscribing (one bounded read per table).
+        Without a client cursor, the subscriber's newest existing id becomes its cursor instead.
+        """
+        if sub.booking_ids:
+            self._seed_watermark(supabase, CHAT_TABLE)
+            self._catch_up_table(
+                sub, CHAT_EVENT, after_chat_id,
+                lambda: supabase.table(CHAT_TABLE).select('*').in_('booking_id', sorted(sub.booking_ids)),
+            )
+        if sub.user_id is not None:
+            self._seed_watermark(supabase, NOTIFICATION_TABLE)
+            self._catch_up_table(
+                sub, NOTIFICATION_EVENT, after_notification_id,
+                lambda: supabase.table(NOTIFICATION_TABLE).select('*').eq('user_id', sub.user_id),
+            )
+
+    @staticmethod
+    def _catch_up_table(sub, event_type, after_id, query):
+        if after_id is None:
+            r = query().order('id', desc=True).limit(1).execute()
+            sub.start_after(event_type, _to_int((r.data or [{}])[0].get('id')) if r.data else 0)
+            return
+        sub.start_after(event_type, after_id)
+        r = query().gt('id', after_id).order('id').limit(MAX_BUFFERED_EVENTS).execute()
+        for row in r.data or []:
+            sub.push(event_type, row)
+
+    # --- watcher -----------------------------------------------------------
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='realtime-hub', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self._lock:
+                active = bool(self._subscriptions)
+            if not active:
+                self._wake.wait(60)
+                self._wake.clear()
+                continue
+            try:
+                self.tick()
+            except Exception as e:
+                self.errors += 1
+                logger.warning('realtime hub tick failed: %s', e)
+            self._stop.wait(poll_seconds())
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def _seed_watermark(self, supabase, table):
+        """The table's watermark, set to its current newest id if there is none yet."""
+        with self._lock:
+            watermark = self._watermarks.get(table)
+        if watermark is not None:
+            return watermark
+        r = supabase.table(table).select('id').order('id', desc=True).limit(1).execute()
+        latest = _to_int((r.data or [{}])[0].get('id')) if r.data else 0
+        with self._lock:
+            if not self._subscriptions:
+                return None
+            # Keep a seed that landed first: any seed is at or below what later catch-up reads see.
+            return self._watermarks.setdefault(table, latest or 0)
+
+    def _new_rows(self, supabase, table):
+        with self._lock:
+            watermark = self._watermarks.get(table)
+        if watermark is None:
+            # First tick since someone subscribed: start from the current newest row. Anything
+            # older reaches a subscriber through its own catch-up read, which seeds first.
+            self._seed_watermark(supabase, table)
+            return []
+        r = supabase.table(table).select('*').gt('id', watermark).order('id').limit(TICK_BATCH_SIZE).execute()
+        rows = r.data or []
+        if rows:
+            with self._lock:
+                if table in self._watermarks:
+                    self._watermarks[table] = max(self._watermarks[table], _to_int(rows[-1].get('id')) or 0)
+        return rows
+
+    def tick(self):
+        supabase = get_supabase_client()
+        self.ticks += 1
+        chat_rows = self._new_rows(supabase, CHAT_TABLE)
+        notification_rows = self._new_rows(supabase, NOTIFICATION_TABLE)
+        self.rows_seen += len(chat_rows) + len(notification_rows)
+        delivered = 0
+        for row in chat_rows:
+            with self._lock:
+                targets = list(self._by_booking.get(_to_int(row.get('booking_id')), ()))
+            delivered += sum(1 for sub in targets if sub.push(CHAT_EVENT, row))
+        for row in notification_rows:
+            with self._lock:
+                targets = list(self._by_user.get(_to_int(row.get('user_id')), ()))
+            delivered += sum(1 for sub in targets if sub.push(NOTIFICATION_EVENT, row))
+        self.events_delivered += delivered
+        return delivered
+
+    def stats(self):
+        with self._lock:
+            return {
+                'subscribers': len(self._subscriptions),
+                'watched_bookings': len(self._by_booking),
+                'watermarks': dict(self._watermarks),
+                'ticks': self.ticks,
+                'rows_seen': self.rows_seen,
+                'events_delivered': self.events_delivered,
+                'errors': self.errors,
+            }
+
+
+realtime_hub = RealtimeHub()
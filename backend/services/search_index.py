@@ -0,0 +1,244 @@
+"""
+In-memory inverted index over the enriched services catalog (the rows services_list returns).
+
+Indexed fields and their BM25F weights:
+
+  title 3.0, category_name 2.0, provider_profession 2.0,
+  location / provider_district / provider_city 1.0
+
+Each term maps to {service_id: weighted term frequency}, so a query only touches the
+postings of its own terms. Query terms also match indexed terms they are a prefix of
+("plumb" -> "plumber", "plumbing"), found by bisecting the sorted term list, and such
+matches score at PREFIX_MATCH_WEIGHT of an exact hit.
+
+sync(rows) is incremental: rows whose indexed text did not change are not re-tokenized,
+and rows that disappeared are removed. _get_services_raw_from_supabase pushes every fresh
+full-catalog build here; search requests call ensure_fresh(loader) to pick up builds
+made by other workers, and write events (services/cache_events.py) mark the index stale.
+"""
+import bisect
+import logging
+import math
+import re
+import threading
+import time
+from collections import defaultdict
+
+
+logger = logging.getLogger(__name__)
+
+FIELD_WEIGHTS = (
+    ('title', 3.0),
+    ('category_name', 2.0),
+    ('provider_profession', 2.0),
+    ('location', 1.0),
+    ('provider_district', 1.0),
+    ('provider_city', 1.0),
+)
+BM25_K1 = 1.2
+BM25_B = 0.75
+PREFIX_MATCH_WEIGHT = 0.5
+MIN_PREFIX_LENGTH = 2
+MAX_PREFIX_EXPANSIONS = 50
+REFRESH_SECONDS = 60
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+STOPWORDS = frozenset({'a', 'an', 'and', 'the', 'of', 'for', 'in', 'at', 'to', 'on', 'with', 'or', 'by'})
+
+
+def tokenize(text):
+    return [t for t in _TOKEN_RE.findall((text or '').lower()) if t not in STOPWORDS]
+
+
+def _doc_id(row):
+    try:
+        return int(row.get('id'))
+    except (TypeError, ValueError):
+        return None
+
+
+def _signature(row):
+    return tuple(str(row.get(field) or '') for field, _ in FIELD_WEIGHTS)
+
+
+class ServiceSearchIndex:
+    """BM25F-ranked, prefix-aware inverted index of service rows keyed by service id."""
+
+    def __init__(self, refresh_seconds=REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.RLock()
+        self._refresh_lock = threading.Lock()
+        self._rows = {}
+        self._signatures = {}
+        self._doc_terms = {}
+        self._doc_length = {}
+        self._total_length = 0.0
+        self._postings = defaultdict(dict)
+        self._sorted_terms = []
+        self._terms_dirty = False
+        self._synced_at = 0.0
+        self._stale = True
+
+    # --- maintenance -------------------------------------------------------
+
+    def _remove(self, doc_id):
+        for term in self._doc_terms.pop(doc_id, ()):
+            posting = self._postings.get(term)
+            if posting is None:
+                continue
+            posting.pop(doc_id, None)
+            if not posting:
+                del self._postings[term]
+                self._terms_dirty = True
+        self._total_length -= self._doc_length.pop(doc_id, 0.0)
+        self._rows.pop(doc_id, None)
+        self._signatures.pop(doc_id, None)
+
+    def _add(self, doc_id, row, signature):
+        freqs = defaultdict(float)
+        length = 0.0
+        for field, weight in FIELD_WEIGHTS:
+            for term in tokenize(row.get(field)):
+                freqs[term] += weight
+                length += weight
+        for term, tf in freqs.items():
+            posting = self._postings.get(term)
+            if posting is None:
+                posting = self._postings[term] = {}
+                self._terms_dirty = True
+            posting[doc_id] = tf
+        self._doc_terms[doc_id] = tuple(freqs)
+        self._doc_length[doc_id] = length
+        self._total_length += length
+        self._rows[doc_id] = dict(row)
+        self._signatures[doc_id] = signature
+
+    def sync(self, rows):
+        """Make the index match rows; only added/changed/removed services are (re)indexed."""
+        seen = set()
+        changed = 0
+        with self._lock:
+            for row in rows or []:
+                if not isinstance(row, dict):
+                    continue
+                doc_id = _doc_id(row)
+                if doc_id is None or doc_id in seen:
+                    continue
+                seen.add(doc_id)
+                signature = _signature(row)
+                if self._signatures.get(doc_id) == signature:
+                    # Same searchable text: keep postings, refresh the returned payload.
+                    self._rows[doc_id] = dict(row)
+                    continue
+                self._remove(doc_id)
+                self._add(doc_id, row, signature)
+                changed += 1
+            for doc_id in [d for d in self._rows if d not in seen]:
+                self._remove(doc_id)
+                changed += 1
+            self._synced_at = time.time()
+            self._stale = False
+        return changed
+
+    def mark_stale(self, **_payload):
+        with self._lock:
+            self._stale = True
+
+    def ensure_fresh(self, loader):
+        """Re-sync from loader() (the cached full catalog) when stale or older than refresh_seconds."""
+        with self._lock:
+            needed = self._stale or time.time() - self._synced_at >= self.refresh_seconds
+            empty = not self._rows and not self._synced_at
+        if not needed:
+            return
+        if not self._refresh_lock.acquire(blocking=empty):
+            return
+        try:
+            self.sync(loader() or [])
+        except Exception as e:
+            if empty:
+                raise
+            logger.warning('service search index refresh failed: %s', e)
+        finally:
+            self._refresh_lock.release()
+
+    # --- queries -------------------------------------------------------------
+
+    def _terms_with_prefix(self, prefix):
+        if self._terms_dirty:
+            self._sorted_terms = sorted(self._postings)
+            self._terms_dirty = False
+        out = []
+        i = bisect.bisect_left(self._sorted_terms, prefix)
+        while i < len(self._sorted_terms) and len(out) < MAX_PREFIX_EXPANSIONS:
+            term = self._sorted_terms[i]
+            if not term.startswith(prefix):
+                break
+            out.append(term)
+            i += 1
+        return out
+
+    def _expand(self, query_term, prefix):
+        """[(indexed_term, weight)] for one query term: exact hit plus prefix completions."""
+        expansions = []
+        if query_term in self._postings:
+            expansions.append((query_term, 1.0))
+        if prefix and len(query_term) >= MIN_PREFIX_LENGTH:
+            for term in self._terms_with_prefix(query_term):
+                if term != query_term:
+                    expansions.append((term, PREFIX_MATCH_WEIGHT))
+        return expansions
+
+    def search(self, query, limit=20, prefix=True, candidate_ids=None):
+        """[(score, row)] best first. candidate_ids restricts scoring to those service ids."""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        with self._lock:
+            n_docs = len(self._rows)
+            if not n_docs:
+                return []
+            avg_length = (self._total_length / n_docs) or 1.0
+            scores = defaultdict(float)
+            for query_term in terms:
+                # A document scores each query term once, through its best expansion.
+                best = {}
+                for term, weight in self._expand(query_term, prefix):
+                    posting = self._postings[term]
+                    df = len(posting)
+                    idf = math.log(1.0 + (n_docs - df + 0.5) / (df + 0.5))
+                    for doc_id, tf in posting.items():
+                        if candidate_ids is not None and doc_id not in candidate_ids:
+                            continue
+                        norm = BM25_K1 * (1.0 - BM25_B + BM25_B * self._doc_length[doc_id] / avg_length)
+                        s = weight * idf * tf * (BM25_K1 + 1.0) / (tf + norm)
+                        if s > best.get(doc_id, 0.0):
+                            best[doc_id] = s
+                for doc_id, s in best.items():
+                    scores[doc_id] += s
+            ranked = sorted(scores.items(), key=lambda kv: (-kv[1], kv[0]))
+            if limit is not None:
+                ranked = ranked[:limit]
+            return [(round(score, 4), dict(self._rows[doc_id])) for doc_id, score in ranked]
+
+    def matching_ids(self, query, prefix=True):
+        """Service ids matching any query term (exact or prefix), without ranking."""
+        terms = list(dict.fromkeys(tokenize(query)))
+        out = set()
+        with self._lock:
+            for query_term in terms:
+                for term, _weight in self._expand(query_term, prefix):
+                    out.update(self._postings[term])
+        return out
+
+    def stats(self):
+        with self._lock:
+            return {
+                'documents': len(self._rows),
+                'terms': len(self._postings),
+                'synced_at': self._synced_at,
+                'stale': self._stale,
+            }
+
+
+service_search_index = ServiceSearchIndex()
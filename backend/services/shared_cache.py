@@ -0,0 +1,176 @@
+"""
+Shared (cross-worker) cache for heavy read payloads such as the services catalog.
+
+Entries live in the Django cache alias named by SERVICES_CACHE_ALIAS (see settings.CACHES),
+so every gunicorn worker on the host reads the same warm copy instead of keeping its own
+process-local dict. The backend itself bounds the entry count: locmem and Redis evict
+least-recently-used keys, the file-based backend culls once MAX_ENTRIES is reached.
+
+Each namespace keeps hit/miss counters for this process; cache_stats() reports them.
+Keys carry a per-namespace generation so clear() can drop a whole namespace on every
+backend (including file-based) with a single write.
+"""
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import InvalidCacheBackendError
+
+
+DEFAULT_ALIAS = 'default'
+
+_NAMESPACES = {}
+_NAMESPACES_LOCK = threading.Lock()
+
+
+def _cache_backend():
+    alias = getattr(settings, 'SERVICES_CACHE_ALIAS', DEFAULT_ALIAS) or DEFAULT_ALIAS
+    try:
+        return caches[alias]
+    except InvalidCacheBackendError:
+        return caches[DEFAULT_ALIAS]
+
+
+class CacheNamespace:
+    """
+    Prefixed view over the shared cache with a TTL and hit/miss counters.
+
+    Keys may be any hashable of str/int/None parts; they are flattened into
+    "<name>:g<generation>:<part>:<part>" so every worker derives the same backend key.
+    """
+
+    def __init__(self, name, ttl_seconds):
+        self.name = name
+        self.ttl_seconds = int(ttl_seconds)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.sets = 0
+        self.deletes = 0
+        self.errors = 0
+
+    def _generation(self, backend):
+        try:
+            return int(backend.get(f'{self.name}:gen') or 0)
+        except Exception:
+            return 0
+
+    def _key(self, key, generation=0):
+        parts = key if isinstance(key, tuple) else (key,)
+        return ':'.join([self.name, f'g{generation}'] + ['-' if p is None else str(p) for p in parts])
+
+    def _count(self, field, amount=1):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + amount)
+
+    def get(self, key):
+        try:
+            backend = _cache_backend()
+            value = backend.get(self._key(key, self._generation(backend)))
+        except Exception:
+            self._count('errors')
+            value = None
+        self._count('hits' if value is not None else 'misses')
+        return value
+
+    def get_many(self, keys):
+        """Return {key: value} for the keys present in the cache (one backend round-trip)."""
+        keys = list(keys)
+        if not keys:
+            return {}
+        try:
+            backend = _cache_backend()
+            generation = self._generation(backend)
+            backend_keys = {self._key(k, generation): k for k in keys}
+            found = backend.get_many(list(backend_keys))
+        except Exception:
+            self._count('errors')
+            found = {}
+        out = {backend_keys[bk]: v for bk, v in found.items() if v is not None}
+        self._count('hits', len(out))
+        self._count('misses', len(keys) - len(out))
+        return out
+
+    def set(self, key, value, ttl_seconds=None):
+        timeout = self.ttl_seconds if ttl_seconds is None else int(ttl_seconds)
+        try:
+            backend = _cache_backend()
+            backend.set(self._key(key, self._generation(backend)), value, timeout=timeout)
+        except Exception:
+            self._count('errors')
+            return
+        self._count('sets')
+
+    def set_many(self, mapping, ttl_seconds=None):
+        if not mapping:
+            return
+        timeout = self.ttl_seconds if ttl_seconds is None else int(ttl_seconds)
+        try:
+            backend = _cache_backend()
+            generation = self._generation(backend)
+            backend.set_many({self._key(k, generation): v for k, v in mapping.items()}, timeout=timeout)
+        except Exception:
+            self._count('errors')
+            return
+        self._count('sets', len(mapping))
+
+    def delete(self, key):
+        self.delete_many([key])
+
+    def delete_many(self, keys):
+        keys = list(keys)
+        if not keys:
+            return
+        try:
+            backend = _cache_backend()
+            generation = self._generation(backend)
+            backend.delete_many([self._key(k, generation) for k in keys])
+        except Exception:
+            self._count('errors')
+            return
+        self._count('deletes', len(keys))
+
+    def clear(self):
+        """Drop every entry in this namespace by bumping its generation (old keys age out)."""
+        backend = _cache_backend()
+        gen_key = f'{self.name}:gen'
+        try:
+            try:
+                backend.incr(gen_key)
+            except ValueError:
+                backend.set(gen_key, 1, timeout=None)
+        except Exception:
+            self._count('errors')
+            return
+        self._count('deletes')
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'namespace': self.name,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'sets': self.sets,
+                'deletes': self.deletes,
+                'errors': self.errors,
+            }
+
+
+def get_namespace(name, ttl_seconds):
+    """Return the process-wide CacheNamespace for name (created on first use)."""
+    with _NAMESPACES_LOCK:
+        ns = _NAMESPACES.get(name)
+        if ns is None:
+            ns = CacheNamespace(name, ttl_seconds)
+            _NAMESPACES[name] = ns
+        return ns
+
+
+def cache_stats():
+    """Hit/miss counters for every namespace used by this process."""
+    with _NAMESPACES_LOCK:
+        namespaces = list(_NAMESPACES.values())
+    return {ns.name: ns.stats() for ns in namespaces}
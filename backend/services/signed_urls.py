@@ -0,0 +1,89 @@
+"""
+Cached Supabase Storage signed URLs.
+
+Chat attachments are immutable (every upload gets a fresh timestamped path), so a signed URL
+minted for a path can be handed out again until it gets close to expiring. URLs live in the
+shared cache (storage:signed_url, see cache_events.py) keyed by (bucket, path, expires_in)
+together with their expiry time. An entry is reused only while at least half of its lifetime
+is left, so clients never receive a URL that is about to stop working.
+
+Paths missing from the cache are signed with one create_signed_urls call per bucket when the
+storage client supports it, falling back to one create_signed_url per path.
+"""
+import logging
+import time
+
+from .cache_events import SIGNED_URL_CACHE
+
+
+logger = logging.getLogger(__name__)
+
+CHAT_ATTACHMENTS_BUCKET = 'chat-attachments'
+DEFAULT_EXPIRES_IN = 24 * 60 * 60
+
+
+def _url_from(signed):
+    if not isinstance(signed, dict):
+        return None
+    return signed.get('signedURL') or signed.get('signedUrl') or signed.get('signed_url')
+
+
+def _reuse_seconds(expires_in):
+    return max(1, int(expires_in) // 2)
+
+
+def _sign_missing(supabase, bucket, paths, expires_in):
+    """{path: url} for freshly signed paths; paths that could not be signed are left out."""
+    storage = supabase.storage.from_(bucket)
+    out = {}
+    if len(paths) > 1 and hasattr(storage, 'create_signed_urls'):
+        try:
+            for item in storage.create_signed_urls(list(paths), expires_in) or []:
+                url = _url_from(item)
+                if url and item.get('path'):
+                    out[item['path']] = url
+        except Exception as e:
+            logger.warning('create_signed_urls failed for %s paths in %s: %s', len(paths), bucket, e)
+    for path in paths:
+        if path in out:
+            continue
+        try:
+            url = _url_from(storage.create_signed_url(path, expires_in=expires_in))
+        except Exception as e:
+            logger.warning('create_signed_url failed for %s/%s: %s', bucket, path, e)
+            continue
+        if url:
+            out[path] = url
+    return out
+
+
+def signed_urls(supabase, paths, bucket=CHAT_ATTACHMENTS_BUCKET, expires_in=DEFAULT_EXPIRES_IN):
+    """{path: signed url}; only paths without a reusable cached URL hit Storage."""
+    paths = list(dict.fromkeys(p for p in paths or () if p))
+    if not paths:
+        return {}
+    expires_in = int(expires_in)
+    now = time.time()
+    keys = {(bucket, path, expires_in): path for path in paths}
+    cached = SIGNED_URL_CACHE.get_many(keys)
+    out = {}
+    for key, entry in cached.items():
+        if isinstance(entry, dict) and entry.get('url') and float(entry.get('reuse_until') or 0) > now:
+            out[keys[key]] = entry['url']
+    missing = [p for p in paths if p not in out]
+    if missing:
+        fresh = _sign_missing(supabase, bucket, missing, expires_in)
+        reuse = _reuse_seconds(expires_in)
+        SIGNED_URL_CACHE.set_many(
+            {
+                (bucket, path, expires_in): {'url': url, 'reuse_until': now + reuse, 'expires_at': now + expires_in}
+                for path, url in fresh.items()
+            },
+            ttl_seconds=reuse,
+        )
+        out.update(fresh)
+    return out
+
+
+def signed_url(supabase, path, bucket=CHAT_ATTACHMENTS_BUCKET, expires_in=DEFAULT_EXPIRES_IN):
+    return signed_urls(supabase, [path], bucket=bucket, expires_in=expires_in).get(path)
@@ -0,0 +1,68 @@
+"""
+Batched PostgREST reads: one `.in_()` query per chunk of ids instead of one query per id.
+
+Long id lists are split into IN_CHUNK_SIZE pieces so the generated URL stays well under
+proxy/PostgREST limits, and each chunk is paged with .range() because PostgREST caps a
+single response (1000 rows by default).
+"""
+IN_CHUNK_SIZE = 200
+PAGE_SIZE = 1000
+
+
+def chunked(values, size=IN_CHUNK_SIZE):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _unique_ids(ids):
+    out = []
+    seen = set()
+    for value in ids:
+        if value is None or value in seen:
+            continue
+        seen.add(value)
+        out.append(value)
+    return out
+
+
+def select_in(supabase, table, column, ids, columns='*', chunk_size=IN_CHUNK_SIZE, order_column='id'):
+    """All rows of table whose column is in ids (chunked, paged)."""
+    rows = []
+    for chunk in chunked(_unique_ids(ids), chunk_size):
+        start = 0
+        while True:
+            r = (
+                supabase.table(table)
+                .select(columns)
+                .in_(column, chunk)
+                .order(order_column)
+                .range(start, start + PAGE_SIZE - 1)
+                .execute()
+            )
+            page = r.data or []
+            rows.extend(page)
+            if len(page) < PAGE_SIZE:
+                break
+            start += PAGE_SIZE
+    return rows
+
+
+def select_eq_paged(supabase, table, column, value, columns='*', order_column='id'):
+    """All rows of table with column == value, paged past the PostgREST row cap."""
+    rows = []
+    start = 0
+    while True:
+        r = (
+            supabase.table(table)
+            .select(columns)
+            .eq(column, value)
+            .order(order_column)
+            .range(start, start + PAGE_SIZE - 1)
+            .execute()
+        )
+        page = r.data or []
+        rows.extend(page)
+        if len(page) < PAGE_SIZE:
+            return rows
+        start += PAGE_SIZE
@@ -0,0 +1,279 @@
+"""
+Incremental Supabase -> SQLite sync helpers shared by sync_supabase_all and sync_supabase_users.
+
+Each mirrored table keeps a high-water mark in seva_sync_state (max updated_at and max id
+seen so far). An incremental run only asks Supabase for rows with updated_at >= mark or
+id > mark. Every run also records its mode, duration and row count so admin tooling can
+show how fresh the mirror is.
+
+Rows are streamed: iter_rows yields keyset-paginated pages one at a time, MarkTracker
+advances the marks row by row, and BatchWriter upserts BATCH_SIZE rows per executemany,
+each batch in its own short transaction. Peak memory is one page plus one batch, whatever
+the table size.
+
+A full re-copy still happens on --full, on the first run, and once FULL_SYNC_INTERVAL_SECONDS
+has passed, as a safety net for upstream writes that do not bump updated_at
+(see add_sync_updated_at_triggers.sql).
+"""
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.utils import timezone
+
+
+SYNC_STATE_TABLE = 'seva_sync_state'
+PAGE_SIZE = 1000
+# Rows per executemany / SQLite transaction in BatchWriter.
+BATCH_SIZE = 500
+FULL_SYNC_INTERVAL_SECONDS = 6 * 60 * 60
+
+MODE_FULL = 'full'
+MODE_INCREMENTAL = 'incremental'
+
+_STATE_COLUMNS = (
+    'table_name', 'high_water_mark', 'high_water_id', 'last_mode', 'last_started_at',
+    'last_finished_at', 'last_full_sync_at', 'last_duration_ms', 'last_row_count',
+    'total_rows_synced', 'last_error',
+)
+
+
+def ensure_sync_state_table(raw):
+    raw.execute(f"""
+        CREATE TABLE IF NOT EXISTS {SYNC_STATE_TABLE} (
+            table_name VARCHAR(80) PRIMARY KEY,
+            high_water_mark VARCHAR(64),
+            high_water_id INTEGER,
+            last_mode VARCHAR(20),
+            last_started_at DATETIME,
+            last_finished_at DATETIME,
+            last_full_sync_at DATETIME,
+            last_duration_ms INTEGER,
+            last_row_count INTEGER NOT NULL DEFAULT 0,
+            total_rows_synced INTEGER NOT NULL DEFAULT 0,
+            last_error TEXT
+        )
+    """)
+
+
+def load_sync_state(raw, table_name):
+    cur = raw.execute(
+        f"SELECT {', '.join(_STATE_COLUMNS)} FROM {SYNC_STATE_TABLE} WHERE table_name = ?",
+        (table_name,),
+    )
+    row = cur.fetchone()
+    return dict(zip(_STATE_COLUMNS, row)) if row else {}
+
+
+def all_sync_states(raw):
+    cur = raw.execute(f"SELECT {', '.join(_STATE_COLUMNS)} FROM {SYNC_STATE_TABLE} ORDER BY table_name")
+    return [dict(zip(_STATE_COLUMNS, row)) for row in cur.fetchall()]
+
+
+def choose_mode(state, force_full=False):
+    """Full on request, on first run, or when the last full copy is too old."""
+    if force_full or not state or not state.get('last_full_sync_at'):
+        return MODE_FULL
+    try:
+        last_full = datetime.fromisoformat(str(state['last_full_sync_at']))
+    except ValueError:
+        return MODE_FULL
+    if timezone.is_naive(last_full):
+        last_full = timezone.make_aware(last_full, dt_timezone.utc)
+    if (timezone.now() - last_full).total_seconds() >= FULL_SYNC_INTERVAL_SECONDS:
+        return MODE_FULL
+    return MODE_INCREMENTAL
+
+
+def iter_pages(build_query, page_size=PAGE_SIZE):
+    """
+    Yield pages of rows ordered by id, keyset-paginated (id > last id of the previous page)
+    so each page is an indexed range scan and concurrent inserts cannot shift rows
+    between pages. Only one page is held in memory at a time.
+    """
+    last_id = None
+    while True:
+        query = build_query()
+        if last_id is not None:
+            query = query.gt('id', last_id)
+        page = query.order('id').limit(page_size).execute().data or []
+        if page:
+            yield page
+        if len(page) < page_size:
+            return
+        last_id = page[-1].get('id')
+        if last_id is None:
+            return
+
+
+def iter_rows(supabase, table, mode, state, watermark_column='updated_at', columns='*', page_size=PAGE_SIZE):
+    """
+    Streaming fetch_rows: yields the same rows one at a time without building the list.
+    Incremental runs stream "new since max id" first, then "changed since mark" minus
+    ids already yielded, so only the ids of this run's changes are kept in memory.
+    """
+    if mode == MODE_FULL:
+        for page in iter_pages(lambda: supabase.table(table).select(columns), page_size):
+            yield from page
+        return
+    since_id = int(state.get('high_water_id') or 0)
+    seen = set()
+    for page in iter_pages(lambda: supabase.table(table).select(columns).gt('id', since_id), page_size):
+        for row in page:
+            seen.add(row.get('id'))
+            yield row
+    mark = state.get('high_water_mark')
+    if not (watermark_column and mark):
+        return
+    changed = iter_pages(lambda: supabase.table(table).select(columns).gte(watermark_column, mark), page_size)
+    while True:
+        try:
+            page = next(changed)
+        except StopIteration:
+            return
+        except Exception:
+            # Older schema without the watermark column: id-only for this run.
+            return
+        for row in page:
+            if row.get('id') not in seen:
+                yield row
+
+
+def fetch_rows(supabase, table, mode, state, watermark_column='updated_at', columns='*'):
+    """iter_rows as a list ordered by id, for callers that need every row at once."""
+    rows = list(iter_rows(supabase, table, mode, state, watermark_column=watermark_column, columns=columns))
+    rows.sort(key=lambda row: (row.get('id') is None, row.get('id') or 0))
+    return rows
+
+
+def advance_marks(rows, state, watermark_column='updated_at'):
+    tracker = MarkTracker(state, watermark_column)
+    for row in rows:
+        tracker.add(row)
+    return tracker.marks
+
+
+def upsert_rows(raw, sql, params, on_row_error=None):
+    """
+    executemany inside one transaction (the raw Django connection is in autocommit).
+    If the batch fails and on_row_error(params, exc) is given, rows are retried one by
+    one so a single bad row is skipped instead of losing the whole table.
+    """
+    if not params:
+        return 0
+    owns_transaction = not raw.in_transaction
+    if owns_transaction:
+        raw.execute('BEGIN')
+    try:
+        raw.executemany(sql, params)
+    except Exception:
+        if not owns_transaction or on_row_error is None:
+            if owns_transaction:
+                raw.execute('ROLLBACK')
+            raise
+        raw.execute('ROLLBACK')
+        raw.execute('BEGIN')
+        written = 0
+        for row_params in params:
+            try:
+                raw.execute(sql, row_params)
+                written += 1
+            except Exception as e:
+                on_row_error(row_params, e)
+        raw.execute('COMMIT')
+        return written
+    if owns_transaction:
+        raw.execute('COMMIT')
+    return len(params)
+
+
+class MarkTracker:
+    """advance_marks() for a stream: feed rows one at a time, read .marks at the end."""
+
+    def __init__(self, state, watermark_column='updated_at'):
+        self.watermark_column = watermark_column
+        self.mark = state.get('high_water_mark')
+        self.max_id = int(state.get('high_water_id') or 0)
+
+    def add(self, row):
+        value = row.get(self.watermark_column) if self.watermark_column else None
+        if value is not None and (self.mark is None or str(value) > str(self.mark)):
+            self.mark = str(value)
+        try:
+            rid = int(row.get('id'))
+        except (TypeError, ValueError):
+            return
+        if rid > self.max_id:
+            self.max_id = rid
+
+    @property
+    def marks(self):
+        return self.mark, self.max_id
+
+
+class BatchWriter:
+    """
+    Buffers parameter tuples and upserts them BATCH_SIZE at a time, each batch in its own
+    transaction (upsert_rows), so memory and SQLite lock time stay bounded no matter how
+    large the table is. Tracks rows written and throughput for the sync report.
+    """
+
+    def __init__(self, raw, sql, batch_size=BATCH_SIZE, on_row_error=None):
+        self.raw = raw
+        self.sql = sql
+        self.batch_size = max(1, int(batch_size))
+        self.on_row_error = on_row_error
+        self.started = time.time()
+        self.written = 0
+        self.batches = 0
+        self._buffer = []
+
+    def add(self, params):
+        self._buffer.append(params)
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._buffer:
+            return
+        batch, self._buffer = self._buffer, []
+        self.written += upsert_rows(self.raw, self.sql, batch, on_row_error=self.on_row_error)
+        self.batches += 1
+
+    def close(self):
+        self.flush()
+        return self.written
+
+    @property
+    def elapsed(self):
+        return time.time() - self.started
+
+    @property
+    def rows_per_second(self):
+        elapsed = self.elapsed
+        return self.written / elapsed if elapsed > 0 else 0.0
+
+
+def save_sync_state(raw, table_name, state, mode, started, row_count, marks=None, error=None):
+    """Persist the run outcome; marks only advance on success."""
+    finished_at = timezone.now().isoformat()
+    mark, max_id = marks if marks is not None else (state.get('high_water_mark'), state.get('high_water_id'))
+    last_full = state.get('last_full_sync_at')
+    if mode == MODE_FULL and error is None:
+        last_full = finished_at
+    raw.execute(
+        f"""INSERT OR REPLACE INTO {SYNC_STATE_TABLE} ({', '.join(_STATE_COLUMNS)})
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+        (
+            table_name,
+            mark,
+            max_id,
+            mode,
+            datetime.fromtimestamp(started, dt_timezone.utc).isoformat(),
+            finished_at,
+            last_full,
+            int((time.time() - started) * 1000),
+            int(row_count or 0),
+            int(state.get('total_rows_synced') or 0) + int(row_count or 0),
+            str(error)[:1000] if error else None,
+        ),
+    )
@@ -0,0 +1,290 @@
+"""
+Background refresh of the admin SQLite mirror (sync_supabase_users + sync_supabase_all),
+followed by an incremental refresh of the dashboard snapshot (admin_api/snapshot.py).
+
+Admin pages used to run both commands inline whenever the throttle key expired, so one
+unlucky request paid the full sync latency. Now a daemon thread in each web process wakes
+every ADMIN_SYNC_INTERVAL_SECONDS (or sooner when a write path calls request_sync()) and
+runs the commands only if it can take an exclusive, non-blocking lock on
+ADMIN_SYNC_LOCK_FILE, so at most one process on the host syncs at a time and the others
+simply skip that tick.
+
+ADMIN_SYNC_MODE:
+  thread  (default) start the in-process worker on first use
+  daemon  an external `manage.py run_admin_sync` process owns syncing; web processes only read
+  inline  legacy behaviour: sync inside the request (tests / one-off scripts)
+"""
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import close_old_connections, connection
+from django.utils import timezone
+
+from admin_api.snapshot import refresh_snapshot, snapshot_status
+
+from .sync_state import all_sync_states, ensure_sync_state_table
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines
+    fcntl = None
+
+
+logger = logging.getLogger(__name__)
+
+MODE_THREAD = 'thread'
+MODE_DAEMON = 'daemon'
+MODE_INLINE = 'inline'
+
+SYNC_COMMANDS = ('sync_supabase_users', 'sync_supabase_all')
+# Without fcntl a crashed holder leaves the lock file behind; treat it as stale after this.
+STALE_LOCK_SECONDS = 30 * 60
+
+
+def sync_mode():
+    mode = (getattr(settings, 'ADMIN_SYNC_MODE', MODE_THREAD) or MODE_THREAD).strip().lower()
+    return mode if mode in (MODE_THREAD, MODE_DAEMON, MODE_INLINE) else MODE_THREAD
+
+
+def sync_interval_seconds():
+    return max(5, int(getattr(settings, 'ADMIN_SYNC_INTERVAL_SECONDS', 60) or 60))
+
+
+def sync_min_gap_seconds():
+    return max(0, int(getattr(settings, 'ADMIN_SYNC_MIN_GAP_SECONDS', 20) or 0))
+
+
+def _lock_path():
+    path = getattr(settings, 'ADMIN_SYNC_LOCK_FILE', '') or os.path.join(
+        str(settings.BASE_DIR), '.cache', 'admin_sync.lock'
+    )
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+
+class SyncLock:
+    """Exclusive, non-blocking, cross-process lock on a file (flock, or O_EXCL fallback)."""
+
+    def __init__(self, path=None):
+        self.path = path or _lock_path()
+        self._fd = None
+
+    def acquire(self):
+        if fcntl is not None:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                os.close(fd)
+                return False
+            os.ftruncate(fd, 0)
+            os.write(fd, str(os.getpid()).encode())
+            self._fd = fd
+            return True
+        try:
+            if time.time() - os.path.getmtime(self.path) > STALE_LOCK_SECONDS:
+                os.remove(self.path)
+        except OSError:
+            pass
+        try:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_EXCL, 0o644)
+        except FileExistsError:
+            return False
+        os.write(fd, str(os.getpid()).encode())
+        self._fd = fd
+        return True
+
+    def release(self):
+        if self._fd is None:
+            return
+        fd, self._fd = self._fd, None
+        if fcntl is not None:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            finally:
+                os.close(fd)
+            return
+        os.close(fd)
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def run_sync_once(full=False, verbosity=0):
+    """
+    Run both sync commands if no other process holds the lock.
+    Returns True when this call synced, False when another process was already syncing.
+    """
+    lock = SyncLock()
+    if not lock.acquire():
+        return False
+    try:
+        for name in SYNC_COMMANDS:
+            try:
+                if full:
+                    call_command(name, full=True, verbosity=verbosity)
+                else:
+                    call_command(name, verbosity=verbosity)
+            except Exception as e:
+                logger.warning('admin sync %s failed: %s', name, e)
+        try:
+            # Only sections whose tables received rows in this run are recomputed.
+            refresh_snapshot()
+        except Exception as e:
+            logger.warning('dashboard snapshot refresh failed: %s', e)
+        return True
+    finally:
+        lock.release()
+
+
+class SyncWorker:
+    """Daemon thread that keeps the mirror fresh; request_sync() wakes it early."""
+
+    def __init__(self, interval_seconds=None, min_gap_seconds=None):
+        self.interval_seconds = interval_seconds or sync_interval_seconds()
+        self.min_gap_seconds = sync_min_gap_seconds() if min_gap_seconds is None else min_gap_seconds
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.last_attempt_at = None
+        self.last_run_at = None
+        self.last_duration_ms = None
+        self.runs = 0
+        self.skipped = 0
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name='admin-sync-worker', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def is_alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def request_sync(self):
+        self.start()
+        self._wake.set()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            if self.last_attempt_at is not None:
+                since = time.time() - self.last_attempt_at
+                if since < self.min_gap_seconds:
+                    # Coalesce bursts of write-path nudges into one run.
+                    self._stop.wait(self.min_gap_seconds - since)
+            if self._stop.is_set():
+                break
+            self._wake.clear()
+            self.tick()
+            self._wake.wait(self.interval_seconds)
+
+    def tick(self):
+        started = time.time()
+        self.last_attempt_at = started
+        try:
+            if run_sync_once():
+                self.runs += 1
+                self.last_run_at = time.time()
+                self.last_duration_ms = int((self.last_run_at - started) * 1000)
+            else:
+                self.skipped += 1
+        except Exception as e:
+            logger.warning('admin sync worker tick failed: %s', e)
+        finally:
+            # The worker thread owns its own DB connection; don't leak it between ticks.
+            close_old_connections()
+
+    def stats(self):
+        return {
+            'alive': self.is_alive(),
+            'interval_seconds': self.interval_seconds,
+            'runs': self.runs,
+            'skipped_locked': self.skipped,
+            'last_run_at': (
+                datetime.fromtimestamp(self.last_run_at, dt_timezone.utc).isoformat()
+                if self.last_run_at else None
+            ),
+            'last_duration_ms': self.last_duration_ms,
+        }
+
+
+sync_worker = SyncWorker()
+
+
+def _parse_ts(value):
+    if not value:
+        return None
+    try:
+        ts = datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+    if timezone.is_naive(ts):
+        ts = timezone.make_aware(ts, dt_timezone.utc)
+    return ts
+
+
+def sync_status():
+    """Mirror freshness for the admin dashboard: per-table last sync and the oldest age."""
+    out = {
+        'mode': sync_mode(),
+        'interval_seconds': sync_interval_seconds(),
+        'last_synced_at': None,
+        'age_seconds': None,
+        'tables': [],
+    }
+    if sync_mode() == MODE_THREAD:
+        out['worker'] = sync_worker.stats()
+    try:
+        connection.ensure_connection()
+        raw = connection.connection
+        ensure_sync_state_table(raw)
+        states = all_sync_states(raw)
+    except Exception as e:
+        out['error'] = str(e)
+        return out
+    now = timezone.now()
+    oldest = None
+    for s in states:
+        finished = _parse_ts(s.get('last_finished_at'))
+        out['tables'].append({
+            'table': s.get('table_name'),
+            'last_mode': s.get('last_mode'),
+            'last_synced_at': finished.isoformat() if finished else None,
+            'age_seconds': int((now - finished).total_seconds()) if finished else None,
+            'last_row_count': s.get('last_row_count'),
+            'last_duration_ms': s.get('last_duration_ms'),
+            'last_rows_per_second': (
+                round(s['last_row_count'] * 1000.0 / s['last_duration_ms'], 1)
+                if s.get('last_row_count') and s.get('last_duration_ms') else None
+            ),
+            'last_error': s.get('last_error'),
+        })
+        if finished and (oldest is None or finished < oldest):
+            oldest = finished
+    if oldest is not None:
+        out['last_synced_at'] = oldest.isoformat()
+        out['age_seconds'] = int((now - oldest).total_seconds())
+    try:
+        out['snapshot'] = snapshot_status()
+    except Exception as e:
+        out['snapshot_error'] = str(e)
+    return out
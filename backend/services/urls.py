@@ -20,6 +20,7 @@ urlpatterns = [
     path('locations/districts/', views.location_districts, name='location_districts'),
     path('locations/cities/', views.location_cities, name='location_cities'),
     path('services/', views.services_list, name='services_list'),
+    path('services/search/', views.services_search, name='services_search'),
     path('bookings/upload-request-image/', views.upload_booking_request_image, name='upload_booking_request_image'),
     path('service-category-requests/create/', views.create_service_category_request, name='create_service_category_request'),
     path('bookings/create/', views.create_booking, name='create_booking'),
@@ -67,6 +68,7 @@ urlpatterns = [
     path('chat/threads/', views.chat_threads, name='chat_threads'),
     path('chat/threads/<int:booking_id>/messages/', views.chat_messages, name='chat_messages'),
     path('chat/threads/<int:booking_id>/messages/<int:message_id>/delete/', views.delete_chat_message, name='delete_chat_message'),
+    path('realtime/stream/', views.realtime_stream, name='realtime_stream'),
 
     # Google Maps / Places proxy (API key server-side)
     path('places/autocomplete/', views.places_autocomplete, name='places_autocomplete'),
@@ -0,0 +1,92 @@
+"""
+provider_id -> effective verification status, derived from seva_provider_verification docs.
+
+Precedence per provider: approved > pending > rejected > unverified. Statuses live in the
+shared cache (verification:status, see cache_events.py) so service enrichment, booking
+enrichment, providers_list and profile serialization do a get_many instead of re-reading
+the verification table. Only providers missing from the cache are fetched, with one
+chunked .in_() read. Providers without any documents are cached too (as NO_DOCUMENTS) and
+are left out of the returned map, same as before.
+
+Verification writes publish PROVIDER_CHANGED, which drops that provider's entry; the TTL
+is only a safety net for writes made outside this backend.
+"""
+from .cache_events import VERIFICATION_STATUS_CACHE
+from .supabase_batch import select_in
+
+
+VERIFICATION_TABLE = 'seva_provider_verification'
+NO_DOCUMENTS = ''
+STATUS_PRECEDENCE = ('approved', 'pending', 'rejected')
+
+
+def normalize_verification_status(value):
+    raw = (value or '').strip().lower()
+    aliases = {
+        'pending_verification': 'pending',
+        'under_review': 'pending',
+        'on_hold': 'pending',
+        'verified': 'approved',
+    }
+    return aliases.get(raw, raw if raw in {'unverified', 'pending', 'approved', 'rejected'} else 'unverified')
+
+
+def effective_status(statuses):
+    """Collapse a provider's document statuses by precedence."""
+    for status in STATUS_PRECEDENCE:
+        if status in statuses:
+            return status
+    return 'unverified'
+
+
+def _provider_ids(values):
+    out = set()
+    for value in values or ():
+        if value is None:
+            continue
+        try:
+            out.add(int(value))
+        except (TypeError, ValueError):
+            continue
+    return out
+
+
+def _statuses_from_docs(supabase, provider_ids):
+    rows = select_in(
+        supabase, VERIFICATION_TABLE, 'provider_id', sorted(provider_ids), columns='id,provider_id,status'
+    )
+    grouped = {}
+    for row in rows:
+        try:
+            pid = int(row.get('provider_id'))
+        except (TypeError, ValueError):
+            continue
+        if pid in provider_ids:
+            grouped.setdefault(pid, set()).add(normalize_verification_status(row.get('status') or 'unverified'))
+    return {pid: effective_status(grouped[pid]) if pid in grouped else NO_DOCUMENTS for pid in provider_ids}
+
+
+def provider_status_map(supabase, provider_ids):
+    """{provider_id: status} for providers that have verification documents."""
+    pids = _provider_ids(provider_ids)
+    if not pids:
+        return {}
+    statuses = VERIFICATION_STATUS_CACHE.get_many(pids)
+    missing = pids.difference(statuses)
+    if missing:
+        try:
+            fetched = _statuses_from_docs(supabase, missing)
+        except Exception:
+            fetched = {}
+        if fetched:
+            VERIFICATION_STATUS_CACHE.set_many(fetched)
+            statuses.update(fetched)
+    return {pid: status for pid, status in statuses.items() if status != NO_DOCUMENTS}
+
+
+def provider_status(supabase, provider_id):
+    """Effective status of one provider ('unverified' when it has no documents)."""
+    pids = _provider_ids([provider_id])
+    if not pids:
+        return 'unverified'
+    return provider_status_map(supabase, pids).get(next(iter(pids)), 'unverified')
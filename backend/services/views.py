@@ -1,3 +1,4 @@
+import asyncio
 import json
 import mimetypes
 import re
@@ -6,6 +7,9 @@ import time as pytime
 from datetime import date, time, datetime
 from decimal import Decimal
 
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import render
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, AllowAny
@@ -28,20 +32,42 @@ from .provider_services import (
 )
 from .category_matching import catalog_service_title_matches_category
 from .service_name_utils import dedupe_catalog_signup_rows
+from .notification_outbox import enqueue_notification, enqueue_notifications, notification_row
+from .cache_events import (
+    SERVICES_LIST_CACHE,
+    WALLET_LEDGER_CACHE,
+    publish_payment_changed,
+    publish_provider_changed,
+    publish_review_changed,
+)
+from .cursors import decode_cursor, encode_cursor, parse_limit
+from .fanout import Fanout
+from .search_index import service_search_index
+from .rating_summary import apply_review_change, distribution, rating_average, rating_summaries, rating_summary
+from .geo_index import parse_coordinates, provider_geo_index, provider_points_from_bookings
+from .verification_index import normalize_verification_status, provider_status_map
+from .signed_urls import CHAT_ATTACHMENTS_BUCKET, signed_url, signed_urls
+from .realtime_hub import CHAT_EVENT, NOTIFICATION_EVENT, realtime_hub
+from .places_proxy import PlacesApiError, places_client
+from .gazetteer import display_name, location_district_key, location_key
+from .supabase_batch import select_eq_paged, select_in
+from authentication.authentication import CachedJWTAuthentication
 from authentication.models import User
+from authentication.user_cache import forget_user
+from authentication.user_directory import user_directory
 from authentication.serializers import UserProfileSerializer as AuthUserProfileSerializer
 from admin_api.service_requests import create_request as create_service_request_record
+from core.supabase_loader import load_many
 from supabase_config import get_supabase_client
 
 
 logger = logging.getLogger(__name__)
 
 
-# Process-local cache for heavy services list payloads.
-_SERVICES_CACHE = {}
-_SERVICES_CACHE_TTL_SECONDS = 20
-_PROVIDER_RATING_CACHE = {}
-_PROVIDER_RATING_CACHE_TTL_SECONDS = 30
+# Shared cache (settings.CACHES['services']) for heavy services list payloads, so every
+# worker reads the same warm catalog. Write paths invalidate entries through
+# services/cache_events.py; the TTLs there are only a safety net.
+_SERVICES_CACHE = SERVICES_LIST_CACHE
 
 
 def _services_cache_key(category_id=None, provider_id=None):
@@ -53,104 +79,28 @@ def _services_cache_key(category_id=None, provider_id=None):
 
 def _services_cache_get(category_id=None, provider_id=None):
     key = _services_cache_key(category_id=category_id, provider_id=provider_id)
-    entry = _SERVICES_CACHE.get(key)
-    if not entry:
-        return None
-    if entry.get('expires_at', 0) <= pytime.time():
-        _SERVICES_CACHE.pop(key, None)
+    data = _SERVICES_CACHE.get(key)
+    if data is None:
         return None
-    data = entry.get('data') or []
     return [dict(item) if isinstance(item, dict) else item for item in data]
 
 
 def _services_cache_set(category_id, provider_id, data):
     key = _services_cache_key(category_id=category_id, provider_id=provider_id)
-    _SERVICES_CACHE[key] = {
-        'expires_at': pytime.time() + _SERVICES_CACHE_TTL_SECONDS,
-        'data': [dict(item) if isinstance(item, dict) else item for item in (data or [])],
-    }
-
-
-def _provider_rating_cache_get(provider_id):
-    pid = _to_int(provider_id)
-    if pid is None:
-        return None
-    entry = _PROVIDER_RATING_CACHE.get(pid)
-    if not entry:
-        return None
-    if entry.get('expires_at', 0) <= pytime.time():
-        _PROVIDER_RATING_CACHE.pop(pid, None)
-        return None
-    return {
-        'sum': float(entry.get('sum', 0.0)),
-        'count': int(entry.get('count', 0)),
-    }
-
-
-def _provider_rating_cache_set(provider_id, rating_sum, rating_count):
-    pid = _to_int(provider_id)
-    if pid is None:
-        return
-    _PROVIDER_RATING_CACHE[pid] = {
-        'expires_at': pytime.time() + _PROVIDER_RATING_CACHE_TTL_SECONDS,
-        'sum': float(rating_sum or 0.0),
-        'count': int(rating_count or 0),
-    }
+    _SERVICES_CACHE.set(key, [dict(item) if isinstance(item, dict) else item for item in (data or [])])
 
 
 def _get_provider_rating_acc_map(supabase, provider_ids):
+    """pid -> {'sum', 'count'} from the materialized rating summaries."""
+    summaries = rating_summaries(supabase, provider_ids)
     rating_acc = {}
-    if not provider_ids:
-        return rating_acc
-
-    missing = []
-    for pid in provider_ids:
-        cached = _provider_rating_cache_get(pid)
-        if cached is None:
-            missing.append(pid)
-        else:
-            rating_acc[pid] = cached
-
-    if missing:
-        fetched_acc = {pid: {'sum': 0.0, 'count': 0} for pid in missing}
-        ratings_r = (
-            supabase
-            .table('seva_review')
-            .select('provider_id,rating')
-            .in_('provider_id', missing)
-            .execute()
-        )
-        for item in (ratings_r.data or []):
-            pid = _to_int(item.get('provider_id'))
-            if pid is None or pid not in fetched_acc:
-                continue
-            try:
-                val = int(item.get('rating'))
-            except (TypeError, ValueError):
-                continue
-            if val < 1 or val > 5:
-                continue
-            fetched_acc[pid]['sum'] += float(val)
-            fetched_acc[pid]['count'] += 1
-
-        for pid, acc in fetched_acc.items():
-            _provider_rating_cache_set(pid, acc.get('sum', 0.0), acc.get('count', 0))
-            rating_acc[pid] = acc
-
+    for pid in provider_ids or []:
+        summary = summaries.get(_to_int(pid))
+        if summary is not None:
+            rating_acc[pid] = {'sum': float(summary['rating_sum']), 'count': int(summary['rating_count'])}
     return rating_acc
 
 
-def normalize_verification_status(value):
-    raw = (value or '').strip().lower()
-    aliases = {
-        'pending_verification': 'pending',
-        'under_review': 'pending',
-        'on_hold': 'pending',
-        'verified': 'approved',
-    }
-    return aliases.get(raw, raw if raw in {'unverified', 'pending', 'approved', 'rejected'} else 'unverified')
-
-
 def is_provider_verified(row):
     return normalize_verification_status(row.get('verification_status')) == 'approved'
 
@@ -162,48 +112,10 @@ def _provider_status_from_user_row(row):
 def _provider_status_map_from_docs(supabase, provider_ids):
     """
     Build provider_id -> effective verification status from verification docs.
-    Priority: approved > pending > rejected > unverified.
+    Priority: approved > pending > rejected > unverified. Served from the cached
+    verification status index (services/verification_index.py).
     """
-    pids = []
-    for pid in provider_ids:
-        if pid is None:
-            continue
-        try:
-            pids.append(int(pid))
-        except (TypeError, ValueError):
-            continue
-    if not pids:
-        return {}
-    try:
-        r = (
-            supabase.table(PROVIDER_VERIFICATION_TABLE)
-            .select('provider_id,status')
-            .in_('provider_id', pids)
-            .execute()
-        )
-    except Exception:
-        return {}
-    grouped = {}
-    for row in (r.data or []):
-        try:
-            pid = int(row.get('provider_id'))
-        except (TypeError, ValueError):
-            continue
-        if pid not in pids:
-            continue
-        status = normalize_verification_status(row.get('status') or 'unverified')
-        grouped.setdefault(pid, set()).add(status)
-    out = {}
-    for pid, statuses in grouped.items():
-        if 'approved' in statuses:
-            out[pid] = 'approved'
-        elif 'pending' in statuses:
-            out[pid] = 'pending'
-        elif 'rejected' in statuses:
-            out[pid] = 'rejected'
-        else:
-            out[pid] = 'unverified'
-    return out
+    return provider_status_map(supabase, provider_ids)
 
 
 def _safe_update_auth_user(supabase, user_id, payload):
@@ -214,7 +126,9 @@ def _safe_update_auth_user(supabase, user_id, payload):
     data = dict(payload or {})
     while data:
         try:
-            return supabase.table('seva_auth_user').update(data).eq('id', user_id).execute()
+            response = supabase.table('seva_auth_user').update(data).eq('id', user_id).execute()
+            forget_user(user_id)
+            return response
         except Exception as e:
             msg = str(e)
             if 'PGRST204' not in msg or "Could not find the '" not in msg:
@@ -260,26 +174,15 @@ REFUND_STATUS_COMPLETED = 'refunded'
 REFUND_STATUS_REJECTED = 'refund_rejected'
 
 
-def _notify_user(supabase, user_id, title, body, booking_id=None):
-    if user_id is None:
-        return
-    try:
-        payload = {
-            'user_id': int(user_id),
-            'title': title,
-            'body': body,
-        }
-        if booking_id is not None:
-            payload['booking_id'] = int(booking_id)
-        supabase.table('seva_notification').insert(payload).execute()
-    except Exception:
-        pass
+def _notify_user(supabase, user_id, title, body, booking_id=None, dedupe_key=None):
+    """Queue a notification (services/notification_outbox.py); delivered in the background."""
+    enqueue_notification(user_id, title, body, booking_id=booking_id, dedupe_key=dedupe_key)
 
 
 def _get_admin_user_ids(supabase):
     out = []
     try:
-        users_r = supabase.table('seva_auth_user').select('id,role').execute()
+        users_r = supabase.table('seva_auth_user').select('id,role').ilike('role', 'admin').execute()
         for row in users_r.data or []:
             if (row.get('role') or '').strip().lower() != 'admin':
                 continue
@@ -290,6 +193,17 @@ def _get_admin_user_ids(supabase):
         return []
     return out
 
+
+def _notify_admins(supabase, title, body, booking_id=None):
+    """Queue the same notification for every admin as one outbox batch."""
+    try:
+        enqueue_notifications([
+            notification_row(aid, title, body, booking_id=booking_id)
+            for aid in _get_admin_user_ids(supabase)
+        ])
+    except Exception as e:
+        logger.warning('admin notification enqueue failed: %s', e)
+
 FAVORITE_PROVIDER_TABLE = 'seva_favorite_provider'
 FAVORITE_SERVICE_TABLE = 'seva_favorite_service'
 CUSTOMER_PROFILE_TABLE = CustomerProfile._meta.db_table
@@ -738,11 +652,7 @@ def dashboard_stats(request):
                             pass
             avg_rating = 0.0
             try:
-                supabase = get_supabase_client()
-                r = supabase.table('seva_review').select('rating').eq('provider_id', user.id).execute()
-                if r.data and len(r.data) > 0:
-                    total = sum(float(x.get('rating') or 0) for x in r.data)
-                    avg_rating = total / len(r.data)
+                avg_rating = rating_average(rating_summary(get_supabase_client(), user.id))
             except Exception:
                 pass
             stats = {
@@ -833,6 +743,8 @@ def user_profile_update(request):
         # the model-save fallback skips a column on older schemas.
         if supabase_payload:
             _safe_update_auth_user(supabase, user.id, supabase_payload)
+        if _is_provider_user(user):
+            publish_provider_changed(user.id)
         
         # Fetch the updated user directly from Supabase to ensure we get all fields
         try:
@@ -880,19 +792,9 @@ def providers_list(request):
     """
     try:
         supabase = get_supabase_client()
-        # Fetch all users with role; DB may use 'prov' or 'provider'
-        r = supabase.table('seva_auth_user').select(
-            'id,username,profession,role,district,city,verification_status,is_active_provider,is_active,email'
-        ).execute()
-        data = list(r.data) if r.data else []
-        
-        # Filter to only valid providers: has provider role, NOT deleted, NOT inactive
-        provider_roles = ('prov', 'provider')
-        providers = [
-            p for p in data
-            if (p.get('role') or '').strip().lower() in provider_roles
-            and not _is_deleted_user(p)
-        ]
+        # Provider rows come from the in-process directory snapshot (role 'prov' or 'provider').
+        # Filter to only valid providers: NOT deleted, NOT inactive
+        providers = [p for p in user_directory.providers() if not _is_deleted_user(p)]
         
         docs_status_map = _provider_status_map_from_docs(supabase, [p.get('id') for p in providers])
         out = [{
@@ -927,23 +829,7 @@ def provider_detail(request, provider_id):
             return Response({'detail': 'Not found'}, status=status.HTTP_404_NOT_FOUND)
 
         services = _get_services_raw_from_supabase(provider_id=provider_id)
-        reviews_r = (
-            get_supabase_client()
-            .table('seva_review')
-            .select('rating')
-            .eq('provider_id', provider_id)
-            .execute()
-        )
-        ratings = []
-        for row in (reviews_r.data or []):
-            try:
-                value = int(row.get('rating'))
-                if 1 <= value <= 5:
-                    ratings.append(value)
-            except (TypeError, ValueError):
-                continue
-        rating_count = len(ratings)
-        rating_average = round(sum(ratings) / rating_count, 2) if rating_count else 0.0
+        ratings = rating_summary(get_supabase_client(), provider_id)
         categories = []
         seen_category_ids = set()
         for service in services:
@@ -978,8 +864,10 @@ def provider_detail(request, provider_id):
             'categories': categories,
             'summary': {
                 'total_services': len(services),
-                'rating_average': rating_average,
-                'rating_count': rating_count,
+                'rating_average': rating_average(ratings),
+                'rating_count': ratings['rating_count'],
+                'rating_distribution': distribution(ratings),
+                'last_review_at': _to_json_serializable(ratings.get('last_review_at')),
             },
         })
     except Exception as e:
@@ -1150,24 +1038,7 @@ def favorite_providers_list(request):
             and _is_valid_provider_user(u)
         }
 
-        reviews_r = (
-            supabase
-            .table('seva_review')
-            .select('provider_id,rating')
-            .in_('provider_id', list(users_map.keys()))
-            .execute()
-        )
-        rating_acc = {}
-        for row in (reviews_r.data or []):
-            pid = _to_int(row.get('provider_id'))
-            if pid is None:
-                continue
-            rating_acc.setdefault(pid, {'sum': 0.0, 'count': 0})
-            try:
-                rating_acc[pid]['sum'] += float(row.get('rating') or 0)
-                rating_acc[pid]['count'] += 1
-            except (TypeError, ValueError):
-                continue
+        rating_acc = _get_provider_rating_acc_map(supabase, list(users_map.keys()))
 
         service_r = (
             supabase
@@ -1456,16 +1327,7 @@ def favorite_services_list(request):
 def location_districts(request):
     """Distinct non-empty district values from registered providers (for filter dropdowns)."""
     try:
-        supabase = get_supabase_client()
-        r = supabase.table('seva_auth_user').select('district,role,verification_status,is_active_provider').execute()
-        districts = set()
-        for row in (r.data or []):
-            if (row.get('role') or '').strip().lower() not in ('provider', 'prov'):
-                continue
-            d = (row.get('district') or '').strip()
-            if d:
-                districts.add(d)
-        return Response(sorted(districts))
+        return Response(sorted(_dedupe_locations(user_directory.provider_districts())))
     except Exception as e:
         print(f"Error fetching districts: {e}")
         return Response([])
@@ -1480,27 +1342,18 @@ def location_cities(request):
     locations using each service provider's saved district.
     """
     district_param = (request.query_params.get('district') or '').strip()
-    nd = _normalize_location_part(district_param) if district_param else ''
+    nd = location_key(district_param) if district_param else ''
     try:
         supabase = get_supabase_client()
-        r = supabase.table('seva_auth_user').select(
-            'id,city,district,role,verification_status,is_active_provider'
-        ).execute()
-        provider_district_map = {}
-        cities = set()
-        for row in (r.data or []):
-            if (row.get('role') or '').strip().lower() not in ('provider', 'prov'):
-                continue
-            provider_district_map[row.get('id')] = _normalize_location_part(
-                row.get('district') or ''
-            )
-            if nd:
-                pd = provider_district_map.get(row.get('id')) or ''
-                if pd != nd:
-                    continue
-            c = (row.get('city') or '').strip()
-            if c:
-                cities.add(c)
+        if nd:
+            # Every saved spelling of the district ("Kavre", "Kabhrepalanchok", ...) counts.
+            cities, district_provider_ids = set(), set()
+            for raw_district in user_directory.provider_districts():
+                if location_key(raw_district) == nd:
+                    cities |= user_directory.provider_cities(raw_district)
+                    district_provider_ids |= user_directory.provider_ids_in_district(raw_district)
+        else:
+            cities, district_provider_ids = user_directory.provider_cities(None), None
         services_r = supabase.table(Service._meta.db_table).select(
             'location,provider_id,status'
         ).execute()
@@ -1508,15 +1361,14 @@ def location_cities(request):
             status_value = _normalize_location_part(row.get('status') or '')
             if status_value and status_value != 'active':
                 continue
-            if nd:
-                provider_district = provider_district_map.get(row.get('provider_id')) or ''
-                if provider_district != nd:
-                    continue
             raw_location = (row.get('location') or '').strip()
             if not raw_location or _is_generic_service_location(raw_location):
                 continue
+            if nd and _to_int(row.get('provider_id')) not in district_provider_ids \
+                    and location_district_key(raw_location) != nd:
+                continue
             cities.add(raw_location)
-        return Response(sorted(cities))
+        return Response(sorted(_dedupe_locations(cities)))
     except Exception as e:
         print(f"Error fetching cities: {e}")
         return Response([])
@@ -1629,15 +1481,8 @@ def _enrich_services_with_category_and_provider_names(services):
         docs_status_map = _provider_status_map_from_docs(supabase, provider_ids)
         provider_map = {}  # pid -> {'username': ..., 'profession': ..., 'district', 'city'}
         if provider_ids:
-            provider_rows = (
-                supabase.table('seva_auth_user')
-                .select(
-                    'id,username,email,profession,district,city,verification_status,role,is_active_provider,is_active'
-                )
-                .in_('id', provider_ids)
-                .execute()
-            )
-            for row in (provider_rows.data or []):
+            provider_rows = user_directory.rows_for_ids(provider_ids)
+            for row in provider_rows.values():
                 try:
                     pid_int = int(row.get('id'))
                 except (TypeError, ValueError):
@@ -1724,6 +1569,21 @@ def _split_location_parts(value):
     }
 
 
+def _location_part_keys(value):
+    """Gazetteer keys of each comma/slash-separated part ('Ktm / Patan' -> {'kathmandu', 'lalitpur'})."""
+    return {location_key(part) for part in _split_location_parts(value)}
+
+
+def _dedupe_locations(values):
+    """One entry per place: the gazetteer spelling for known places, first spelling otherwise."""
+    out = {}
+    for value in values:
+        key = location_key(value)
+        if key and key not in out:
+            out[key] = display_name(value)
+    return set(out.values())
+
+
 def _is_generic_service_location(value):
     return _normalize_location_part(value) in {
         'online',
@@ -1736,15 +1596,14 @@ def _is_generic_service_location(value):
     }
 
 
-def _service_matches_city(service, normalized_city):
+def _service_matches_city(service, city_key):
     service_location = service.get('location') or ''
     normalized_location = _normalize_location_part(service_location)
     if normalized_location:
         if _is_generic_service_location(service_location):
             return False
-        return normalized_city in _split_location_parts(service_location)
-    provider_city = _normalize_location_part(service.get('provider_city') or '')
-    return provider_city == normalized_city
+        return city_key in _location_part_keys(service_location)
+    return location_key(service.get('provider_city') or '') == city_key
 
 
 def _filter_services_by_provider_location(services, district_filter, city_filter):
@@ -1762,22 +1621,24 @@ def _filter_services_by_provider_location(services, district_filter, city_filter
     if not services:
         return services
     
-    nd, nc = _normalize_location_part(d), _normalize_location_part(c)
+    # Both sides go through the gazetteer, so "Ktm", "kathmandu " and "Kathmandoo" all match.
+    nd, nc = location_key(d), location_key(c)
     out = []
     for s in services:
-        pd = _normalize_location_part(s.get('provider_district') or '')
-        pc = _normalize_location_part(s.get('provider_city') or '')
+        pd = location_key(s.get('provider_district') or '')
+        pc = location_key(s.get('provider_city') or '')
 
-        service_parts = _split_location_parts(s.get('location') or '')
+        service_parts = _location_part_keys(s.get('location') or '')
         district_matches = False
         city_matches = False
 
         # District filter: prefer provider's saved district; fall back to service location when missing.
+        # A known town counts for its district (provider_district "Pokhara" is in Kaski).
         if nd:
             if pd:
-                district_matches = pd == nd
+                district_matches = nd in (pd, location_district_key(pd))
             else:
-                district_matches = nd in service_parts
+                district_matches = any(nd in (part, location_district_key(part)) for part in service_parts)
         else:
             district_matches = True
 
@@ -1809,6 +1670,11 @@ def _add_equivalent_title_rows(services, category_id):
     return services
 
 
+def _searchable_services(services):
+    # Same visibility rule as services_list: only real providers' rows.
+    return [s for s in (services or []) if isinstance(s, dict) and s.get('provider_is_provider') is not False]
+
+
 def _get_services_raw_from_supabase(category_id=None, provider_id=None):
     """
     Fetch services from Supabase as raw dicts (no Django serializer).
@@ -1851,6 +1717,8 @@ def _get_services_raw_from_supabase(category_id=None, provider_id=None):
         enriched = _enrich_services_with_category_and_provider_names(valid_data)
 
         _services_cache_set(category_id, provider_id, enriched)
+        if category_id is None and provider_id is None:
+            service_search_index.sync(_searchable_services(enriched))
         
         return enriched
     except Exception as e:
@@ -1900,8 +1768,30 @@ def _get_bookings_raw_from_supabase(customer_id=None, service_id=None, service_i
         return []
 
 
+def _rows_by_key(rows, key, first_wins=True):
+    out = {}
+    for row in (rows or []):
+        k = _to_int(row.get(key))
+        if k is None or (first_wins and k in out):
+            continue
+        out[k] = row
+    return out
+
+
+def _select_in_data(supabase, table, columns, column, ids, order_desc_id=False):
+    query = supabase.table(table).select(columns).in_(column, ids)
+    if order_desc_id:
+        query = query.order('id', desc=True)
+    return query.execute().data or []
+
+
 def _enrich_bookings_with_names(bookings):
-    """Add customer_name, service_title, provider_name to each booking (Supabase returns only IDs)."""
+    """Add customer_name, service_title, provider_name to each booking (Supabase returns only IDs).
+
+    The independent reads (customers, customer profiles, services, payments, refunds,
+    receipts) run concurrently; provider rows and verification docs follow as soon as the
+    services read returns. A failed or timed-out read only leaves its own fields at defaults.
+    """
     if not bookings:
         return bookings
     try:
@@ -1912,123 +1802,79 @@ def _enrich_bookings_with_names(bookings):
         service_ids = sorted({
             _to_int(b.get('service_id')) for b in bookings if _to_int(b.get('service_id')) is not None
         })
-        customer_map = {}
-        customer_profile_map = {}
+        booking_ids = sorted({
+            _to_int(b.get('id')) for b in bookings if _to_int(b.get('id')) is not None
+        })
+        fan = Fanout('enrich_bookings')
         if customer_ids:
-            customer_rows = (
-                supabase.table('seva_auth_user').select(
-                    'id,username,first_name,last_name,email,phone,profile_image_url'
-                ).in_('id', customer_ids).execute()
+            fan.submit(
+                'customers', _select_in_data, supabase, 'seva_auth_user',
+                'id,username,first_name,last_name,email,phone,profile_image_url', 'id', customer_ids,
+                default=[],
             )
-            for row in (customer_rows.data or []):
-                cid = _to_int(row.get('id'))
-                if cid is None:
-                    continue
-                customer_map[cid] = {
-                    'name': _full_name_from_auth_row(row),
-                    'email': row.get('email') or '',
-                    'phone': row.get('phone') or '',
-                    'profile_image_url': row.get('profile_image_url') or '',
-                }
-
-            customer_profiles = (
-                supabase.table(CUSTOMER_PROFILE_TABLE).select(
-                    'user_id,full_name,email,phone,location,profile_image_url,updated_at,created_at'
-                ).in_('user_id', customer_ids).execute()
+            fan.submit(
+                'customer_profiles', _select_in_data, supabase, CUSTOMER_PROFILE_TABLE,
+                'user_id,full_name,email,phone,location,profile_image_url,updated_at,created_at',
+                'user_id', customer_ids,
+                default=[],
             )
-            for row in (customer_profiles.data or []):
-                cid = _to_int(row.get('user_id'))
-                if cid is None or cid in customer_profile_map:
-                    continue
-                customer_profile_map[cid] = row
-
-        service_map = {}  # service_id -> {title, provider_id}
         if service_ids:
-            service_rows = (
-                supabase.table(Service._meta.db_table)
-                .select('id,title,provider_id')
-                .in_('id', service_ids)
-                .execute()
+            fan.submit(
+                'services', _select_in_data, supabase, Service._meta.db_table,
+                'id,title,provider_id', 'id', service_ids,
+                default=[],
             )
-            for row in (service_rows.data or []):
-                sid = _to_int(row.get('id'))
-                if sid is None:
-                    continue
-                service_map[sid] = row
+        if booking_ids:
+            for name, table in (('payments', PAYMENT_TABLE), ('refunds', REFUND_TABLE), ('receipts', RECEIPT_TABLE)):
+                fan.submit(
+                    name, _select_in_data, supabase, table, '*', 'booking_id', booking_ids,
+                    order_desc_id=True, default=[],
+                )
 
+        # Dependent step: providers are only known once the services read returns.
+        service_map = _rows_by_key(fan.result('services') if service_ids else [], 'id', first_wins=False)
         provider_ids = sorted({
             _to_int(s.get('provider_id')) for s in service_map.values() if _to_int(s.get('provider_id')) is not None
         })
-        docs_status_map = _provider_status_map_from_docs(supabase, provider_ids)
-        provider_map = {}
         if provider_ids:
-            provider_rows = (
-                supabase.table('seva_auth_user').select(
-                    'id,username,email,phone,verification_status,role'
-                ).in_('id', provider_ids).execute()
+            fan.submit('provider_docs', _provider_status_map_from_docs, supabase, provider_ids, default={})
+            fan.submit(
+                'providers', _select_in_data, supabase, 'seva_auth_user',
+                'id,username,email,phone,verification_status,role', 'id', provider_ids,
+                default=[],
             )
-            for row in (provider_rows.data or []):
-                pid = _to_int(row.get('id'))
-                if pid is None:
-                    continue
-                role = (row.get('role') or '').strip().lower()
-                is_provider_role = role in ('provider', 'prov')
-                effective_status = docs_status_map.get(pid) if is_provider_role else None
-                if not effective_status:
-                    effective_status = 'unverified'
-                provider_map[pid] = {
-                    'name': row.get('username') or row.get('email') or 'Provider',
-                    'email': row.get('email') or '',
-                    'phone': row.get('phone') or '',
-                    'verification_status': effective_status,
-                    'is_verified': effective_status == 'approved',
-                }
+        results = fan.results()
 
-        booking_ids = sorted({
-            _to_int(b.get('id')) for b in bookings if _to_int(b.get('id')) is not None
-        })
-        payment_map = {}
-        refund_map = {}
-        receipt_map = {}
-        if booking_ids:
-            payment_rows = (
-                supabase.table(PAYMENT_TABLE)
-                .select('*')
-                .in_('booking_id', booking_ids)
-                .order('id', desc=True)
-                .execute()
-            )
-            for row in (payment_rows.data or []):
-                bid = _to_int(row.get('booking_id'))
-                if bid is None or bid in payment_map:
-                    continue
-                payment_map[bid] = row
+        customer_map = {}
+        for cid, row in _rows_by_key(results.get('customers'), 'id', first_wins=False).items():
+            customer_map[cid] = {
+                'name': _full_name_from_auth_row(row),
+                'email': row.get('email') or '',
+                'phone': row.get('phone') or '',
+                'profile_image_url': row.get('profile_image_url') or '',
+            }
+        customer_profile_map = _rows_by_key(results.get('customer_profiles'), 'user_id')
 
-            refund_rows = (
-                supabase.table(REFUND_TABLE)
-                .select('*')
-                .in_('booking_id', booking_ids)
-                .order('id', desc=True)
-                .execute()
-            )
-            for row in (refund_rows.data or []):
-                bid = _to_int(row.get('booking_id'))
-                if bid is None or bid in refund_map:
-                    continue
-                refund_map[bid] = row
+        docs_status_map = results.get('provider_docs') or {}
+        provider_map = {}
+        for pid, row in _rows_by_key(results.get('providers'), 'id', first_wins=False).items():
+            role = (row.get('role') or '').strip().lower()
+            is_provider_role = role in ('provider', 'prov')
+            effective_status = docs_status_map.get(pid) if is_provider_role else None
+            if not effective_status:
+                effective_status = 'unverified'
+            provider_map[pid] = {
+                'name': row.get('username') or row.get('email') or 'Provider',
+                'email': row.get('email') or '',
+                'phone': row.get('phone') or '',
+                'verification_status': effective_status,
+                'is_verified': effective_status == 'approved',
+            }
 
-            receipt_rows = (
-                supabase.table(RECEIPT_TABLE)
-                .select('*')
-                .in_('booking_id', booking_ids)
-                .order('id', desc=True)
-                .execute()
-            )
-            for row in (receipt_rows.data or []):
-                bid = _to_int(row.get('booking_id'))
-                if bid is None or bid in receipt_map:
-                    continue
-                receipt_map[bid] = row
+        # Rows are ordered id desc, so the first row per booking is the latest.
+        payment_map = _rows_by_key(results.get('payments'), 'booking_id')
+        refund_map = _rows_by_key(results.get('refunds'), 'booking_id')
+        receipt_map = _rows_by_key(results.get('receipts'), 'booking_id')
 
         for b in bookings:
             booking_customer_id = _to_int(b.get('customer_id'))
@@ -2267,6 +2113,104 @@ def _provider_can_review_refund(current_status: str) -> bool:
     }
 
 
+def _attach_provider_ratings(rows):
+    """Copy of rows with rating_count / rating_average from the cached provider rating map."""
+    provider_ids = sorted({
+        _to_int(row.get('provider_id'))
+        for row in rows
+        if _to_int(row.get('provider_id')) is not None
+    })
+    if not provider_ids:
+        return rows
+
+    try:
+        rating_acc = _get_provider_rating_acc_map(get_supabase_client(), provider_ids)
+    except Exception:
+        return rows
+
+    out = []
+    for row in rows:
+        mapped = dict(row)
+        pid = _to_int(mapped.get('provider_id'))
+        acc = rating_acc.get(pid, {'sum': 0.0, 'count': 0})
+        count = int(acc.get('count') or 0)
+        mapped['rating_count'] = count
+        mapped['rating_average'] = round((acc.get('sum', 0.0) / count), 2) if count else 0.0
+        out.append(mapped)
+    return out
+
+
+SERVICES_PAGE_DEFAULT = 20
+SERVICES_PAGE_MAX = 100
+# Sort value for rows without a price (JSON has no Infinity, and the cursor must round-trip).
+_NO_PRICE_SORT_VALUE = 1e18
+
+
+def _service_sort_key(row):
+    """(−rating, price, id): best rated first, then cheapest, id breaks ties so the order is total."""
+    try:
+        rating = float(row.get('rating_average') or 0)
+    except (TypeError, ValueError):
+        rating = 0.0
+    try:
+        price = float(row.get('price'))
+    except (TypeError, ValueError):
+        price = _NO_PRICE_SORT_VALUE
+    return (-rating, price, _to_int(row.get('id')) or 0)
+
+
+def _paginate_services(rows, limit, cursor=None, sort_key=_service_sort_key):
+    """Keyset page of rows after cursor (the sort key of the previous page's last row)."""
+    ordered = sorted(rows, key=sort_key)
+    if cursor is not None:
+        try:
+            after = tuple(float(part) for part in cursor[:-1]) + (int(cursor[-1]),)
+        except (TypeError, ValueError):
+            after = None
+        if after is not None:
+            ordered = [row for row in ordered if sort_key(row) > after]
+    page = ordered[:limit]
+    next_cursor = None
+    if len(ordered) > limit and page:
+        next_cursor = encode_cursor(*sort_key(page[-1]))
+    return {'count': len(rows), 'next_cursor': next_cursor, 'results': page}
+
+
+GEO_DEFAULT_RADIUS_KM = 10.0
+GEO_MAX_RADIUS_KM = 200.0
+
+
+def _load_provider_points():
+    """provider_id -> (lat, lng) from geocoded bookings on each provider's services."""
+    service_providers = {}
+    for row in _get_services_raw_from_supabase() or []:
+        sid = _to_int(row.get('id'))
+        pid = _to_int(row.get('provider_id'))
+        if sid is not None and pid is not None:
+            service_providers[sid] = pid
+    return provider_points_from_bookings(get_supabase_client(), service_providers)
+
+
+def _filter_services_by_distance(rows, lat, lng, radius_km):
+    """Rows whose provider is within radius_km of (lat, lng), each with distance_km set."""
+    provider_geo_index.ensure_fresh(_load_provider_points)
+    distances = {pid: distance for distance, pid in provider_geo_index.within(lat, lng, radius_km)}
+    out = []
+    for row in rows:
+        distance = distances.get(_to_int(row.get('provider_id')))
+        if distance is None:
+            continue
+        mapped = dict(row)
+        mapped['distance_km'] = round(distance, 3)
+        out.append(mapped)
+    return out
+
+
+def _geo_sort_key(row):
+    """(distance, −rating, price, id): nearest first, then the usual services order."""
+    return (float(row.get('distance_km') or 0),) + _service_sort_key(row)
+
+
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def services_list(request):
@@ -2274,6 +2218,12 @@ def services_list(request):
 
     Query: district, city — filter by provider's saved location (see registration).
     Skipped when for_signup=1 so signup dropdowns still see all catalog rows.
+    limit, cursor — keyset pages ordered by rating desc, price asc, id asc, applied after
+    every in-memory filter. With either set the response is {count, next_cursor, results};
+    without them the plain list is returned as before.
+    lat, lng, radius_km — only services whose provider is within radius_km (default 10,
+    max 200) of the point, nearest first, each with distance_km. Provider positions come
+    from services.geo_index.
     """
     category_id = request.query_params.get('category')
     provider_id = request.query_params.get('provider')
@@ -2305,33 +2255,31 @@ def services_list(request):
 
     loc_district = _sanitize_location_filter_value(loc_district)
     loc_city = _sanitize_location_filter_value(loc_city)
-
-    def _respond(services_payload):
-        def _attach_provider_ratings(rows):
-            provider_ids = sorted({
-                _to_int(row.get('provider_id'))
-                for row in rows
-                if _to_int(row.get('provider_id')) is not None
-            })
-            if not provider_ids:
-                return rows
-
+    page_limit = parse_limit(request.query_params.get('limit'), maximum=SERVICES_PAGE_MAX)
+    raw_cursor = request.query_params.get('cursor')
+    paginate = page_limit is not None or bool(raw_cursor)
+
+    geo_point = None
+    geo_radius_km = GEO_DEFAULT_RADIUS_KM
+    raw_lat = request.query_params.get('lat')
+    raw_lng = request.query_params.get('lng')
+    if raw_lat not in (None, '') or raw_lng not in (None, ''):
+        geo_point = parse_coordinates(raw_lat, raw_lng)
+        if geo_point is None:
+            return Response({'error': 'lat and lng must be valid coordinates'}, status=status.HTTP_400_BAD_REQUEST)
+        raw_radius = request.query_params.get('radius_km')
+        if raw_radius not in (None, ''):
             try:
-                rating_acc = _get_provider_rating_acc_map(get_supabase_client(), provider_ids)
-            except Exception:
-                return rows
-
-            out = []
-            for row in rows:
-                mapped = dict(row)
-                pid = _to_int(mapped.get('provider_id'))
-                acc = rating_acc.get(pid, {'sum': 0.0, 'count': 0})
-                count = int(acc.get('count') or 0)
-                mapped['rating_count'] = count
-                mapped['rating_average'] = round((acc.get('sum', 0.0) / count), 2) if count else 0.0
-                out.append(mapped)
-            return out
+                geo_radius_km = float(raw_radius)
+            except (TypeError, ValueError):
+                geo_radius_km = -1.0
+            if not 0 < geo_radius_km <= GEO_MAX_RADIUS_KM:
+                return Response(
+                    {'error': f'radius_km must be between 0 and {GEO_MAX_RADIUS_KM:g}'},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
 
+    def _respond(services_payload):
         if services_payload:
             services_payload = _attach_provider_ratings(services_payload)
         if (
@@ -2342,6 +2290,25 @@ def services_list(request):
             services_payload = _filter_services_by_provider_location(
                 services_payload, loc_district, loc_city
             )
+        sort_key = _service_sort_key
+        if geo_point is not None and not for_signup:
+            try:
+                services_payload = _filter_services_by_distance(
+                    services_payload or [], geo_point[0], geo_point[1], geo_radius_km
+                )
+            except Exception as e:
+                print(f"services_list geo filter error: {e}")
+                return Response({'error': 'Nearby search is unavailable'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+            sort_key = _geo_sort_key
+            if not paginate:
+                services_payload.sort(key=sort_key)
+        if paginate:
+            return Response(_paginate_services(
+                services_payload or [],
+                page_limit or SERVICES_PAGE_DEFAULT,
+                decode_cursor(raw_cursor, size=4 if sort_key is _geo_sort_key else 3),
+                sort_key=sort_key,
+            ))
         return Response(services_payload)
 
     cid = None
@@ -2465,6 +2432,47 @@ def services_list(request):
     print("⚠️ No services found in Supabase")
     return _respond([])
 
+SEARCH_PAGE_DEFAULT = 20
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def services_search(request):
+    """Ranked keyword search over the services catalog (BM25 over title/category/profession/location).
+
+    Query: q (required), limit (default 20, max 100), category, district, city,
+    prefix=0 to disable prefix matching (on by default so "plumb" finds "Plumber").
+    """
+    q = (request.query_params.get('q') or '').strip()
+    if not q:
+        return Response({'error': 'q is required'}, status=status.HTTP_400_BAD_REQUEST)
+    limit = parse_limit(request.query_params.get('limit'), default=SEARCH_PAGE_DEFAULT, maximum=SERVICES_PAGE_MAX)
+    prefix = request.query_params.get('prefix', '1').lower() not in ('0', 'false', 'no')
+    cid = _to_int(request.query_params.get('category'))
+    district = (request.query_params.get('district') or '').strip()
+    city = (request.query_params.get('city') or '').strip()
+    try:
+        service_search_index.ensure_fresh(lambda: _searchable_services(_get_services_raw_from_supabase()))
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    filtered = cid is not None or district or city
+    hits = service_search_index.search(q, limit=None if filtered else limit, prefix=prefix)
+    rows = []
+    scores = {}
+    for score, row in hits:
+        if cid is not None and _to_int(row.get('category_id')) != cid:
+            continue
+        rows.append(row)
+        scores[_to_int(row.get('id'))] = score
+    if district or city:
+        rows = _filter_services_by_provider_location(rows, district, city)
+    rows = _attach_provider_ratings(rows[:limit])
+    for row in rows:
+        row['search_score'] = scores.get(_to_int(row.get('id')), 0.0)
+    return Response({'query': q, 'count': len(rows), 'results': _to_json_serializable(rows)})
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def create_booking(request):
@@ -2525,12 +2533,13 @@ def create_booking(request):
                     provider_id = svc_r.data[0].get('provider_id')
                     service_title = svc_r.data[0].get('title') or 'Service'
                     customer_name = getattr(request.user, 'username', None) or getattr(request.user, 'email', None) or 'A customer'
-                    supabase.table('seva_notification').insert({
-                        'user_id': provider_id,
-                        'title': 'New service request',
-                        'body': f'{customer_name} requested "{service_title}". Review details and send a quote.',
-                        'booking_id': int(booking_id) if booking_id is not None else None,
-                    }).execute()
+                    enqueue_notification(
+                        provider_id,
+                        'New service request',
+                        f'{customer_name} requested "{service_title}". Review details and send a quote.',
+                        booking_id=booking_id,
+                        dedupe_key=f'booking:{booking_id}:created',
+                    )
             except Exception as e:
                 print(f"Create booking: failed to notify provider: {e}")
             return Response(_to_json_serializable(created), status=status.HTTP_201_CREATED)
@@ -2647,20 +2656,7 @@ def create_service_category_request(request):
         body = body[:1950]
 
         try:
-            supabase = get_supabase_client()
-            users_r = supabase.table('seva_auth_user').select('id,role').execute()
-            for row in users_r.data or []:
-                if (row.get('role') or '').strip().lower() != 'admin':
-                    continue
-                aid = row.get('id')
-                if aid is None:
-                    continue
-                supabase.table('seva_notification').insert({
-                    'user_id': int(aid),
-                    'title': 'New service to add',
-                    'body': body,
-                    'booking_id': None,
-                }).execute()
+            _notify_admins(get_supabase_client(), 'New service to add', body)
         except Exception as ne:
             print(f'create_service_category_request: admin notify failed: {ne}')
 
@@ -2703,6 +2699,7 @@ def upload_profile_image(request):
         db_ok = True
         try:
             supabase.table('seva_auth_user').update({'profile_image_url': url}).eq('id', uid).execute()
+            forget_user(uid)
         except Exception as db_err:
             if 'PGRST204' in str(db_err) or 'column' in str(db_err).lower():
                 db_ok = False
@@ -2902,6 +2899,8 @@ def create_review(request):
                 },
             )
             updated = (updated_r.data or [current])[0]
+            apply_review_change(supabase, provider_id, old_rating=current.get('rating'), new_rating=rating, reviewed_at=now_iso)
+            publish_review_changed(provider_id)
             return Response({
                 'action': 'updated',
                 'id': updated.get('id') or review_id,
@@ -2929,6 +2928,8 @@ def create_review(request):
             },
         )
         created = (created_r.data or [{}])[0]
+        apply_review_change(supabase, provider_id, new_rating=rating, reviewed_at=now_iso)
+        publish_review_changed(provider_id)
         return Response({
             'action': 'created',
             'id': created.get('id'),
@@ -3186,10 +3187,6 @@ def provider_reviews(request):
             }
 
         out = []
-        distribution = {str(i): 0 for i in range(1, 6)}
-        rating_sum = 0.0
-        rating_count = 0
-
         for row in rows:
             booking_id = _to_int(row.get('booking_id'))
             service_title = 'Service'
@@ -3206,10 +3203,6 @@ def provider_reviews(request):
                     customer_name = c_row.get('username') or c_row.get('email') or customer_name
 
             rating_value = _to_int(row.get('rating'))
-            if rating_value is not None and 1 <= rating_value <= 5:
-                distribution[str(rating_value)] = distribution[str(rating_value)] + 1
-                rating_sum += float(rating_value)
-                rating_count += 1
 
             out.append({
                 'id': row.get('id'),
@@ -3224,11 +3217,13 @@ def provider_reviews(request):
                 'updated_at': _to_json_serializable(row.get('updated_at') or row.get('created_at')),
                 'status': row.get('status') or 'active',
             })
+        # Totals cover every review, not just the 200 listed.
+        ratings = rating_summary(supabase, request.user.id)
         return Response({
             'summary': {
-                'total_reviews': rating_count,
-                'average_rating': round((rating_sum / rating_count), 2) if rating_count else 0.0,
-                'distribution': distribution,
+                'total_reviews': ratings['rating_count'],
+                'average_rating': rating_average(ratings),
+                'distribution': distribution(ratings),
             },
             'reviews': out,
         })
@@ -3360,6 +3355,7 @@ def update_booking_status(request, booking_id):
                     'status': PAYMENT_STATUS_REFUND_PENDING,
                     'updated_at': datetime.now().isoformat(),
                 }).eq('id', latest_payment.get('id')).execute()
+                publish_payment_changed(booking_id=booking_id)
                 update_payload['status'] = BOOKING_STATUS_CANCELLATION_REQUESTED
             else:
                 # No paid transaction -> simple cancellation.
@@ -3402,6 +3398,7 @@ def update_booking_status(request, booking_id):
                         'status': PAYMENT_STATUS_REFUND_REJECTED,
                         'updated_at': datetime.now().isoformat(),
                     }).eq('id', latest_payment.get('id')).execute()
+                    publish_payment_changed(booking_id=booking_id)
                 update_payload['status'] = BOOKING_STATUS_REFUND_PROVIDER_REJECTED
 
         elif new_status == BOOKING_STATUS_COMPLETED:
@@ -3450,19 +3447,21 @@ def update_booking_status(request, booking_id):
             actor_name = getattr(request.user, 'username', None) or getattr(request.user, 'email', None) or 'User'
             final_status = update_payload.get('status', '').lower()
             if final_status == BOOKING_STATUS_AWAITING_PAYMENT:
-                supabase.table('seva_notification').insert({
-                    'user_id': booking['customer_id'],
-                    'title': 'Price quote received',
-                    'body': f'{actor_name} quoted Rs {quoted_raw} for "{service_title}". Pay to confirm your booking.',
-                    'booking_id': int(booking_id),
-                }).execute()
+                _notify_user(
+                    supabase,
+                    booking['customer_id'],
+                    'Price quote received',
+                    f'{actor_name} quoted Rs {quoted_raw} for "{service_title}". Pay to confirm your booking.',
+                    booking_id=int(booking_id),
+                )
             elif final_status == BOOKING_STATUS_CANCELLED:
-                supabase.table('seva_notification').insert({
-                    'user_id': booking['customer_id'] if is_provider else provider_id,
-                    'title': 'Booking cancelled',
-                    'body': f'Booking #{booking_id} ({service_title}) was cancelled.',
-                    'booking_id': int(booking_id),
-                }).execute()
+                _notify_user(
+                    supabase,
+                    booking['customer_id'] if is_provider else provider_id,
+                    'Booking cancelled',
+                    f'Booking #{booking_id} ({service_title}) was cancelled.',
+                    booking_id=int(booking_id),
+                )
             elif final_status == BOOKING_STATUS_CANCELLATION_REQUESTED:
                 # Route refund request to provider dashboard (and admins) - not to customer's own notification feed.
                 _notify_user(
@@ -3472,14 +3471,12 @@ def update_booking_status(request, booking_id):
                     f'Booking #{booking_id} cancellation requested. Please review the refund request.',
                     booking_id=int(booking_id),
                 )
-                for aid in _get_admin_user_ids(supabase):
-                    _notify_user(
-                        supabase,
-                        aid,
-                        'Refund request created',
-                        f'Booking #{booking_id} refund request is pending provider review.',
-                        booking_id=int(booking_id),
-                    )
+                _notify_admins(
+                    supabase,
+                    'Refund request created',
+                    f'Booking #{booking_id} refund request is pending provider review.',
+                    booking_id=int(booking_id),
+                )
             elif final_status == BOOKING_STATUS_REFUND_PROVIDER_APPROVED:
                 # Provider approved -> notify customer + admins for final processing.
                 _notify_user(
@@ -3489,14 +3486,12 @@ def update_booking_status(request, booking_id):
                     f'Booking #{booking_id} refund was approved by provider and is now under admin review.',
                     booking_id=int(booking_id),
                 )
-                for aid in _get_admin_user_ids(supabase):
-                    _notify_user(
-                        supabase,
-                        aid,
-                        'Refund review required',
-                        f'Refund provider-approved for Booking #{booking_id}. Process final refund.',
-                        booking_id=int(booking_id),
-                    )
+                _notify_admins(
+                    supabase,
+                    'Refund review required',
+                    f'Refund provider-approved for Booking #{booking_id}. Process final refund.',
+                    booking_id=int(booking_id),
+                )
             elif final_status == BOOKING_STATUS_REFUND_PROVIDER_REJECTED:
                 _notify_user(
                     supabase,
@@ -3520,6 +3515,16 @@ def update_booking_status(request, booking_id):
     return Response({'error': 'Failed to update booking'}, status=status.HTTP_400_BAD_REQUEST)
 
 
+def _notification_payload(row):
+    return {
+        'id': row.get('id'),
+        'title': row.get('title') or '',
+        'body': row.get('body') or '',
+        'booking_id': row.get('booking_id'),
+        'created_at': _to_json_serializable(row.get('created_at')),
+    }
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def provider_notifications(request):
@@ -3529,16 +3534,7 @@ def provider_notifications(request):
     try:
         supabase = get_supabase_client()
         r = supabase.table('seva_notification').select('*').eq('user_id', request.user.id).order('created_at', desc=True).limit(100).execute()
-        out = []
-        for row in (r.data or []):
-            out.append({
-                'id': row.get('id'),
-                'title': row.get('title') or '',
-                'body': row.get('body') or '',
-                'booking_id': row.get('booking_id'),
-                'created_at': _to_json_serializable(row.get('created_at')),
-            })
-        return Response(out)
+        return Response([_notification_payload(row) for row in (r.data or [])])
     except Exception as e:
         return Response([], status=status.HTTP_200_OK)
 
@@ -3775,16 +3771,7 @@ def customer_notifications(request):
     try:
         supabase = get_supabase_client()
         r = supabase.table('seva_notification').select('*').eq('user_id', request.user.id).order('created_at', desc=True).limit(100).execute()
-        out = []
-        for row in (r.data or []):
-            out.append({
-                'id': row.get('id'),
-                'title': row.get('title') or '',
-                'body': row.get('body') or '',
-                'booking_id': row.get('booking_id'),
-                'created_at': _to_json_serializable(row.get('created_at')),
-            })
-        return Response(out)
+        return Response([_notification_payload(row) for row in (r.data or [])])
     except Exception:
         return Response([], status=status.HTTP_200_OK)
 
@@ -3928,6 +3915,7 @@ def _award_referral_points_if_eligible(supabase, customer_id):
         supabase.table('seva_auth_user').update({
             'loyalty_points': current + POINTS_REFERRER_FIRST_BOOKING,
         }).eq('id', referrer_id).execute()
+        forget_user(referrer_id)
 
         # Increment referred user's loyalty_points
         rc = (
@@ -3942,6 +3930,7 @@ def _award_referral_points_if_eligible(supabase, customer_id):
         supabase.table('seva_auth_user').update({
             'loyalty_points': current_c + POINTS_REFERRED_FIRST_BOOKING,
         }).eq('id', customer_id).execute()
+        forget_user(customer_id)
     except Exception as e:
         logger.warning('Referral award failed for customer_id=%s: %s', customer_id, e)
 
@@ -3959,6 +3948,7 @@ def _ensure_user_referral_code(supabase, user_id, username, email):
     code = _generate_referral_code(supabase, username, email)
     try:
         supabase.table('seva_auth_user').update({'referral_code': code}).eq('id', user_id).execute()
+        forget_user(user_id)
     except Exception:
         pass
     return code
@@ -4140,6 +4130,7 @@ def provider_verification_create(request):
             'reviewed_at': None,
             'reviewed_by': None,
         })
+        publish_provider_changed(request.user.id)
         if r.data and len(r.data) > 0:
             row = r.data[0]
             return Response({
@@ -4238,6 +4229,7 @@ def provider_verification_delete(request, verification_id):
         supabase.table(PROVIDER_VERIFICATION_TABLE).delete().eq(
             'id', verification_id
         ).eq('provider_id', request.user.id).execute()
+        publish_provider_changed(request.user.id)
         return Response(status=status.HTTP_204_NO_CONTENT)
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -4415,12 +4407,13 @@ def provider_verification_review(request, provider_id):
                 break
             except Exception:
                 continue
+        publish_provider_changed(provider_id)
 
         try:
-            supabase.table('seva_notification').insert({
-                'user_id': int(provider_id),
-                'title': 'Provider verification update',
-                'body': (
+            enqueue_notification(
+                provider_id,
+                'Provider verification update',
+                (
                     'Your provider application is approved.'
                     if action == 'approve'
                     else (
@@ -4429,7 +4422,7 @@ def provider_verification_review(request, provider_id):
                         else 'Your provider application status was updated.'
                     )
                 ),
-            }).execute()
+            )
         except Exception:
             pass
 
@@ -4512,6 +4505,7 @@ def payment_initiate(request):
             'status': PAYMENT_STATUS_PENDING,
         }
         supabase.table(PAYMENT_TABLE).insert(payload).execute()
+        publish_payment_changed(booking_id=booking_id)
         base_url = request.build_absolute_uri('/').rstrip('/')
         success_url = f"{base_url}/api/payments/esewa-success/"
         failure_url = f"{base_url}/api/payments/esewa-failure/"
@@ -4536,8 +4530,8 @@ def payment_initiate(request):
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-def _notify_provider_payment_received(supabase, booking_id):
-    """Insert a notification for the provider when payment is completed for a booking."""
+def _notify_provider_payment_received(supabase, booking_id, payment_id=None):
+    """Insert a notification for the provider when payment payment_id is completed for a booking."""
     try:
         r = supabase.table(Booking._meta.db_table).select('service_id').eq('id', booking_id).execute()
         if not r.data or not r.data[0]:
@@ -4546,12 +4540,15 @@ def _notify_provider_payment_received(supabase, booking_id):
         if not svc_r.data or not svc_r.data[0]:
             return
         provider_id = svc_r.data[0]['provider_id']
-        supabase.table('seva_notification').insert({
-            'user_id': provider_id,
-            'title': 'Payment received',
-            'body': f'Payment received for Booking #{booking_id}. Tap to view.',
-            'booking_id': int(booking_id),
-        }).execute()
+        # Payment callbacks can repeat; the dedupe key keeps this to one notification per
+        # payment row, so a later payment on the same booking (e.g. after a refund) still notifies.
+        enqueue_notification(
+            provider_id,
+            'Payment received',
+            f'Payment received for Booking #{booking_id}. Tap to view.',
+            booking_id=booking_id,
+            dedupe_key=f'payment:{payment_id}:received' if payment_id is not None else None,
+        )
     except Exception as e:
         print(f"Notify provider payment: {e}")
 
@@ -4632,6 +4629,7 @@ def payment_esewa_success(request):
             'ref_id': str(ref_id_verified),
             'updated_at': datetime.now().isoformat(),
         }).eq('id', payment['id']).execute()
+        publish_payment_changed(booking_id=booking_id)
         supabase.table(Booking._meta.db_table).update({
             'status': BOOKING_STATUS_PAID,
             'updated_at': datetime.now().isoformat(),
@@ -4643,7 +4641,7 @@ def payment_esewa_success(request):
         except Exception:
             pass
         _create_or_update_receipt_for_booking(supabase, booking_id)
-        _notify_provider_payment_received(supabase, booking_id)
+        _notify_provider_payment_received(supabase, booking_id, payment_id=payment.get('id'))
         app_scheme = request.GET.get('app_scheme', 'hamrosewa')
         redirect_url = f"{app_scheme}://payment/success?booking_id={booking_id}&transaction_id={oid}"
         from django.shortcuts import redirect
@@ -4669,6 +4667,7 @@ def payment_esewa_failure(request):
                 'updated_at': datetime.now().isoformat(),
             }).eq('id', payment['id']).execute()
             booking_id = payment['booking_id']
+            publish_payment_changed(booking_id=booking_id)
         else:
             booking_id = None
         app_scheme = request.GET.get('app_scheme', 'hamrosewa')
@@ -4679,53 +4678,106 @@ def payment_esewa_failure(request):
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+WALLET_PAGE_MAX = 100
+
+
+def _wallet_transaction(p):
+    return {
+        'id': p.get('id'),
+        'booking_id': p.get('booking_id'),
+        'transaction_id': p.get('transaction_id'),
+        'status': (p.get('status') or '').lower(),
+        'gateway': p.get('gateway'),
+        'amount': float(p.get('amount') or 0),
+        'ref_id': p.get('ref_id'),
+        'created_at': _to_json_serializable(p.get('created_at')),
+        'updated_at': _to_json_serializable(p.get('updated_at')),
+    }
+
+
+def _wallet_sort_key(tx):
+    return (tx.get('created_at') or '', _to_int(tx.get('id')) or 0)
+
+
+def _build_wallet_ledger(supabase, customer_id):
+    """
+    All payments of the customer's bookings, newest first, plus the running balance.
+    Two batched reads (booking ids, then payments via .in_ in chunks) regardless of booking count.
+    """
+    bookings = select_eq_paged(supabase, Booking._meta.db_table, 'customer_id', customer_id, columns='id')
+    booking_ids = [b.get('id') for b in bookings if b.get('id') is not None]
+    payments = select_in(supabase, PAYMENT_TABLE, 'booking_id', booking_ids) if booking_ids else []
+    transactions = []
+    balance = 0.0
+    for p in payments:
+        tx = _wallet_transaction(p)
+        if tx['status'] == PAYMENT_STATUS_COMPLETED:
+            balance += tx['amount']
+        elif tx['status'] == PAYMENT_STATUS_REFUNDED:
+            balance -= tx['amount']
+        transactions.append(tx)
+    transactions.sort(key=_wallet_sort_key, reverse=True)
+    return {'balance': balance, 'transactions': transactions}
+
+
+def _get_wallet_ledger(supabase, customer_id):
+    ledger = WALLET_LEDGER_CACHE.get(customer_id)
+    if ledger is None:
+        ledger = _build_wallet_ledger(supabase, customer_id)
+        WALLET_LEDGER_CACHE.set(customer_id, ledger)
+    return ledger
+
+
+def _attach_wallet_receipts(supabase, transactions):
+    """One batched receipt lookup for the payments on this page."""
+    payment_ids = [tx.get('id') for tx in transactions if tx.get('id') is not None]
+    if not payment_ids:
+        return
+    try:
+        rows = select_in(supabase, RECEIPT_TABLE, 'payment_id', payment_ids, columns='id,receipt_id,payment_id')
+    except Exception:
+        return
+    by_payment = {}
+    for row in rows:
+        # Lowest receipt id per payment, matching the old per-payment .limit(1) lookup.
+        by_payment.setdefault(row.get('payment_id'), row)
+    for tx in transactions:
+        receipt = by_payment.get(tx.get('id'))
+        if receipt:
+            tx['receipt_pk'] = receipt.get('id')
+            tx['receipt_id'] = receipt.get('receipt_id')
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def wallet_summary(request):
     """Return wallet summary for the current user.
 
-    Uses completed payments (via bookings) as the transaction history.
+    Uses payments (via bookings) as the transaction history. The ledger and balance are
+    cached per customer (invalidated by publish_payment_changed); receipts are looked up
+    only for the returned page. Optional ?limit=&cursor= pages transactions newest first;
+    without limit every transaction is returned as before.
     """
     try:
         supabase = get_supabase_client()
-        bookings = _get_bookings_raw_from_supabase(customer_id=request.user.id)
-        booking_ids = [b.get('id') for b in bookings if b.get('id') is not None]
-
-        transactions = []
-        total_spent = 0.0
-        if booking_ids:
-            for bid in booking_ids:
-                r = supabase.table(PAYMENT_TABLE).select('*').eq('booking_id', bid).execute()
-                if r.data:
-                    for p in r.data:
-                        amount = float(p.get('amount') or 0)
-                        status_str = (p.get('status') or '').lower()
-                        if status_str == PAYMENT_STATUS_COMPLETED:
-                            total_spent += amount
-                        elif status_str == PAYMENT_STATUS_REFUNDED:
-                            total_spent -= amount
-                        transactions.append({
-                            'id': p.get('id'),
-                            'booking_id': p.get('booking_id'),
-                            'transaction_id': p.get('transaction_id'),
-                            'status': status_str,
-                            'gateway': p.get('gateway'),
-                            'amount': amount,
-                            'ref_id': p.get('ref_id'),
-                            'created_at': _to_json_serializable(p.get('created_at')),
-                            'updated_at': _to_json_serializable(p.get('updated_at')),
-                        })
-                        try:
-                            rr = supabase.table(RECEIPT_TABLE).select('id,receipt_id').eq('payment_id', p.get('id')).limit(1).execute()
-                            if rr.data and rr.data[0]:
-                                transactions[-1]['receipt_pk'] = rr.data[0].get('id')
-                                transactions[-1]['receipt_id'] = rr.data[0].get('receipt_id')
-                        except Exception:
-                            pass
-        transactions.sort(key=lambda x: x.get('created_at') or '', reverse=True)
+        ledger = _get_wallet_ledger(supabase, request.user.id)
+        transactions = ledger['transactions']
+        limit = parse_limit(request.query_params.get('limit'), maximum=WALLET_PAGE_MAX)
+        cursor = decode_cursor(request.query_params.get('cursor'), size=2)
+        if cursor is not None:
+            after = (str(cursor[0] or ''), _to_int(cursor[1]) or 0)
+            transactions = [tx for tx in transactions if _wallet_sort_key(tx) < after]
+        next_cursor = None
+        if limit is not None and len(transactions) > limit:
+            transactions = transactions[:limit]
+            next_cursor = encode_cursor(*_wallet_sort_key(transactions[-1]))
+        page = [dict(tx) for tx in transactions]
+        _attach_wallet_receipts(supabase, page)
         return Response({
-            'balance': total_spent,
-            'transactions': transactions,
+            'balance': ledger['balance'],
+            'transactions': page,
+            'transaction_count': len(ledger['transactions']),
+            'next_cursor': next_cursor,
         }, status=status.HTTP_200_OK)
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -4740,12 +4792,12 @@ def receipts_list(request):
         role = (getattr(request.user, 'role', None) or '').strip().lower()
         if role == 'admin':
             r = supabase.table(RECEIPT_TABLE).select('*').order('id', desc=True).execute()
-            return Response(_to_json_serializable([_decorate_receipt(supabase, x) for x in (r.data or [])]))
+            return Response(_to_json_serializable(_decorate_receipts(supabase, r.data or [])))
         if role == 'provider':
             r = supabase.table(RECEIPT_TABLE).select('*').eq('provider_id', request.user.id).order('id', desc=True).execute()
-            return Response(_to_json_serializable([_decorate_receipt(supabase, x) for x in (r.data or [])]))
+            return Response(_to_json_serializable(_decorate_receipts(supabase, r.data or [])))
         r = supabase.table(RECEIPT_TABLE).select('*').eq('customer_id', request.user.id).order('id', desc=True).execute()
-        return Response(_to_json_serializable([_decorate_receipt(supabase, x) for x in (r.data or [])]))
+        return Response(_to_json_serializable(_decorate_receipts(supabase, r.data or [])))
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
@@ -4797,24 +4849,31 @@ def receipt_by_booking(request, booking_id):
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-def _decorate_receipt(supabase, row):
-    out = dict(row or {})
+def _decorate_receipts(supabase, rows):
+    """Add customer_name / provider_name to receipts with one batched user lookup."""
+    out = [dict(row or {}) for row in (rows or [])]
     try:
-        cid = out.get('customer_id')
-        pid = out.get('provider_id')
-        if cid is not None:
-            cr = supabase.table('seva_auth_user').select('username,email').eq('id', cid).limit(1).execute()
-            if cr.data and cr.data[0]:
-                out['customer_name'] = cr.data[0].get('username') or cr.data[0].get('email') or ''
-        if pid is not None:
-            pr = supabase.table('seva_auth_user').select('username,email').eq('id', pid).limit(1).execute()
-            if pr.data and pr.data[0]:
-                out['provider_name'] = pr.data[0].get('username') or pr.data[0].get('email') or ''
+        user_ids = set()
+        for row in out:
+            user_ids.update(
+                uid for uid in (_to_int(row.get('customer_id')), _to_int(row.get('provider_id')))
+                if uid is not None
+            )
+        users = load_many(supabase, 'seva_auth_user', 'id', sorted(user_ids), columns='id,username,email')
+        for row in out:
+            for id_key, name_key in (('customer_id', 'customer_name'), ('provider_id', 'provider_name')):
+                user = users.get(_to_int(row.get(id_key)))
+                if user:
+                    row[name_key] = user.get('username') or user.get('email') or ''
     except Exception:
         pass
     return out
 
 
+def _decorate_receipt(supabase, row):
+    return _decorate_receipts(supabase, [row])[0]
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def refund_list(request):
@@ -4894,6 +4953,7 @@ def refund_provider_review(request, refund_id):
                 'status': payment_status,
                 'updated_at': datetime.now().isoformat(),
             }).eq('id', latest_payment.get('id')).execute()
+            publish_payment_changed(booking_id=booking_id)
             _create_or_update_receipt_for_booking(supabase, booking_id)
 
         # Notify customer
@@ -4913,14 +4973,12 @@ def refund_provider_review(request, refund_id):
 
         # Notify admins when provider approved.
         if action == 'approve':
-            for aid in _get_admin_user_ids(supabase):
-                _notify_user(
-                    supabase,
-                    aid,
-                    'Refund review required',
-                    f'Provider approved refund for Booking #{booking_id}.',
-                    booking_id=int(booking_id) if booking_id is not None else None,
-                )
+            _notify_admins(
+                supabase,
+                'Refund review required',
+                f'Provider approved refund for Booking #{booking_id}.',
+                booking_id=int(booking_id) if booking_id is not None else None,
+            )
 
         fresh = supabase.table(REFUND_TABLE).select('*').eq('id', refund_id).execute()
         return Response(_to_json_serializable((fresh.data or [refund])[0]))
@@ -4987,6 +5045,7 @@ def refund_review(request, refund_id):
                     )
                 ),
             }).eq('id', payment_id).execute()
+            publish_payment_changed(booking_id=booking_id, customer_id=refund.get('customer_id'))
 
         if booking_id is not None:
             supabase.table(Booking._meta.db_table).update({
@@ -5128,6 +5187,79 @@ def chat_threads(request):
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+CHAT_PAGE_MAX = 200
+REALTIME_KEEPALIVE_SECONDS = 15
+CHAT_CURSOR_HEADER = 'X-Chat-Cursor'
+CHAT_SINCE_HEADER = 'X-Chat-Since'
+CHAT_HAS_MORE_HEADER = 'X-Chat-Has-More'
+
+
+def _parse_chat_since(value):
+    """?since= as an ISO timestamp PostgREST can compare against; None when missing or invalid."""
+    text = (value or '').strip().replace(' ', '+')
+    if not text:
+        return None
+    try:
+        parsed = datetime.fromisoformat(text.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    return parsed.isoformat()
+
+
+def _fetch_chat_page(supabase, booking_ids, after_id=None, before_id=None, since=None, limit=CHAT_PAGE_MAX):
+    """
+    One page of a conversation, oldest first, plus whether more rows exist past it.
+
+    after_id: messages newer than the client's last seen id (polling).
+    since: messages created or soft-deleted after that time; with after_id, new messages
+           plus older ones deleted since the last poll.
+    before_id / no cursor: the `limit` messages just before before_id (or the latest ones),
+           for scrolling back through history.
+    """
+    q = supabase.table('seva_chat_message').select('*').in_('booking_id', booking_ids)
+    if after_id is not None and since:
+        q = q.or_(f'id.gt.{after_id},deleted_at.gt."{since}"')
+    elif after_id is not None:
+        q = q.gt('id', after_id)
+    elif since:
+        q = q.or_(f'created_at.gt."{since}",deleted_at.gt."{since}"')
+    if after_id is None and since is None:
+        if before_id is not None:
+            q = q.lt('id', before_id)
+        rows = q.order('id', desc=True).limit(limit + 1).execute().data or []
+        return list(reversed(rows[:limit])), len(rows) > limit
+    rows = q.order('id').limit(limit + 1).execute().data or []
+    return rows[:limit], len(rows) > limit
+
+
+def _decorate_chat_messages(supabase, messages):
+    """Sender names from the user directory, deleted-message placeholders, cached attachment URLs."""
+    for m in messages:
+        m['sender_id'] = _to_int(m.get('sender_id') or m.get('senderId') or m.get('sender'))
+    sender_ids = {m['sender_id'] for m in messages if m['sender_id'] is not None}
+    sender_rows = user_directory.rows_for_ids(sender_ids) if sender_ids else {}
+    urls = signed_urls(
+        supabase,
+        [m.get('attachment_path') for m in messages if m.get('deleted_at') is None],
+        bucket=CHAT_ATTACHMENTS_BUCKET,
+    )
+    for m in messages:
+        sender_id = m['sender_id']
+        sender = sender_rows.get(sender_id)
+        m['senderId'] = sender_id
+        m['sender_name'] = (sender.get('username') or sender.get('email') or 'User') if sender else ''
+        # If message is deleted, replace content with placeholder
+        if m.get('deleted_at') is not None:
+            m['message'] = 'This message was deleted'
+            m['attachment_path'] = None
+            m['attachment_url'] = None
+            m['attachment_mime'] = None
+            m['attachment_name'] = None
+        elif m.get('attachment_path'):
+            m['attachment_url'] = urls.get(m.get('attachment_path'))
+    return messages
+
+
 @api_view(['GET', 'POST'])
 @permission_classes([IsAuthenticated])
 def chat_messages(request, booking_id):
@@ -5135,7 +5267,6 @@ def chat_messages(request, booking_id):
     try:
         supabase = get_supabase_client()
         user = request.user
-        CHAT_ATTACHMENTS_BUCKET = 'chat-attachments'
 
         # Validate booking and participation
         r = supabase.table(Booking._meta.db_table).select('*').eq('id', booking_id).execute()
@@ -5152,16 +5283,12 @@ def chat_messages(request, booking_id):
                 return Response({'error': 'Not authorized'}, status=status.HTTP_403_FORBIDDEN)
 
         if request.method == 'GET':
+            # Taken before any read so the next ?since= poll cannot skip a concurrent write.
+            server_now = datetime.utcnow().replace(microsecond=0).isoformat() + '+00:00'
             # Unify conversation across repeated bookings with the same
             # customer-provider pair.
             customer_id = booking.get('customer_id')
 
-            def _to_int(v):
-                try:
-                    return int(v)
-                except (TypeError, ValueError):
-                    return None
-
             # Find provider_id from the service_id of this booking.
             svc_r = supabase.table(Service._meta.db_table).select('provider_id').eq(
                 'id', booking.get('service_id')
@@ -5185,43 +5312,30 @@ def chat_messages(request, booking_id):
                 ) if service_ids else []
                 pair_booking_ids = [b.get('id') for b in pair_bookings if b.get('id') is not None] or [booking_id]
 
-            msgs = supabase.table('seva_chat_message').select('*').in_(
-                'booking_id', pair_booking_ids
-            ).order('created_at', desc=False).execute()
-            messages = list(msgs.data or [])
-            sender_ids = []
-            for m in messages:
-                sid = _to_int(m.get('sender_id') or m.get('senderId') or m.get('sender'))
-                if sid is not None:
-                    sender_ids.append(sid)
-            sender_ids = list(set(sender_ids))
-            sender_map = {}
-            if sender_ids:
-                users = supabase.table('seva_auth_user').select('id,username,email').in_('id', sender_ids).execute()
-                for u in users.data or []:
-                    uid = _to_int(u.get('id'))
-                    if uid is not None:
-                        sender_map[uid] = (u.get('username') or u.get('email') or 'User')
-            for m in messages:
-                sender_id = _to_int(m.get('sender_id') or m.get('senderId') or m.get('sender'))
-                m['sender_id'] = sender_id
-                m['senderId'] = sender_id
-                m['sender_name'] = sender_map.get(sender_id) or ''
-                # If message is deleted, replace content with placeholder
-                if m.get('deleted_at') is not None:
-                    m['message'] = 'This message was deleted'
-                    m['attachment_path'] = None
-                    m['attachment_url'] = None
-                    m['attachment_mime'] = None
-                    m['attachment_name'] = None
-                else:
-                    attachment_path = m.get('attachment_path')
-                    if attachment_path:
-                        signed = supabase.storage.from_(CHAT_ATTACHMENTS_BUCKET).create_signed_url(
-                            attachment_path, expires_in=24 * 60 * 60
-                        )
-                        m['attachment_url'] = signed.get('signedURL') or signed.get('signedUrl')
-            return Response(_to_json_serializable(messages))
+            after_id = _to_int(request.query_params.get('after_id'))
+            before_id = _to_int(request.query_params.get('before_id'))
+            since = _parse_chat_since(request.query_params.get('since'))
+            limit = parse_limit(request.query_params.get('limit'), maximum=CHAT_PAGE_MAX)
+            if after_id is None and before_id is None and since is None and limit is None:
+                # No cursor: full history, as older clients expect.
+                msgs = supabase.table('seva_chat_message').select('*').in_(
+                    'booking_id', pair_booking_ids
+                ).order('created_at', desc=False).execute()
+                messages, has_more = list(msgs.data or []), False
+            else:
+                messages, has_more = _fetch_chat_page(
+                    supabase, pair_booking_ids, after_id=after_id, before_id=before_id,
+                    since=since, limit=limit or CHAT_PAGE_MAX,
+                )
+            _decorate_chat_messages(supabase, messages)
+            response = Response(_to_json_serializable(messages))
+            ids = [m.get('id') for m in messages if isinstance(m.get('id'), int)]
+            if after_id is not None:
+                ids.append(after_id)
+            response[CHAT_CURSOR_HEADER] = str(max(ids)) if ids else ''
+            response[CHAT_SINCE_HEADER] = server_now
+            response[CHAT_HAS_MORE_HEADER] = 'true' if has_more else 'false'
+            return response
 
         # POST: send a message
         message = (_get_request_param(request, 'message') or request.data.get('message') or '').strip() if hasattr(request, 'data') else ''
@@ -5271,10 +5385,7 @@ def chat_messages(request, booking_id):
             row['senderId'] = row.get('sender_id')
             row['sender_name'] = getattr(user, 'username', None) or getattr(user, 'email', None) or ''
             if row.get('attachment_path'):
-                signed = supabase.storage.from_(CHAT_ATTACHMENTS_BUCKET).create_signed_url(
-                    row.get('attachment_path'), expires_in=24 * 60 * 60
-                )
-                row['attachment_url'] = signed.get('signedURL') or signed.get('signedUrl')
+                row['attachment_url'] = signed_url(supabase, row.get('attachment_path'), bucket=CHAT_ATTACHMENTS_BUCKET)
             return Response(_to_json_serializable(row), status=status.HTTP_201_CREATED)
         return Response({'error': 'Could not create message'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     except Exception as e:
@@ -5331,6 +5442,130 @@ def delete_chat_message(request, booking_id, message_id):
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+def _realtime_subscriber(request):
+    """(user, booking_ids the user may chat on) for the stream's JWT bearer; (None, None) if invalid."""
+    try:
+        auth = CachedJWTAuthentication().authenticate(request)
+    except Exception:
+        return None, None
+    if not auth:
+        return None, None
+    user = auth[0]
+    if (getattr(user, 'role', None) or '').lower().strip() in ('provider', 'prov'):
+        services = _get_services_raw_from_supabase(provider_id=user.id)
+        service_ids = [s.get('id') for s in services if s.get('id') is not None]
+        bookings = _get_bookings_raw_from_supabase(service_ids=service_ids) if service_ids else []
+    else:
+        bookings = _get_bookings_raw_from_supabase(customer_id=user.id)
+    return user, [b.get('id') for b in bookings if b.get('id') is not None]
+
+
+def _realtime_payloads(events):
+    """Hub events -> client payloads, shaped like chat_messages / *_notifications rows."""
+    chat_rows = [dict(row) for event_type, row in events if event_type == CHAT_EVENT]
+    if chat_rows:
+        _decorate_chat_messages(get_supabase_client(), chat_rows)
+    chats = iter(chat_rows)
+    out = []
+    for event_type, row in events:
+        data = next(chats) if event_type == CHAT_EVENT else _notification_payload(row)
+        out.append({'type': event_type, 'data': _to_json_serializable(data)})
+    return out
+
+
+def _realtime_cursor(sub):
+    return f"{sub.last_ids.get(CHAT_EVENT, 0)}:{sub.last_ids.get(NOTIFICATION_EVENT, 0)}"
+
+
+def _parse_realtime_cursor(request):
+    """(after_chat_id, after_notification_id) from ?after_chat_id=/?after_notification_id= or Last-Event-ID."""
+    after_chat_id = _to_int(request.GET.get('after_chat_id'))
+    after_notification_id = _to_int(request.GET.get('after_notification_id'))
+    last_event_id = request.headers.get('Last-Event-ID') or ''
+    if ':' in last_event_id:
+        chat_part, _, notification_part = last_event_id.partition(':')
+        after_chat_id = _to_int(chat_part) if after_chat_id is None else after_chat_id
+        after_notification_id = _to_int(notification_part) if after_notification_id is None else after_notification_id
+    return after_chat_id, after_notification_id
+
+
+def _sse_message(event, data, event_id=None):
+    lines = [f'id: {event_id}'] if event_id else []
+    lines.append(f'event: {event}')
+    lines.append('data: ' + json.dumps(data, separators=(',', ':')))
+    return '\n'.join(lines) + '\n\n'
+
+
+async def _realtime_sse_stream(sub, max_seconds):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + max_seconds
+    try:
+        yield 'retry: 3000\n\n'
+        yield _sse_message('ready', {'cursor': _realtime_cursor(sub)}, _realtime_cursor(sub))
+        while loop.time() < deadline:
+            events = await sub.wait(min(REALTIME_KEEPALIVE_SECONDS, max(0.0, deadline - loop.time())))
+            if not events:
+                yield ': keepalive\n\n'
+                continue
+            for payload in await sync_to_async(_realtime_payloads, thread_sensitive=False)(events):
+                yield _sse_message(payload['type'], payload['data'], _realtime_cursor(sub))
+    finally:
+        realtime_hub.unsubscribe(sub)
+
+
+async def realtime_stream(request):
+    """
+    Push new chat messages and notifications for the current user (JWT bearer).
+
+    GET ?transport=sse (or Accept: text/event-stream) holds an SSE stream open for up to
+    REALTIME_STREAM_MAX_SECONDS; each event's id is "<chat id>:<notification id>", which
+    EventSource sends back as Last-Event-ID on reconnect. Otherwise it long-polls: waits up
+    to ?timeout= seconds (capped at REALTIME_LONG_POLL_SECONDS) and returns
+    {"events": [...], "cursor": {...}}. Pass ?after_chat_id=&after_notification_id= from the
+    last response so nothing written between requests is missed. Serve over ASGI (core/asgi.py);
+    all connections in a process share one upstream watcher (services/realtime_hub.py).
+    """
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+    user, booking_ids = await sync_to_async(_realtime_subscriber)(request)
+    if user is None:
+        return JsonResponse({'error': 'Authentication credentials were not provided or are invalid.'}, status=401)
+    after_chat_id, after_notification_id = _parse_realtime_cursor(request)
+    sub = realtime_hub.subscribe(user.id, booking_ids, asyncio.get_running_loop())
+    try:
+        await sync_to_async(realtime_hub.catch_up, thread_sensitive=False)(
+            get_supabase_client(), sub, after_chat_id, after_notification_id
+        )
+    except Exception as e:
+        logger.warning('realtime catch-up failed for user %s: %s', user.id, e)
+
+    wants_sse = request.GET.get('transport') == 'sse' or 'text/event-stream' in (request.headers.get('Accept') or '')
+    if wants_sse:
+        max_seconds = float(getattr(settings, 'REALTIME_STREAM_MAX_SECONDS', 300) or 300)
+        response = StreamingHttpResponse(_realtime_sse_stream(sub, max_seconds), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    max_wait = float(getattr(settings, 'REALTIME_LONG_POLL_SECONDS', 25) or 25)
+    try:
+        timeout = min(max_wait, max(0.0, float(request.GET.get('timeout') or max_wait)))
+    except ValueError:
+        timeout = max_wait
+    try:
+        events = await sub.wait(timeout)
+        payloads = await sync_to_async(_realtime_payloads, thread_sensitive=False)(events) if events else []
+    finally:
+        realtime_hub.unsubscribe(sub)
+    return JsonResponse({
+        'events': payloads,
+        'cursor': {
+            'after_chat_id': sub.last_ids.get(CHAT_EVENT, 0),
+            'after_notification_id': sub.last_ids.get(NOTIFICATION_EVENT, 0),
+        },
+    })
+
+
 def _esewa_mobile_verify_transaction(ref_id, use_uat=True):
     """
     Call eSewa Mobile Transaction API to verify SDK payment by refId.
@@ -5424,13 +5659,14 @@ def payment_verify_complete(request):
             'ref_id': str(ref_id),
             'updated_at': datetime.now().isoformat(),
         }).eq('id', payment['id']).execute()
+        publish_payment_changed(booking_id=payment.get('booking_id'))
         supabase.table(Booking._meta.db_table).update({
             'status': BOOKING_STATUS_PAID,
             'updated_at': datetime.now().isoformat(),
         }).eq('id', booking_id).execute()
         _award_referral_points_if_eligible(supabase, booking.get('customer_id'))
         receipt = _create_or_update_receipt_for_booking(supabase, booking_id)
-        _notify_provider_payment_received(supabase, booking_id)
+        _notify_provider_payment_received(supabase, booking_id, payment_id=payment.get('id'))
         return Response({
             'success': True,
             'booking_id': str(booking_id),
@@ -5481,13 +5717,14 @@ def payment_demo_complete(request):
             'ref_id': 'DEMO',
             'updated_at': datetime.now().isoformat(),
         }).eq('id', payment['id']).execute()
+        publish_payment_changed(booking_id=payment.get('booking_id'))
         supabase.table(Booking._meta.db_table).update({
             'status': BOOKING_STATUS_PAID,
             'updated_at': datetime.now().isoformat(),
         }).eq('id', booking_id).execute()
         _award_referral_points_if_eligible(supabase, booking.get('customer_id'))
         receipt = _create_or_update_receipt_for_booking(supabase, booking_id)
-        _notify_provider_payment_received(supabase, booking_id)
+        _notify_provider_payment_received(supabase, booking_id, payment_id=payment.get('id'))
         return Response({
             'success': True,
             'booking_id': str(booking_id),
@@ -5515,34 +5752,14 @@ def places_autocomplete(request):
     if len(query) < 2:
         return Response({'predictions': []})
     try:
-        import urllib.parse
-        import urllib.request
         # geocode = addresses + cities/regions (e.g. Itahari, Birtamode); components bias to Nepal
-        params = {
-            'input': query,
-            'key': key,
-            'types': 'geocode',  # addresses and place names
-            'components': 'country:np',  # bias to Nepal
-        }
-        url = 'https://maps.googleapis.com/maps/api/place/autocomplete/json?' + urllib.parse.urlencode(params)
-        req = urllib.request.Request(url, headers={'Accept': 'application/json'})
-        with urllib.request.urlopen(req, timeout=10) as resp:
-            data = json.loads(resp.read().decode())
-        status = data.get('status') or ''
-        if status != 'OK' and status != 'ZERO_RESULTS':
-            err_msg = data.get('error_message', status)
-            return Response({
-                'predictions': [],
-                'error': err_msg,
-                'hint': 'Enable Places API and set GOOGLE_MAPS_API_KEY in backend env.',
-            })
-        predictions = []
-        for p in (data.get('predictions') or []):
-            predictions.append({
-                'place_id': p.get('place_id'),
-                'description': p.get('description', ''),
-            })
-        return Response({'predictions': predictions})
+        return Response(places_client.autocomplete(query, key))
+    except PlacesApiError as e:
+        return Response({
+            'predictions': [],
+            'error': str(e),
+            'hint': 'Enable Places API and set GOOGLE_MAPS_API_KEY in backend env.',
+        })
     except Exception as e:
         return Response({'predictions': [], 'error': str(e)})
 
@@ -5558,21 +5775,10 @@ def place_details(request):
     if not place_id:
         return Response({'error': 'place_id required'}, status=status.HTTP_400_BAD_REQUEST)
     try:
-        import urllib.parse
-        import urllib.request
-        params = {'place_id': place_id, 'fields': 'formatted_address,geometry', 'key': key}
-        url = 'https://maps.googleapis.com/maps/api/place/details/json?' + urllib.parse.urlencode(params)
-        req = urllib.request.Request(url, headers={'Accept': 'application/json'})
-        with urllib.request.urlopen(req, timeout=10) as resp:
-            data = json.loads(resp.read().decode())
-        result = data.get('result') or {}
-        geometry = result.get('geometry') or {}
-        location = geometry.get('location') or {}
-        return Response({
-            'formatted_address': result.get('formatted_address', ''),
-            'latitude': location.get('lat'),
-            'longitude': location.get('lng'),
-        })
+        return Response(places_client.details(place_id, key))
+    except PlacesApiError:
+        # Unknown / expired place_id: same empty shape as before, just not cached.
+        return Response({'formatted_address': '', 'latitude': None, 'longitude': None})
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_502_BAD_GATEWAY)
 
@@ -5589,15 +5795,6 @@ def reverse_geocode(request):
         lng = request.GET.get('lng')
         if lat is None or lng is None:
             return Response({'formatted_address': ''}, status=status.HTTP_400_BAD_REQUEST)
-        import urllib.parse
-        import urllib.request
-        params = {'latlng': f'{lat},{lng}', 'key': key}
-        url = 'https://maps.googleapis.com/maps/api/geocode/json?' + urllib.parse.urlencode(params)
-        req = urllib.request.Request(url, headers={'Accept': 'application/json'})
-        with urllib.request.urlopen(req, timeout=10) as resp:
-            data = json.loads(resp.read().decode())
-        results = data.get('results') or []
-        formatted = results[0].get('formatted_address', '') if results else ''
-        return Response({'formatted_address': formatted})
+        return Response(places_client.reverse_geocode(lat, lng, key))
     except Exception as e:
         return Response({'formatted_address': '', 'error': str(e)})